@@ -0,0 +1,21 @@
+# coding: utf-8
+# Copyright (c) Pymatgen Development Team.
+# Distributed under the terms of the MIT License.
+
+"""
+Performance benchmarks for pymatgen, written for airspeed velocity (asv).
+
+The benchmarks use the files in test_files, together with synthetic
+supercells of them, so that timings can be tracked across commits. To run
+the suite against the current checkout::
+
+    asv dev
+
+To track timings across a range of commits and inspect the results::
+
+    asv run master~10..master
+    asv publish
+    asv preview
+
+Individual benchmarks can be selected with "-b", e.g. "asv dev -b Matcher".
+"""
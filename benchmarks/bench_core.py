@@ -0,0 +1,93 @@
+# coding: utf-8
+# Copyright (c) Pymatgen Development Team.
+# Distributed under the terms of the MIT License.
+
+"""
+Benchmarks for the core geometry routines of Structure and Lattice.
+"""
+
+from __future__ import division, unicode_literals
+
+import numpy as np
+
+from pymatgen.core.lattice import Lattice
+from pymatgen.util.coord_utils import pbc_shortest_vectors
+
+from .common import get_supercell
+
+
+class StructureNeighbors(object):
+    """
+    Neighbor searches on supercells of LiFePO4.
+    """
+    params = ([1, 2, 3], [3.0, 6.0])
+    param_names = ["scaling", "r"]
+    timeout = 300
+
+    def setup(self, scaling, r):
+        self.s = get_supercell("POSCAR.LiFePO4", scaling)
+
+    def time_get_all_neighbors(self, scaling, r):
+        self.s.get_all_neighbors(r)
+
+    def time_get_all_neighbors_with_index(self, scaling, r):
+        self.s.get_all_neighbors(r, include_index=True)
+
+
+class StructurePrimitive(object):
+    """
+    Primitive cell reduction of supercells.
+    """
+    params = (["POSCAR.LiFePO4", "POSCAR.Li2O"], [1, 2, 3])
+    param_names = ["structure", "scaling"]
+    timeout = 300
+
+    def setup(self, filename, scaling):
+        self.s = get_supercell(filename, scaling)
+
+    def time_get_primitive_structure(self, filename, scaling):
+        self.s.get_primitive_structure()
+
+    def time_get_reduced_structure(self, filename, scaling):
+        self.s.get_reduced_structure()
+
+
+class LatticeReduction(object):
+    """
+    Niggli and LLL reduction of increasingly skewed lattices.
+    """
+    params = [1, 5, 20]
+    param_names = ["skew"]
+
+    def setup(self, skew):
+        m = np.array([[1, 0, 0], [skew, 1, 0], [skew, skew, 1]])
+        self.lattice = Lattice(np.dot(m, Lattice.monoclinic(
+            3.5, 4.2, 5.1, 102).matrix))
+
+    def time_get_niggli_reduced_lattice(self, skew):
+        self.lattice.get_niggli_reduced_lattice()
+
+    def time_get_lll_reduced_lattice(self, skew):
+        # Lattice caches the LLL reduction, so use a fresh copy.
+        Lattice(self.lattice.matrix).get_lll_reduced_lattice()
+
+
+class ShortestVectors(object):
+    """
+    pbc_shortest_vectors between two sets of fractional coordinates.
+    """
+    params = [10, 100, 500]
+    param_names = ["n"]
+
+    def setup(self, n):
+        rs = np.random.RandomState(0)
+        self.lattice = Lattice.from_parameters(5, 6, 7, 80, 95, 110)
+        self.fc1 = rs.uniform(size=(n, 3))
+        self.fc2 = rs.uniform(size=(n, 3))
+
+    def time_pbc_shortest_vectors(self, n):
+        pbc_shortest_vectors(self.lattice, self.fc1, self.fc2)
+
+    def time_pbc_shortest_vectors_d2(self, n):
+        pbc_shortest_vectors(self.lattice, self.fc1, self.fc2,
+                             return_d2=True)
@@ -0,0 +1,55 @@
+# coding: utf-8
+# Copyright (c) Pymatgen Development Team.
+# Distributed under the terms of the MIT License.
+
+"""
+Benchmarks for file parsing.
+"""
+
+from __future__ import division, unicode_literals
+
+import os
+
+from pymatgen.io.vasp.outputs import Vasprun
+from pymatgen.io.cif import CifParser
+
+from .common import test_dir
+
+
+class VasprunParsing(object):
+    """
+    Parsing of vasprun.xml files of different sizes and contents.
+    """
+    params = ["vasprun.xml.dielectric", "vasprun.xml.uniform",
+              "vasprun.xml.dfpt", "vasprun_Si_bands.xml"]
+    param_names = ["filename"]
+    timeout = 300
+
+    def setup(self, filename):
+        self.filename = os.path.join(test_dir, filename)
+
+    def time_vasprun(self, filename):
+        Vasprun(self.filename, parse_potcar_file=False)
+
+    def time_vasprun_projected(self, filename):
+        Vasprun(self.filename, parse_projected_eigen=True,
+                parse_potcar_file=False)
+
+    def time_vasprun_no_dos_or_eigen(self, filename):
+        Vasprun(self.filename, parse_dos=False, parse_eigen=False,
+                parse_potcar_file=False)
+
+
+class CifParsing(object):
+    """
+    Parsing of CIF files.
+    """
+    params = ["Li10GeP2S12.cif", "MultiStructure.cif",
+              "P24Ru4H252C296S24N16.cif"]
+    param_names = ["filename"]
+
+    def setup(self, filename):
+        self.filename = os.path.join(test_dir, filename)
+
+    def time_get_structures(self, filename):
+        CifParser(self.filename).get_structures()
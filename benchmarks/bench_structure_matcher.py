@@ -0,0 +1,87 @@
+# coding: utf-8
+# Copyright (c) Pymatgen Development Team.
+# Distributed under the terms of the MIT License.
+
+"""
+Benchmarks for StructureMatcher.
+"""
+
+from __future__ import division, unicode_literals
+
+import json
+import os
+
+from monty.json import MontyDecoder
+
+from pymatgen.analysis.structure_matcher import StructureMatcher
+
+from .common import test_dir, get_supercell, get_test_structure, \
+    get_perturbed
+
+
+class MatcherFit(object):
+    """
+    StructureMatcher.fit of a structure against a perturbed copy of itself.
+    """
+    params = (["POSCAR.LiFePO4", "Li10GeP2S12.cif"], [1, 2])
+    param_names = ["structure", "scaling"]
+    timeout = 300
+
+    def setup(self, filename, scaling):
+        self.s1 = get_supercell(filename, scaling)
+        self.s2 = get_perturbed(self.s1)
+        self.sm = StructureMatcher()
+        self.sm_noprim = StructureMatcher(primitive_cell=False)
+
+    def time_fit(self, filename, scaling):
+        self.sm.fit(self.s1, self.s2)
+
+    def time_fit_no_primitive(self, filename, scaling):
+        self.sm_noprim.fit(self.s1, self.s2)
+
+    def time_get_rms_dist(self, filename, scaling):
+        self.sm.get_rms_dist(self.s1, self.s2)
+
+
+class MatcherAnonymous(object):
+    """
+    Anonymous matching, which needs to search species permutations.
+    """
+    timeout = 300
+
+    def setup(self):
+        self.s1 = get_test_structure("Na2Fe2PAsO4S4.json")
+        self.s2 = get_test_structure("Na2Fe2PNO4Se4.json")
+        self.sm = StructureMatcher()
+
+    def time_fit_anonymous(self):
+        self.sm.fit_anonymous(self.s1, self.s2)
+
+    def time_get_all_anonymous_mappings(self):
+        self.sm.get_all_anonymous_mappings(self.s1, self.s2)
+
+
+class MatcherGroup(object):
+    """
+    StructureMatcher.group_structures over the TiO2 entries, repeated to
+    give a larger collection.
+    """
+    params = [1, 4]
+    param_names = ["repeats"]
+    timeout = 600
+
+    def setup(self, repeats):
+        with open(os.path.join(test_dir, "TiO2_entries.json"), 'r') as fp:
+            entries = json.load(fp, cls=MontyDecoder)
+        structures = [e.structure for e in entries]
+        self.structures = []
+        for i in range(repeats):
+            self.structures.extend([get_perturbed(s, 0.02, seed=i)
+                                    for s in structures])
+        self.sm = StructureMatcher()
+
+    def time_group_structures(self, repeats):
+        self.sm.group_structures(self.structures)
+
+    def time_group_structures_anonymous(self, repeats):
+        self.sm.group_structures(self.structures, anonymous=True)
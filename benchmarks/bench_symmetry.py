@@ -0,0 +1,70 @@
+# coding: utf-8
+# Copyright (c) Pymatgen Development Team.
+# Distributed under the terms of the MIT License.
+
+"""
+Benchmarks for SpacegroupAnalyzer.
+"""
+
+from __future__ import division, unicode_literals
+
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer, \
+    SymmetryDatasetCache, get_symmetry_dataset_cache, \
+    set_symmetry_dataset_cache
+
+from .common import get_supercell
+
+
+class Spacegroup(object):
+    """
+    Space group analysis of supercells of test structures. The symmetry
+    dataset cache is disabled so that spglib is timed.
+    """
+    params = (["POSCAR.LiFePO4", "Li10GeP2S12.cif", "POSCAR.Li2O"], [1, 2])
+    param_names = ["structure", "scaling"]
+    timeout = 300
+
+    def setup(self, filename, scaling):
+        self.old_cache = get_symmetry_dataset_cache()
+        set_symmetry_dataset_cache(SymmetryDatasetCache(maxsize=0))
+        self.s = get_supercell(filename, scaling)
+        self.sga = SpacegroupAnalyzer(self.s)
+
+    def teardown(self, filename, scaling):
+        set_symmetry_dataset_cache(self.old_cache)
+
+    def time_init(self, filename, scaling):
+        SpacegroupAnalyzer(self.s)
+
+    def time_get_space_group_symbol(self, filename, scaling):
+        SpacegroupAnalyzer(self.s).get_space_group_symbol()
+
+    def time_get_symmetrized_structure(self, filename, scaling):
+        self.sga.get_symmetrized_structure()
+
+    def time_get_refined_structure(self, filename, scaling):
+        self.sga.get_refined_structure()
+
+    def time_get_primitive_standard_structure(self, filename, scaling):
+        self.sga.get_primitive_standard_structure()
+
+    def time_get_symmetry_operations(self, filename, scaling):
+        self.sga.get_symmetry_operations()
+
+
+class SpacegroupCached(object):
+    """
+    Repeated space group analysis of the same structure with the default
+    symmetry dataset cache.
+    """
+    params = (["POSCAR.LiFePO4", "Li10GeP2S12.cif"], [1, 2])
+    param_names = ["structure", "scaling"]
+    timeout = 300
+
+    def setup(self, filename, scaling):
+        self.s = get_supercell(filename, scaling)
+        get_symmetry_dataset_cache().clear()
+        SpacegroupAnalyzer(self.s)
+
+    def time_init(self, filename, scaling):
+        SpacegroupAnalyzer(self.s)
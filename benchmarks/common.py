@@ -0,0 +1,58 @@
+# coding: utf-8
+# Copyright (c) Pymatgen Development Team.
+# Distributed under the terms of the MIT License.
+
+"""
+Common helpers for the benchmarks.
+"""
+
+from __future__ import division, unicode_literals
+
+import os
+
+import numpy as np
+
+from pymatgen.core.structure import Structure
+from pymatgen.core.lattice import Lattice
+
+__author__ = "Pymatgen Development Team"
+__date__ = "Oct 18, 2016"
+
+test_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                        "test_files")
+
+
+def get_test_structure(filename):
+    """
+    Returns a structure from a file in test_files.
+    """
+    return Structure.from_file(os.path.join(test_dir, filename),
+                               primitive=False)
+
+
+def get_supercell(filename, scaling):
+    """
+    Returns a supercell of a structure in test_files, e.g.,
+    get_supercell("POSCAR.LiFePO4", 3) is a 3x3x3 supercell.
+    """
+    s = get_test_structure(filename)
+    s.make_supercell([scaling] * 3)
+    return s
+
+
+def get_perturbed(structure, distance=0.05, seed=0):
+    """
+    Returns a copy of the structure with all sites displaced by a
+    reproducible random vector of the given length and a slightly strained
+    lattice. Useful as a structure which matches, but is not identical, to
+    the original.
+    """
+    rs = np.random.RandomState(seed)
+    s = structure.copy()
+    vecs = rs.randn(len(s), 3)
+    vecs *= distance / np.linalg.norm(vecs, axis=1)[:, None]
+    strain = np.eye(3) + rs.uniform(-0.01, 0.01, (3, 3))
+    s.modify_lattice(Lattice(np.dot(s.lattice.matrix, strain)))
+    for i, v in enumerate(vecs):
+        s.translate_sites([i], v, frac_coords=False, to_unit_cell=True)
+    return s
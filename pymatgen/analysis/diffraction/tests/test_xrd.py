@@ -17,9 +17,17 @@ __email__ = "shyuep@gmail.com"
 __date__ = "5/22/14"
 
 import unittest2 as unittest
+import os
+import tempfile
+import shutil
+
+import numpy as np
+
 from pymatgen.core.lattice import Lattice
 from pymatgen.core.structure import Structure
-from pymatgen.analysis.diffraction.xrd import XRDCalculator
+from pymatgen.analysis.diffraction.xrd import XRDCalculator, \
+    get_unique_families, get_symmetry_unique_hkls, get_pattern_vector, \
+    XRDPatternIndex
 from pymatgen.util.testing import PymatgenTest
 
 
@@ -84,6 +92,114 @@ class XRDCalculatorTest(PymatgenTest):
         self.assertAlmostEqual(data[0][1], 2377745.2296686019)
         self.assertAlmostEqual(data[0][3], 2.2382050944897789)
 
+        # No reflections in range.
+        cu = Structure(Lattice.cubic(3), ["Cu"], [[0, 0, 0]])
+        self.assertEqual(c.get_xrd_data(cu, two_theta_range=(0, 5)), [])
+        self.assertEqual(XRDCalculator(symprec=0.01, use_symmetry=True)
+                         .get_xrd_data(cu, two_theta_range=(0, 5)), [])
+
+    def test_get_unique_families(self):
+        hkls = [(1, 0, 0), (0, -1, 0), (0, 0, 1), (1, 1, 0), (-1, 0, 1),
+                (2, 0, 0)]
+        self.assertEqual(get_unique_families(hkls),
+                         {(1, 0, 0): 3, (1, 1, 0): 2, (2, 0, 0): 1})
+
+    def test_use_symmetry(self):
+        for name in ["CsCl", "LiFePO4", "Graphite", "Li2O"]:
+            s = self.get_structure(name)
+            data = XRDCalculator(symprec=0.01).get_xrd_data(s)
+            sym_data = XRDCalculator(symprec=0.01,
+                                     use_symmetry=True).get_xrd_data(s)
+            self.assertEqual(len(data), len(sym_data))
+            for d1, d2 in zip(data, sym_data):
+                self.assertAlmostEqual(d1[0], d2[0])
+                self.assertAlmostEqual(d1[1], d2[1])
+                self.assertAlmostEqual(d1[3], d2[3])
+                self.assertEqual(sum(d1[2].values()), sum(d2[2].values()))
+            if name == "CsCl":
+                self.assertEqual(sym_data[1][2], {(1, 1, 0): 12})
+        self.assertRaises(ValueError, XRDCalculator, use_symmetry=True)
+
+    def test_get_symmetry_unique_hkls(self):
+        hkls = [(1, 0, 0), (0, -1, 0), (0, 0, 1), (1, 1, 0), (-1, 0, 1),
+                (2, 0, 0)]
+        # Tetragonal 4/m rotations about c.
+        rotations = [np.eye(3), [[0, -1, 0], [1, 0, 0], [0, 0, 1]],
+                     [[-1, 0, 0], [0, -1, 0], [0, 0, 1]],
+                     [[0, 1, 0], [-1, 0, 0], [0, 0, 1]]]
+        unique, g, mults = get_symmetry_unique_hkls(hkls, [1, 1, 1, 2, 2, 3],
+                                                    rotations)
+        self.assertEqual([tuple(hkl) for hkl in unique],
+                         [(0, 0, 1), (1, 0, 0), (1, 0, 1), (1, 1, 0),
+                          (2, 0, 0)])
+        self.assertEqual(mults.tolist(), [1, 2, 1, 1, 1])
+        self.assertEqual(g.tolist(), [1, 1, 2, 2, 3])
+
+
+class XRDPatternIndexTest(PymatgenTest):
+
+    def setUp(self):
+        self.names = ["CsCl", "LiFePO4", "Li2O", "Graphite", "Si"]
+        self.structures = [self.get_structure(n) for n in self.names]
+
+    def test_get_pattern_vector(self):
+        v = get_pattern_vector([20, 30.004], [50, 100], step=0.02, fwhm=0.2)
+        self.assertEqual(len(v), 4501)
+        self.assertAlmostEqual(np.linalg.norm(v), 1)
+        self.assertEqual(np.argmax(v), 1500)
+        v = get_pattern_vector([20, 30.004, 95], [50, 100, 100], fwhm=0)
+        self.assertEqual(np.count_nonzero(v), 2)
+        self.assertAlmostEqual(v[1000] * 2, v[1500])
+
+    def test_query(self):
+        index = XRDPatternIndex.from_structures(self.structures,
+                                                ids=self.names)
+        self.assertEqual(len(index), 5)
+        c = XRDCalculator()
+        data = c.get_xrd_data(self.get_structure("Li2O"))
+        matches = index.query([d[0] for d in data], [d[1] for d in data],
+                              k=3)
+        self.assertEqual(len(matches), 3)
+        self.assertEqual(matches[0][0], "Li2O")
+        self.assertAlmostEqual(matches[0][1], 1)
+        self.assertTrue(matches[0][1] >= matches[1][1] >= matches[2][1])
+
+        # A measured profile is interpolated onto the grid.
+        profile = index.vectors[3]
+        matches = index.query(index.grid, profile, k=1, broaden=False)
+        self.assertEqual(matches, [("Graphite", 1.0)])
+
+        index2 = XRDPatternIndex.from_structures(self.structures[:2],
+                                                 ncpus=2)
+        self.assertArrayAlmostEqual(index2.vectors, index.vectors[:2])
+        index2.add(index.vectors[2:], self.names[2:])
+        self.assertEqual(len(index2), 5)
+
+        # Structures without scattering coefficients get zero vectors.
+        no_params = Structure(Lattice.cubic(3), ["Lr"], [[0, 0, 0]])
+        index4 = XRDPatternIndex.from_structures([no_params])
+        self.assertEqual(np.count_nonzero(index4.vectors), 0)
+        # Structures without peaks in range also get zero vectors.
+        cu = Structure(Lattice.cubic(3), ["Cu"], [[0, 0, 0]])
+        index4 = XRDPatternIndex.from_structures([cu, self.structures[0]],
+                                                 two_theta_range=(0, 25))
+        self.assertEqual(np.count_nonzero(index4.vectors[0]), 0)
+        self.assertAlmostEqual(np.linalg.norm(index4.vectors[1]), 1)
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, "index.npz")
+            index.to_file(filename)
+            index3 = XRDPatternIndex.from_file(filename)
+            self.assertEqual(index3.ids, self.names)
+            self.assertArrayAlmostEqual(index3.vectors, index.vectors)
+            self.assertEqual(index3.two_theta_range, (0, 90))
+            index2.to_file(filename)
+            self.assertEqual(XRDPatternIndex.from_file(filename).ids,
+                             [0, 1] + self.names[2:])
+        finally:
+            shutil.rmtree(tmpdir)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -16,15 +16,19 @@ __email__ = "ongsp@ucsd.edu"
 __date__ = "5/22/14"
 
 
-from math import sin, cos, asin, pi, degrees, radians
+from math import sin, pi, radians
 import os
 import collections
+import logging
 
 import numpy as np
 import json
 
+from pymatgen.core.periodic_table import Element
 from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
 
+logger = logging.getLogger(__name__)
+
 #XRD wavelengths in angstroms
 WAVELENGTHS = {
     "CuKa": 1.54184,
@@ -126,7 +130,8 @@ class XRDCalculator(object):
     # absences do not cancel exactly to zero.
     SCALED_INTENSITY_TOL = 1e-3
 
-    def __init__(self, wavelength="CuKa", symprec=0, debye_waller_factors=None):
+    def __init__(self, wavelength="CuKa", symprec=0, debye_waller_factors=None,
+                 use_symmetry=False):
         """
         Initializes the XRD calculator with a given radiation.
 
@@ -143,7 +148,20 @@ class XRDCalculator(object):
             debye_waller_factors ({element symbol: float}): Allows the
                 specification of Debye-Waller factors. Note that these
                 factors are temperature dependent.
+            use_symmetry (bool): Whether to compute structure factors only
+                for symmetry-unique reflections. Reflections related by the
+                Laue group of the structure (its point group from
+                SpacegroupAnalyzer plus inversion, which leaves intensities
+                unchanged by Friedel's law) are reduced to a single
+                representative, whose multiplicity is the size of its orbit.
+                Requires a non-zero symprec, so that the symmetry is that of
+                the refined structure and the pattern is the same as without
+                use_symmetry. Families are then reported per symmetry orbit
+                rather than grouped by permutations of the Miller indices,
+                which is equivalent for cubic structures. Defaults to False.
         """
+        if use_symmetry and not symprec:
+            raise ValueError("use_symmetry requires a non-zero symprec.")
         if isinstance(wavelength, float):
             self.wavelength = wavelength
         else:
@@ -151,6 +169,7 @@ class XRDCalculator(object):
             self.wavelength = WAVELENGTHS[wavelength]
         self.symprec = symprec
         self.debye_waller_factors = debye_waller_factors or {}
+        self.use_symmetry = use_symmetry
 
     def get_xrd_data(self, structure, scaled=True, two_theta_range=(0, 90)):
         """
@@ -173,11 +192,17 @@ class XRDCalculator(object):
             scaled (the default), has a maximum value of 100 for the highest
             peak. {(h, k, l): mult} is a dict of Miller indices for all
             diffracted lattice facets contributing to that intensity and
-            their multiplicities. d_hkl is the interplanar spacing.
+            their multiplicities. d_hkl is the interplanar spacing. An
+            empty list is returned if there are no reflections within
+            two_theta_range.
         """
         if self.symprec:
             finder = SpacegroupAnalyzer(structure, symprec=self.symprec)
             structure = finder.get_refined_structure()
+        if self.use_symmetry:
+            finder = SpacegroupAnalyzer(structure, symprec=self.symprec)
+            rotations = [op.rotation_matrix
+                         for op in finder.get_point_group_operations()]
 
         wavelength = self.wavelength
         latt = structure.lattice
@@ -190,116 +215,151 @@ class XRDCalculator(object):
 
         # Obtain crystallographic reciprocal lattice points within range
         recip_latt = latt.reciprocal_lattice_crystallographic
-        recip_pts = recip_latt.get_points_in_sphere(
-            [[0, 0, 0]], [0, 0, 0], max_r)
-        if min_r:
-            recip_pts = [pt for pt in recip_pts if pt[1] >= min_r]
-
-        # Create a flattened array of zs, coeffs, fcoords and occus. This is
-        # used to perform vectorized computation of atomic scattering factors
-        # later. Note that these are not necessarily the same size as the
-        # structure as each partially occupied specie occupies its own
-        # position in the flattened array.
-        zs = []
-        coeffs = []
+        hkls, g_hkls, _ = recip_latt.get_points_in_sphere(
+            [[0, 0, 0]], [0, 0, 0], max_r, zip_results=False)
+        # Force miller indices to be integers.
+        hkls = np.round(hkls).astype(np.int)
+        inds = (g_hkls != 0) & (g_hkls >= min_r)
+        hkls = hkls[inds]
+        g_hkls = g_hkls[inds]
+        mults = np.ones(len(hkls), dtype=np.int)
+        if self.use_symmetry:
+            hkls, g_hkls, mults = get_symmetry_unique_hkls(hkls, g_hkls,
+                                                           rotations)
+
+        # Sort by |g| and then by decreasing Miller indices, so that the
+        # first reflection of each peak determines its two theta and d_hkl.
+        order = np.lexsort((-hkls[:, 2], -hkls[:, 1], -hkls[:, 0], g_hkls))
+        hkls = hkls[order]
+        g_hkls = g_hkls[order]
+        mults = mults[order]
+
+        # Create a flattened array of fcoords, and an occupancy matrix with
+        # one column per element. Partially occupied species occupy their own
+        # position in the flattened array. Since the atomic scattering
+        # factors only depend on the element, the structure factor can be
+        # obtained from one partial structure factor per element.
         fcoords = []
         occus = []
-        dwfactors = []
-
+        symbols = []
         for site in structure:
             for sp, occu in site.species_and_occu.items():
-                zs.append(sp.Z)
-                try:
-                    c = ATOMIC_SCATTERING_PARAMS[sp.symbol]
-                except KeyError:
+                if sp.symbol not in ATOMIC_SCATTERING_PARAMS:
                     raise ValueError("Unable to calculate XRD pattern as "
                                      "there is no scattering coefficients for"
                                      " %s." % sp.symbol)
-                coeffs.append(c)
-                dwfactors.append(self.debye_waller_factors.get(sp.symbol, 0))
                 fcoords.append(site.frac_coords)
                 occus.append(occu)
-
-        zs = np.array(zs)
-        coeffs = np.array(coeffs)
+                symbols.append(sp.symbol)
+        unique_symbols = sorted(set(symbols))
         fcoords = np.array(fcoords)
-        occus = np.array(occus)
-        dwfactors = np.array(dwfactors)
-        peaks = {}
-        two_thetas = []
-
-        for hkl, g_hkl, ind in sorted(
-                recip_pts, key=lambda i: (i[1], -i[0][0], -i[0][1], -i[0][2])):
-            hkl = [int(round(i)) for i in hkl] #Force miller indices to be integers.
-            if g_hkl != 0:
-
-                d_hkl = 1 / g_hkl
-
-                # Bragg condition
-                theta = asin(wavelength * g_hkl / 2)
-
-                # s = sin(theta) / wavelength = 1 / 2d = |ghkl| / 2 (d =
-                # 1/|ghkl|)
-                s = g_hkl / 2
-
-                #Store s^2 since we are using it a few times.
-                s2 = s ** 2
-
-                # Vectorized computation of g.r for all fractional coords and
-                # hkl.
-                g_dot_r = np.dot(fcoords, np.transpose([hkl])).T[0]
-
-                # Highly vectorized computation of atomic scattering factors.
-                # Equivalent non-vectorized code is::
-                #
-                #   for site in structure:
-                #      el = site.specie
-                #      coeff = ATOMIC_SCATTERING_PARAMS[el.symbol]
-                #      fs = el.Z - 41.78214 * s2 * sum(
-                #          [d[0] * exp(-d[1] * s2) for d in coeff])
-                fs = zs - 41.78214 * s2 * np.sum(
-                    coeffs[:, :, 0] * np.exp(-coeffs[:, :, 1] * s2), axis=1)
-
-                dw_correction = np.exp(-dwfactors * s2)
-
-                # Structure factor = sum of atomic scattering factors (with
-                # position factor exp(2j * pi * g.r and occupancies).
-                # Vectorized computation.
-                f_hkl = np.sum(fs * occus * np.exp(2j * pi * g_dot_r)
-                               * dw_correction)
-
-                # Lorentz polarization correction for hkl
-                lorentz_factor = (1 + cos(2 * theta) ** 2) / \
-                    (sin(theta) ** 2 * cos(theta))
-
-                # Intensity for hkl is modulus square of structure factor.
-                i_hkl = (f_hkl * f_hkl.conjugate()).real
-
-                two_theta = degrees(2 * theta)
-
-                if is_hex:
-                    # Use Miller-Bravais indices for hexagonal lattices.
-                    hkl = (hkl[0], hkl[1], - hkl[0] - hkl[1], hkl[2])
-                # Deal with floating point precision issues.
-                ind = np.where(np.abs(np.subtract(two_thetas, two_theta)) <
-                               XRDCalculator.TWO_THETA_TOL)
-                if len(ind[0]) > 0:
-                    peaks[two_thetas[ind[0][0]]][0] += i_hkl * lorentz_factor
-                    peaks[two_thetas[ind[0][0]]][1].append(tuple(hkl))
+        occu_matrix = np.zeros((len(fcoords), len(unique_symbols)))
+        occu_matrix[np.arange(len(fcoords)),
+                    [unique_symbols.index(sym) for sym in symbols]] = occus
+
+        if len(hkls) == 0:
+            # No reflections within two_theta_range.
+            return []
+
+        # Bragg condition
+        thetas = np.arcsin(wavelength * g_hkls / 2)
+
+        # s = sin(theta) / wavelength = 1 / 2d = |ghkl| / 2 (d =
+        # 1/|ghkl|)
+        s2 = (g_hkls / 2) ** 2
+
+        # Structure factor = sum of atomic scattering factors (with
+        # position factor exp(2j * pi * g.r and occupancies). The g.r for all
+        # hkl and fractional coords are computed in chunks of hkl to bound
+        # the size of the (nhkl x natoms) arrays.
+        f_hkls = np.zeros(len(hkls), dtype=np.complex)
+        chunk = max(1, int(1e6 // len(fcoords)))
+        for start in range(0, len(hkls), chunk):
+            sl = slice(start, start + chunk)
+            g_dot_r = 2 * pi * np.dot(hkls[sl], fcoords.T)
+            partial_f = np.dot(np.cos(g_dot_r), occu_matrix) + \
+                1j * np.dot(np.sin(g_dot_r), occu_matrix)
+            for i, symbol in enumerate(unique_symbols):
+                # Atomic scattering factor, i.e.,
+                # fs = el.Z - 41.78214 * s2 * sum(
+                #     [d[0] * exp(-d[1] * s2) for d in coeff])
+                coeff = np.array(ATOMIC_SCATTERING_PARAMS[symbol])
+                z = Element(symbol).Z
+                fs = z - 41.78214 * s2[sl] * np.sum(
+                    coeff[None, :, 0] * np.exp(-coeff[None, :, 1] *
+                                               s2[sl, None]), axis=1)
+                dw_correction = np.exp(
+                    -self.debye_waller_factors.get(symbol, 0) * s2[sl])
+                f_hkls[sl] += fs * dw_correction * partial_f[:, i]
+
+        # Lorentz polarization correction for hkl
+        lorentz_factors = (1 + np.cos(2 * thetas) ** 2) / \
+            (np.sin(thetas) ** 2 * np.cos(thetas))
+
+        # Intensity for hkl is modulus square of structure factor, summed
+        # over all symmetry equivalent reflections.
+        intensities = (f_hkls * f_hkls.conjugate()).real * lorentz_factors * \
+            mults
+
+        two_thetas = np.degrees(2 * thetas)
+
+        # Merge reflections with the same two theta into peaks. Deal with
+        # floating point precision issues by merging each reflection into the
+        # first peak within TWO_THETA_TOL of it. As the reflections are
+        # sorted, a reflection more than TWO_THETA_TOL above the previous one
+        # always starts a new peak. Only runs of close reflections spanning
+        # more than TWO_THETA_TOL need to be resolved one by one.
+        tol = XRDCalculator.TWO_THETA_TOL
+        run_starts = np.concatenate(
+            [[0], np.where(np.diff(two_thetas) >= tol)[0] + 1]).astype(int)
+        run_ends = np.append(run_starts[1:], len(two_thetas))
+        # Each reflection is labelled by the first reflection of its peak.
+        peak_inds = np.repeat(run_starts, run_ends - run_starts)
+        long_runs = np.where(two_thetas[run_ends - 1] -
+                             two_thetas[run_starts] >= tol)[0]
+        for run in long_runs:
+            peak_starts = []
+            for i in range(run_starts[run], run_ends[run]):
+                for j in peak_starts:
+                    if abs(two_thetas[i] - two_thetas[j]) < tol:
+                        peak_inds[i] = j
+                        break
                 else:
-                    peaks[two_theta] = [i_hkl * lorentz_factor, [tuple(hkl)],
-                                        d_hkl]
-                    two_thetas.append(two_theta)
+                    peak_starts.append(i)
+                    peak_inds[i] = i
+        # Group the reflections of each peak together, preserving order.
+        order = np.argsort(peak_inds, kind="mergesort")
+        hkls = hkls[order]
+        g_hkls = g_hkls[order]
+        two_thetas = two_thetas[order]
+        intensities = intensities[order]
+        mults = mults[order]
+        starts = np.concatenate(
+            [[0], np.where(np.diff(peak_inds[order]))[0] + 1]).astype(int)
+        ends = np.append(starts[1:], len(two_thetas))
+        peak_intensities = np.add.reduceat(intensities, starts)
 
         # Scale intensities so that the max intensity is 100.
-        max_intensity = max([v[0] for v in peaks.values()])
+        max_intensity = np.max(peak_intensities)
         data = []
-        for k in sorted(peaks.keys()):
-            v = peaks[k]
-            scaled_intensity = v[0] / max_intensity * 100 if scaled else v[0]
-            fam = get_unique_families(v[1])
+        for start, end, intensity in zip(starts, ends, peak_intensities):
+            scaled_intensity = intensity / max_intensity * 100 if scaled \
+                else intensity
             if scaled_intensity > XRDCalculator.SCALED_INTENSITY_TOL:
-                data.append([k, scaled_intensity, fam, v[2]])
+                if is_hex:
+                    # Use Miller-Bravais indices for hexagonal lattices.
+                    hkl_list = [(h, k, -h - k, l)
+                                for h, k, l in hkls[start:end].tolist()]
+                else:
+                    hkl_list = [tuple(hkl) for hkl in hkls[start:end].tolist()]
+                if self.use_symmetry:
+                    fam = {}
+                    for hkl, mult in zip(hkl_list, mults[start:end].tolist()):
+                        fam[hkl] = fam.get(hkl, 0) + mult
+                else:
+                    fam = get_unique_families(hkl_list)
+                data.append([two_thetas[start], scaled_intensity, fam,
+                             1 / g_hkls[start]])
         return data
 
     def get_xrd_plot(self, structure, two_theta_range=(0, 90),
@@ -365,25 +425,282 @@ def get_unique_families(hkls):
     Returns:
         {hkl: multiplicity}: A dict with unique hkl and multiplicity.
     """
-    # TODO: Definitely can be sped up.
-    def is_perm(hkl1, hkl2):
-        h1 = np.abs(hkl1)
-        h2 = np.abs(hkl2)
-        return all([i == j for i, j in zip(sorted(h1), sorted(h2))])
-
+    # Miller indices are in the same family if their sorted absolute values
+    # are the same.
     unique = collections.defaultdict(list)
-    for hkl1 in hkls:
-        found = False
-        for hkl2 in unique.keys():
-            if is_perm(hkl1, hkl2):
-                found = True
-                unique[hkl2].append(hkl1)
-                break
-        if not found:
-            unique[hkl1].append(hkl1)
+    for hkl in hkls:
+        unique[tuple(sorted(abs(i) for i in hkl))].append(hkl)
 
     pretty_unique = {}
     for k, v in unique.items():
         pretty_unique[sorted(v)[-1]] = len(v)
 
     return pretty_unique
+
+
+def get_symmetry_unique_hkls(hkls, g_hkls, rotations):
+    """
+    Reduces a set of reflections to one representative per orbit of the Laue
+    group generated by the point group rotations and inversion.
+
+    Args:
+        hkls (np.array): (n, 3) array of integer Miller indices.
+        g_hkls (np.array): Reciprocal lattice vector lengths of hkls.
+        rotations ([3x3 array]): Point group rotation matrices acting on
+            fractional coordinates, e.g., the rotation_matrix of the
+            SymmOps from SpacegroupAnalyzer.get_point_group_operations().
+
+    Returns:
+        (unique_hkls, unique_g_hkls, multiplicities). The representative of
+        each orbit is its largest Miller index in lexicographic order, and
+        its multiplicity is the number of reflections in hkls belonging to
+        that orbit.
+    """
+    hkls = np.array(hkls, dtype=np.int)
+    if len(hkls) == 0:
+        return hkls, np.array(g_hkls), np.zeros(0, dtype=np.int)
+    # Centered cells repeat each rotation for every centering translation.
+    rotations = np.round(rotations).astype(np.int).reshape((-1, 9))
+    # A rotation R of fractional coordinates maps the reflection h to h.R
+    # with the same intensity. Friedel's law adds the inversion.
+    rotations = np.concatenate([rotations, -rotations])
+    rotations = np.array(sorted(set(tuple(r) for r in rotations.tolist())))
+    rotations = rotations.reshape((-1, 3, 3)).astype(np.float)
+    images = np.round(np.matmul(hkls.astype(np.float), rotations)).astype(
+        np.int)
+    # Encode each image as an integer that preserves the lexicographic order
+    # of the Miller indices, so that the representative is the max key.
+    offset = np.max(np.abs(images))
+    base = 2 * offset + 1
+    keys = ((images[:, :, 0] + offset) * base + images[:, :, 1] +
+            offset) * base + images[:, :, 2] + offset
+    _, first, inverse, mults = np.unique(
+        np.max(keys, axis=0), return_index=True, return_inverse=True,
+        return_counts=True)
+    reps = np.argmax(keys, axis=0)[first]
+    unique_hkls = images[reps, first]
+    return unique_hkls, np.array(g_hkls)[first], mults
+
+
+def get_pattern_vector(two_thetas, intensities, two_theta_range=(0, 90),
+                       step=0.02, fwhm=0.2):
+    """
+    Converts a list of peaks into a broadened XRD pattern on a fixed two
+    theta grid, normalized to unit length so that the dot product of two
+    pattern vectors is their cosine similarity.
+
+    Args:
+        two_thetas ([float]): Peak positions in degrees.
+        intensities ([float]): Peak intensities.
+        two_theta_range ([float of length 2]): Range of the grid in degrees.
+        step (float): Grid spacing in degrees.
+        fwhm (float): Full width at half maximum in degrees of the Gaussian
+            used to broaden each peak. Set to 0 to put each peak into its
+            nearest grid point instead.
+
+    Returns:
+        1D numpy array of the pattern on the grid.
+    """
+    grid = _get_two_theta_grid(two_theta_range, step)
+    two_thetas = np.asarray(two_thetas, dtype=np.float)
+    intensities = np.asarray(intensities, dtype=np.float)
+    inds = (two_thetas >= grid[0]) & (two_thetas <= grid[-1])
+    two_thetas = two_thetas[inds]
+    intensities = intensities[inds]
+    if fwhm:
+        sigma = fwhm / (2 * np.sqrt(2 * np.log(2)))
+        vector = np.zeros(len(grid))
+        chunk = max(1, int(1e6 // len(grid)))
+        for start in range(0, len(two_thetas), chunk):
+            sl = slice(start, start + chunk)
+            vector += np.dot(intensities[sl], np.exp(
+                -(grid[None, :] - two_thetas[sl, None]) ** 2 /
+                (2 * sigma ** 2)))
+    else:
+        vector = np.bincount(
+            np.round((two_thetas - grid[0]) / step).astype(np.int),
+            weights=intensities, minlength=len(grid))[:len(grid)]
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _get_two_theta_grid(two_theta_range, step):
+    return np.arange(two_theta_range[0], two_theta_range[1] + step / 2,
+                     step)
+
+
+def _get_pattern_vector(args):
+    """
+    Computes the pattern vector of a structure. Used for pool processing in
+    XRDPatternIndex. Returns None if the XRD pattern cannot be calculated
+    because there are no scattering coefficients for an element.
+    """
+    structure, calculator, two_theta_range, step, fwhm = args
+    try:
+        data = calculator.get_xrd_data(structure,
+                                       two_theta_range=two_theta_range)
+        return get_pattern_vector([d[0] for d in data], [d[1] for d in data],
+                                  two_theta_range, step, fwhm)
+    except ValueError as ex:
+        logger.warning("XRD pattern of {} failed: {}".format(
+            structure.composition.reduced_formula, ex))
+        return None
+
+
+class XRDPatternIndex(object):
+    """
+    A searchable collection of calculated XRD patterns, e.g., for phase
+    identification of an experimental pattern against a database of
+    structures. Each pattern is stored as a broadened, normalized vector on a
+    fixed two theta grid (see get_pattern_vector), so that a query against
+    all patterns is a single matrix-vector product of cosine similarities.
+    """
+
+    def __init__(self, vectors, ids, two_theta_range=(0, 90), step=0.02,
+                 fwhm=0.2):
+        """
+        Args:
+            vectors: (n x ngrid) array of pattern vectors as obtained from
+                get_pattern_vector with the same grid parameters.
+            ids ([str]): Identifiers of the patterns, e.g., database ids.
+            two_theta_range ([float of length 2]): Range of the grid in
+                degrees.
+            step (float): Grid spacing in degrees.
+            fwhm (float): Broadening of the peaks in degrees.
+        """
+        self.two_theta_range = tuple(two_theta_range)
+        self.step = step
+        self.fwhm = fwhm
+        self.grid = _get_two_theta_grid(two_theta_range, step)
+        self.vectors = np.array(vectors, dtype=np.float).reshape(
+            -1, len(self.grid))
+        self.ids = list(ids)
+        if len(self.ids) != len(self.vectors):
+            raise ValueError("Number of ids and patterns are not the same.")
+
+    @classmethod
+    def from_structures(cls, structures, ids=None, calculator=None,
+                        two_theta_range=(0, 90), step=0.02, fwhm=0.2,
+                        ncpus=None, chunksize=20):
+        """
+        Computes the patterns of many structures.
+
+        Args:
+            structures ([Structure]): Structures to index.
+            ids ([str]): Identifiers of the structures. Defaults to the
+                indices of the structures.
+            calculator (XRDCalculator): Calculator to use. Defaults to
+                XRDCalculator(), i.e., Cu K_alpha radiation.
+            two_theta_range ([float of length 2]): Range of the grid in
+                degrees.
+            step (float): Grid spacing in degrees.
+            fwhm (float): Broadening of the peaks in degrees.
+            ncpus (int): Number of processes to use. Default of None means
+                serial processing.
+            chunksize (int): Number of structures sent to a process at a
+                time when ncpus is set.
+
+        Returns:
+            XRDPatternIndex. Structures for which no pattern could be
+            calculated or without peaks in two_theta_range are stored as
+            zero vectors, which are never matched.
+        """
+        calculator = calculator or XRDCalculator()
+        ids = list(range(len(structures))) if ids is None else ids
+        args = [(s, calculator, two_theta_range, step, fwhm)
+                for s in structures]
+        if ncpus:
+            import multiprocessing as mp
+            p = mp.Pool(ncpus)
+            try:
+                vectors = p.map(_get_pattern_vector, args, chunksize)
+            finally:
+                p.close()
+                p.join()
+        else:
+            vectors = [_get_pattern_vector(a) for a in args]
+        ngrid = len(_get_two_theta_grid(two_theta_range, step))
+        vectors = [np.zeros(ngrid) if v is None else v for v in vectors]
+        return cls(vectors, ids, two_theta_range, step, fwhm)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, vectors, ids):
+        """
+        Adds patterns to the index.
+
+        Args:
+            vectors: (n x ngrid) array of pattern vectors.
+            ids ([str]): Identifiers of the patterns.
+        """
+        vectors = np.array(vectors, dtype=np.float).reshape(
+            -1, len(self.grid))
+        if len(vectors) != len(ids):
+            raise ValueError("Number of ids and patterns are not the same.")
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.ids.extend(ids)
+
+    def get_vector(self, two_thetas, intensities, broaden=True):
+        """
+        Converts a pattern to a vector on the grid of the index.
+
+        Args:
+            two_thetas ([float]): Two thetas in degrees.
+            intensities ([float]): Intensities.
+            broaden (bool): Whether the input is a list of peaks to be
+                broadened like the indexed patterns. Set to False for a
+                measured profile, which is then interpolated onto the grid.
+        """
+        if broaden:
+            return get_pattern_vector(two_thetas, intensities,
+                                      self.two_theta_range, self.step,
+                                      self.fwhm)
+        vector = np.interp(self.grid, two_thetas, intensities, left=0,
+                           right=0)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def query(self, two_thetas, intensities, k=10, broaden=True):
+        """
+        Finds the patterns most similar to a query pattern.
+
+        Args:
+            two_thetas ([float]): Two thetas in degrees.
+            intensities ([float]): Intensities.
+            k (int): Number of matches to return.
+            broaden (bool): Whether the input is a list of peaks to be
+                broadened like the indexed patterns. Set to False for a
+                measured profile, which is then interpolated onto the grid.
+
+        Returns:
+            [(id, similarity)] of the k most similar patterns in order of
+            decreasing cosine similarity.
+        """
+        vector = self.get_vector(two_thetas, intensities, broaden=broaden)
+        scores = np.dot(self.vectors, vector)
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        inds = np.argpartition(-scores, k - 1)[:k]
+        inds = inds[np.argsort(-scores[inds], kind="mergesort")]
+        return [(self.ids[i], float(scores[i])) for i in inds]
+
+    def to_file(self, filename):
+        """
+        Writes the index to a numpy .npz file. The ids are stored as JSON,
+        so they must be JSON serializable.
+        """
+        np.savez(filename, vectors=self.vectors, ids=json.dumps(self.ids),
+                 two_theta_range=self.two_theta_range, step=self.step,
+                 fwhm=self.fwhm)
+
+    @classmethod
+    def from_file(cls, filename):
+        """
+        Reads an index written by to_file.
+        """
+        with np.load(filename, allow_pickle=False) as d:
+            return cls(d["vectors"], json.loads(str(d["ids"])),
+                       d["two_theta_range"].tolist(), float(d["step"]),
+                       float(d["fwhm"]))
@@ -22,13 +22,21 @@ from datetime import datetime
 from copy import deepcopy, copy
 from warnings import warn
 import bisect
+import heapq
+import itertools
+import logging
 
 import numpy as np
 from scipy.special import erfc
+from scipy.spatial import cKDTree
 from scipy.misc import comb
 
 import scipy.constants as constants
 
+from monty.dev import deprecated
+
+logger = logging.getLogger(__name__)
+
 
 class EwaldSummation(object):
     """
@@ -48,7 +56,8 @@ class EwaldSummation(object):
     CONV_FACT = 1e10 * constants.e / (4 * pi * constants.epsilon_0)
 
     def __init__(self, structure, real_space_cut=None, recip_space_cut=None,
-                 eta=None, acc_factor=12.0, w=1 / sqrt(2), compute_forces=False):
+                 eta=None, acc_factor=12.0, w=1 / sqrt(2), compute_forces=False,
+                 recip_chunk_mem=1e8):
         """
         Initializes and calculates the Ewald sum. Default convergence
         parameters have been specified, but you can override them if you wish.
@@ -77,11 +86,16 @@ class EwaldSummation(object):
                 cutoffs are set to None.
             compute_forces (bool): Whether to compute forces. False by
                 default since it is usually not needed.
+            recip_chunk_mem (float): Approximate memory in bytes used by the
+                intermediate arrays of the reciprocal space sum. G vectors are
+                processed in chunks sized to fit within this limit. Defaults
+                to 1e8, i.e., ~100 MB.
         """
         self._s = structure
         self._charged = abs(structure.charge) > 1e-8
         self._vol = structure.volume
         self._compute_forces = compute_forces
+        self._recip_chunk_mem = recip_chunk_mem
 
         self._acc_factor = acc_factor
         # set screening length
@@ -259,8 +273,10 @@ class EwaldSummation(object):
         S(G) = sum_{k=1,N} q_k exp(-i G.r_k)
         S(G)S(-G) = |S(G)|**2
 
-        This method is heavily vectorized to utilize numpy's C backend for
-        speed.
+        Using cos(G.(r_j - r_i)) = cos(G.r_i)cos(G.r_j) + sin(G.r_i)sin(G.r_j),
+        the energy matrix is obtained from matrix products of the (nG x N)
+        cos and sin arrays instead of looping over G vectors. The G vectors
+        are processed in chunks to bound memory usage.
         """
         numsites = self._s.num_sites
         prefactor = 2 * pi / self._vol
@@ -272,55 +288,67 @@ class EwaldSummation(object):
                                                  self._gmax)
 
         frac_coords = [fcoords for (fcoords, dist, i) in recip_nn if dist != 0]
+        if not frac_coords:
+            return erecip, forces
 
         gs = rcp_latt.get_cartesian_coords(frac_coords)
         g2s = np.sum(gs ** 2, 1)
-        expvals = np.exp(-g2s / (4 * self._eta))
-        grs = np.sum(gs[:, None] * coords[None, :], 2)
+        # Gaussian screening weight exp(-G.G/4/eta)/(G.G) for each G vector.
+        weights = np.exp(-g2s / (4 * self._eta)) / g2s
 
         oxistates = np.array(self._oxi_states)
 
-        # create array where q_2[i,j] is qi * qj
-        qiqj = oxistates[None, :] * oxistates[:, None]
-
-        # calculate the structure factor
-        sreals = np.sum(oxistates[None, :] * np.cos(grs), 1)
-        simags = np.sum(oxistates[None, :] * np.sin(grs), 1)
+        # Five (chunk x N) float arrays are alive at the same time.
+        chunk = max(1, int(self._recip_chunk_mem // (40 * numsites)))
 
-        for g, g2, gr, expval, sreal, simag in zip(gs, g2s, grs, expvals,
-                                                   sreals, simags):
+        for start in range(0, len(gs), chunk):
+            g = gs[start:start + chunk]
+            w = weights[start:start + chunk, None]
+            grs = np.dot(g, coords.T)
+            cosgr = np.cos(grs)
+            singr = np.sin(grs)
+            wcos = w * cosgr
+            wsin = w * singr
 
-            # Create array where exparg[i,j] is gvectdot[i] - gvectdot[j]
-            exparg = gr[None, :] - gr[:, None]
-
-            # Uses the identity sin(x)+cos(x) = 2**0.5 sin(x + pi/4)
-            sfactor = qiqj * np.sin(exparg + pi / 4) * 2 ** 0.5
-
-            erecip += expval / g2 * sfactor
+            # Equivalent to summing sin(x) + cos(x) with x = G.r_j - G.r_i
+            # over G, i.e., the symmetric cos part plus the antisymmetric
+            # sin part.
+            erecip += np.dot(cosgr.T, wcos + wsin) + \
+                np.dot(singr.T, wsin - wcos)
 
             if self._compute_forces:
-                pref = 2 * expval / g2 * oxistates
-                factor = prefactor * pref * (
-                    sreal * np.sin(gr) - simag * np.cos(gr))
+                # calculate the structure factor
+                sreals = np.dot(cosgr, oxistates)
+                simags = np.dot(singr, oxistates)
+                factor = 2 * (wsin * sreals[:, None] - wcos * simags[:, None])
+                forces += np.dot(factor.T, g)
 
-                forces += factor[:, None] * g[None, :]
+        # create array where q_2[i,j] is qi * qj
+        erecip *= oxistates[None, :] * oxistates[:, None]
 
-        forces *= EwaldSummation.CONV_FACT
+        forces *= prefactor * oxistates[:, None] * EwaldSummation.CONV_FACT
         erecip *= prefactor * EwaldSummation.CONV_FACT
 
         return erecip, forces
 
+    def _get_neighbor_list(self):
+        """
+        Finds all pairs of sites, including periodic images, that are within
+        the real space cutoff. See _get_neighbor_list.
+        """
+        return _get_neighbor_list(self._s, self._rmax)
+
     def _calc_real_and_point(self):
         """
         Determines the self energy -(eta/pi)**(1/2) * sum_{i=1}^{N} q_i**2
 
         If cell is charged a compensating background is added (i.e. a G=0 term)
+
+        The real space terms are evaluated from a single neighbor list of all
+        pairs within the cutoff and accumulated per pair with np.bincount.
         """
-        fcoords = self._s.frac_coords
         forcepf = 2.0 * self._sqrt_eta / sqrt(pi)
-        coords = self._coords
         numsites = self._s.num_sites
-        ereal = np.empty((numsites, numsites), dtype=np.float)
 
         forces = np.zeros((numsites, 3), dtype=np.float)
 
@@ -328,34 +356,27 @@ class EwaldSummation(object):
 
         epoint = - qs ** 2 * sqrt(self._eta / pi)
 
-        for i in range(numsites):
-            nfcoords, rij, js = self._s.lattice.get_points_in_sphere(fcoords,
-                                    coords[i], self._rmax, zip_results=False)
+        centers, neighbors, rij, vectors = self._get_neighbor_list()
 
-            # remove the rii term
-            inds = rij > 1e-8
-            js = js[inds]
-            rij = rij[inds]
-            nfcoords = nfcoords[inds]
+        qi = qs[centers]
+        qj = qs[neighbors]
 
-            qi = qs[i]
-            qj = qs[js]
+        erfcval = erfc(self._sqrt_eta * rij)
+        new_ereals = erfcval * qi * qj / rij
 
-            erfcval = erfc(self._sqrt_eta * rij)
-            new_ereals = erfcval * qi * qj / rij
-
-            # insert new_ereals
-            for k in range(numsites):
-                ereal[k, i] = np.sum(new_ereals[js == k])
-
-            if self._compute_forces:
-                nccoords = self._s.lattice.get_cartesian_coords(nfcoords)
+        # ereal[k, i] is the sum over all images of site k around site i.
+        ereal = np.bincount(neighbors * numsites + centers,
+                            weights=new_ereals,
+                            minlength=numsites ** 2).reshape(numsites,
+                                                             numsites)
 
-                fijpf = qj / rij ** 3 * (erfcval + forcepf * rij *
-                                         np.exp(-self._eta * rij ** 2))
-                forces[i] += np.sum(np.expand_dims(fijpf, 1) *
-                                    (np.array([coords[i]]) - nccoords) *
-                                    qi * EwaldSummation.CONV_FACT, axis=0)
+        if self._compute_forces:
+            fijpf = qj / rij ** 3 * (erfcval + forcepf * rij *
+                                     np.exp(-self._eta * rij ** 2))
+            fij = (fijpf * qi * EwaldSummation.CONV_FACT)[:, None] * vectors
+            for k in range(3):
+                forces[:, k] = np.bincount(centers, weights=fij[:, k],
+                                           minlength=numsites)
 
         ereal *= 0.5 * EwaldSummation.CONV_FACT
         epoint *= EwaldSummation.CONV_FACT
@@ -374,6 +395,456 @@ class EwaldSummation(object):
         return "\n".join(output)
 
 
+class ParticleMeshEwaldSummation(object):
+    """
+    Calculates the electrostatic energy and forces of a periodic array of
+    charges using the smooth particle mesh Ewald (SPME) technique. The charges
+    are interpolated onto a grid with cardinal B-splines and the reciprocal
+    space sum is evaluated with FFTs, while the real space sum uses a
+    neighbor list with a fixed cutoff. The cost scales as O(N log N) and no
+    N x N matrices are built, which makes it suitable for cells with many
+    thousands of ions. Use EwaldSummation when the per-pair energy matrices
+    are required.
+
+    Ref: U. Essmann et al., J. Chem. Phys. 103, 8577 (1995).
+
+    Atomic units used in the code, then converted to eV.
+    """
+
+    CONV_FACT = EwaldSummation.CONV_FACT
+
+    def __init__(self, structure, real_space_cut=10.0, eta=None,
+                 acc_factor=12.0, grid=None, order=6, compute_forces=False):
+        """
+        Initializes and calculates the Ewald sum.
+
+        Args:
+            structure (Structure): Input structure that must have proper
+                Specie on all sites, i.e. Element with oxidation state. Use
+                Structure.add_oxidation_state... for example.
+            real_space_cut (float): Real space cutoff radius in Angstrom.
+                Unlike EwaldSummation, this is kept fixed so that the real
+                space sum scales linearly with the number of sites. Defaults
+                to 10.
+            eta (float): The screening parameter. Defaults to None, which
+                means that it is chosen such that the real space sum is
+                converged to acc_factor significant figures at the cutoff.
+            acc_factor (float): No. of significant figures each sum is
+                converged to.
+            grid ([int]): Number of grid points along each lattice vector.
+                Defaults to None, which means that the grid is chosen to
+                resolve all reciprocal lattice vectors up to the cutoff.
+            order (int): Order of the B-spline interpolation. Must be even.
+                Higher orders are more accurate but more expensive.
+            compute_forces (bool): Whether to compute forces. False by
+                default since it is usually not needed.
+        """
+        if order < 4 or order % 2:
+            raise ValueError("B-spline order must be an even number >= 4.")
+        self._s = structure
+        self._charged = abs(structure.charge) > 1e-8
+        self._vol = structure.volume
+        self._compute_forces = compute_forces
+        self._order = order
+
+        self._accf = sqrt(log(10 ** acc_factor))
+        self._rmax = real_space_cut
+        self._eta = eta if eta else (self._accf / self._rmax) ** 2
+        self._sqrt_eta = sqrt(self._eta)
+        self._gmax = 2 * self._sqrt_eta * self._accf
+
+        if grid is None:
+            # The largest integer index of a G vector within gmax along
+            # each lattice vector, which the grid must resolve.
+            mmax = self._gmax * np.array(structure.lattice.abc) / (2 * pi)
+            grid = [_next_fft_size(max(2 * int(np.ceil(m)) + 1, order))
+                    for m in mmax]
+        self._grid = tuple(int(k) for k in grid)
+
+        self._oxi_states = np.array([compute_average_oxidation_state(site)
+                                     for site in structure])
+
+        (self._recip, recip_forces) = self._calc_recip()
+        (self._real, self._point, real_point_forces) = \
+            self._calc_real_and_point()
+        if self._compute_forces:
+            self._forces = recip_forces + real_point_forces
+
+    @property
+    def reciprocal_space_energy(self):
+        """
+        The reciprocal space energy.
+        """
+        return self._recip
+
+    @property
+    def real_space_energy(self):
+        """
+        The real space space energy.
+        """
+        return self._real
+
+    @property
+    def point_energy(self):
+        """
+        The point energy.
+        """
+        return self._point
+
+    @property
+    def total_energy(self):
+        """
+        The total energy.
+        """
+        if self._charged:
+            warn('Charged structures not supported in '
+                 'ParticleMeshEwaldSummation.')
+        return self._recip + self._real + self._point
+
+    @property
+    def forces(self):
+        """
+        The forces on each site as a Nx3 matrix. Each row corresponds to a
+        site.
+        """
+        if not self._compute_forces:
+            raise AttributeError(
+                "Forces are available only if compute_forces is True!")
+        return self._forces
+
+    @property
+    def eta(self):
+        return self._eta
+
+    @property
+    def grid(self):
+        """
+        Number of grid points along each lattice vector.
+        """
+        return self._grid
+
+    def _calc_recip(self):
+        """
+        Perform the reciprocal space summation on the charge grid, i.e.,
+        E_recip = 1/(2PiV) sum_{m != 0} exp(-Pi**2 m.m/eta)/(m.m) B(m)|F(Q)(m)|**2
+        where Q is the interpolated charge grid, F its discrete Fourier
+        transform and B(m) the B-spline correction factors.
+        """
+        numsites = self._s.num_sites
+        order = self._order
+        grid = np.array(self._grid)
+        qs = self._oxi_states
+
+        # Scaled fractional coordinates and the B-spline weights of the
+        # order grid points below each site along each lattice vector.
+        u = np.mod(self._s.frac_coords, 1) * grid
+        u0 = np.floor(u).astype(np.int)
+        weights, dweights = _bspline(u - u0, order)
+        # inds[a][i, j] is the grid index of the j-th weight of site i
+        # along lattice vector a.
+        inds = [np.mod(u0[:, a, None] - np.arange(order)[None, :], grid[a])
+                for a in range(3)]
+
+        flat_inds = (inds[0][:, :, None, None] * grid[1] +
+                     inds[1][:, None, :, None]) * grid[2] + \
+            inds[2][:, None, None, :]
+        w = weights[:, 0, :, None, None] * weights[:, 1, None, :, None] * \
+            weights[:, 2, None, None, :]
+        charge_grid = np.bincount(
+            flat_inds.ravel(), weights=(qs[:, None, None, None] * w).ravel(),
+            minlength=np.prod(grid)).reshape(grid)
+
+        # Reciprocal lattice vectors without the factor of 2 Pi.
+        rcp_matrix = self._s.lattice.reciprocal_lattice.matrix / (2 * pi)
+        ms = [np.fft.fftfreq(k) * k for k in grid]
+        mvecs = ms[0][:, None, None, None] * rcp_matrix[0] + \
+            ms[1][None, :, None, None] * rcp_matrix[1] + \
+            ms[2][None, None, :, None] * rcp_matrix[2]
+        m2 = np.sum(mvecs ** 2, axis=3)
+        m2[0, 0, 0] = 1
+        kernel = np.exp(-pi ** 2 * m2 / self._eta) / (pi * self._vol * m2)
+        kernel[0, 0, 0] = 0
+        for a, k in enumerate(grid):
+            shape = [1, 1, 1]
+            shape[a] = k
+            kernel *= _bspline_moduli(k, order).reshape(shape)
+
+        fq = np.fft.fftn(charge_grid)
+        erecip = 0.5 * np.sum(kernel * np.abs(fq) ** 2)
+
+        forces = np.zeros((numsites, 3), dtype=np.float)
+        if self._compute_forces:
+            conv = np.fft.ifftn(fq * kernel).real * np.prod(grid)
+            conv = conv.ravel()[flat_inds]
+            dedu = np.zeros((numsites, 3))
+            dedu[:, 0] = np.einsum("ia,ib,ic,iabc->i", dweights[:, 0],
+                                   weights[:, 1], weights[:, 2], conv)
+            dedu[:, 1] = np.einsum("ia,ib,ic,iabc->i", weights[:, 0],
+                                   dweights[:, 1], weights[:, 2], conv)
+            dedu[:, 2] = np.einsum("ia,ib,ic,iabc->i", weights[:, 0],
+                                   weights[:, 1], dweights[:, 2], conv)
+            dedu *= qs[:, None] * grid[None, :]
+            # Chain rule from scaled fractional to Cartesian coordinates.
+            forces = -np.dot(dedu, rcp_matrix) * self.CONV_FACT
+
+        return erecip * self.CONV_FACT, forces
+
+    def _get_neighbor_list(self):
+        """
+        Finds all pairs of sites, including periodic images, that are within
+        the real space cutoff. See _get_neighbor_list.
+        """
+        return _get_neighbor_list(self._s, self._rmax)
+
+    def _calc_real_and_point(self):
+        """
+        Determines the real space energy from the neighbor list and the self
+        energy -(eta/pi)**(1/2) * sum_{i=1}^{N} q_i**2
+        """
+        forcepf = 2.0 * self._sqrt_eta / sqrt(pi)
+        numsites = self._s.num_sites
+        qs = self._oxi_states
+
+        centers, neighbors, rij, vectors = self._get_neighbor_list()
+        qi = qs[centers]
+        qj = qs[neighbors]
+        erfcval = erfc(self._sqrt_eta * rij)
+        ereal = 0.5 * np.sum(erfcval * qi * qj / rij)
+
+        forces = np.zeros((numsites, 3), dtype=np.float)
+        if self._compute_forces:
+            fijpf = qj / rij ** 3 * (erfcval + forcepf * rij *
+                                     np.exp(-self._eta * rij ** 2))
+            fij = (fijpf * qi * self.CONV_FACT)[:, None] * vectors
+            for k in range(3):
+                forces[:, k] = np.bincount(centers, weights=fij[:, k],
+                                           minlength=numsites)
+
+        epoint = -np.sum(qs ** 2) * sqrt(self._eta / pi)
+        return ereal * self.CONV_FACT, epoint * self.CONV_FACT, forces
+
+    def __str__(self):
+        output = ["Real = " + str(self.real_space_energy),
+                  "Reciprocal = " + str(self.reciprocal_space_energy),
+                  "Point = " + str(self.point_energy),
+                  "Total = " + str(self.total_energy)]
+        return "\n".join(output)
+
+
+def _get_neighbor_list(structure, rmax):
+    """
+    Finds all pairs of sites, including periodic images, that are within
+    rmax using a KD-tree over the cell padded with periodic images, so that
+    the work and memory scale with the number of pairs rather than the
+    square of the number of sites.
+
+    Args:
+        structure (Structure): Input structure.
+        rmax (float): Cutoff radius in Angstrom.
+
+    Returns:
+        (centers, neighbors, dists, vectors) arrays, where vectors[k] is
+        the Cartesian vector pointing from the periodic image of site
+        neighbors[k] to site centers[k] and dists[k] is its length. The
+        zero-length self term is excluded.
+    """
+    latt = structure.lattice
+    fcoords = np.mod(structure.frac_coords, 1)
+
+    # Only images within the cutoff of the cell can be neighbors.
+    pad = rmax * np.array(latt.reciprocal_lattice.abc) / (2 * pi)
+    nmax = np.ceil(pad).astype(int)
+    images = np.array(list(itertools.product(
+        *[range(-n, n + 1) for n in nmax])), dtype=np.float)
+    all_fcoords = fcoords[None, :, :] + images[:, None, :]
+    within = np.all((all_fcoords >= -pad) & (all_fcoords <= 1 + pad),
+                    axis=2)
+    site_inds = np.where(within)[1]
+    points = latt.get_cartesian_coords(all_fcoords[within])
+    coords = latt.get_cartesian_coords(fcoords)
+
+    pairs = cKDTree(coords).sparse_distance_matrix(
+        cKDTree(points), rmax, output_type="coo_matrix")
+    inds = pairs.data > 1e-8
+    centers = pairs.row[inds]
+    neighbors = site_inds[pairs.col[inds]]
+    vectors = coords[centers] - points[pairs.col[inds]]
+    return centers, neighbors, pairs.data[inds], vectors
+
+
+def _bspline(w, order):
+    """
+    Evaluates the cardinal B-spline M_n of the given order and its derivative
+    at w + j for j = 0, ..., order - 1.
+
+    Args:
+        w: Array of fractional parts in [0, 1).
+        order (int): Order of the B-spline.
+
+    Returns:
+        (values, derivatives) arrays of shape w.shape + (order,).
+    """
+    w = np.asarray(w, dtype=np.float)[..., None]
+    j = np.arange(order)
+    x = w + j
+    # M_2(x) = 1 - |x - 1| on [0, 2].
+    vals = np.where(j < 2, 1 - np.abs(x - 1), 0.)
+    for n in range(3, order + 1):
+        if n == order:
+            prev = vals
+        shifted = np.concatenate([np.zeros_like(vals[..., :1]),
+                                  vals[..., :-1]], axis=-1)
+        vals = (x * vals + (n - x) * shifted) / (n - 1)
+    shifted = np.concatenate([np.zeros_like(prev[..., :1]),
+                              prev[..., :-1]], axis=-1)
+    return vals, prev - shifted
+
+
+def _bspline_moduli(k, order):
+    """
+    Returns |b(m)|**2 of the smooth particle mesh Ewald method for m = 0, ...,
+    k - 1 along a grid dimension with k points.
+    """
+    vals, _ = _bspline(0, order)
+    m = np.arange(k)
+    arg = 2 * pi * m[:, None] * np.arange(order - 1)[None, :] / k
+    den = np.abs(np.sum(vals[1:] * np.exp(1j * arg), axis=1)) ** 2
+    return 1 / den
+
+
+def _next_fft_size(n):
+    """
+    Returns the smallest integer >= n whose only prime factors are 2, 3 and
+    5, for which FFTs are efficient.
+    """
+    while True:
+        m = n
+        for p in (2, 3, 5):
+            while m % p == 0:
+                m //= p
+        if m == 1:
+            return n
+        n += 1
+
+
+class IncrementalEwaldEnergy(object):
+    """
+    Tracks the Ewald energy of a configuration derived from a base Ewald
+    energy matrix under site removals, charge changes and swaps. Since every
+    term of the Ewald sum is bilinear in the charges, the energy of a
+    configuration with charges q_i = f_i * q0_i is f^T M f, where M is the
+    base total energy matrix and q0 the base charges. Keeping v = M f up to
+    date, the energy change of a move touching k sites costs O(k^2) to
+    evaluate and O(k*N) to apply, which makes Monte Carlo ordering or
+    screening of many candidate configurations cheap.
+
+    Args:
+        matrix: The total energy matrix of the base structure, e.g.,
+            EwaldSummation.total_energy_matrix.
+        charges: The charges of the sites used to compute the matrix.
+    """
+
+    def __init__(self, matrix, charges):
+        matrix = np.array(matrix, dtype=np.float)
+        # Symmetrize so that moves can be evaluated from rows only.
+        self._matrix = (matrix + matrix.T) / 2
+        self._base_charges = np.array(charges, dtype=np.float)
+        if self._matrix.shape != (len(self._base_charges),) * 2:
+            raise ValueError("Matrix and charges are not consistent.")
+        self._factors = np.ones(len(self._base_charges))
+        self._v = self._matrix.sum(axis=1)
+        self._energy = float(np.sum(self._v))
+
+    @classmethod
+    def from_ewald_summation(cls, ewald):
+        """
+        Creates an IncrementalEwaldEnergy from an EwaldSummation.
+
+        Args:
+            ewald (EwaldSummation): Ewald summation of the base structure.
+        """
+        return cls(ewald.total_energy_matrix, ewald._oxi_states)
+
+    @property
+    def energy(self):
+        """
+        The Ewald energy of the current configuration.
+        """
+        return self._energy
+
+    @property
+    def charges(self):
+        """
+        The charges of the sites in the current configuration.
+        """
+        return self._factors * self._base_charges
+
+    def _get_move(self, charges=None, removals=None, swaps=None):
+        """
+        Converts a move into the indices of the affected sites and their new
+        scaling factors relative to the base charges.
+        """
+        new_charges = {}
+        current = self.charges
+        for i, q in (charges or {}).items():
+            new_charges[i] = q
+        for i in removals or []:
+            new_charges[i] = 0
+        for i, j in swaps or []:
+            qi = new_charges.get(i, current[i])
+            qj = new_charges.get(j, current[j])
+            new_charges[i], new_charges[j] = qj, qi
+
+        indices = np.array(sorted(new_charges), dtype=np.int)
+        new_q = np.array([new_charges[i] for i in indices], dtype=np.float)
+        base_q = self._base_charges[indices]
+        factors = np.zeros(len(indices))
+        nonzero = np.abs(base_q) > 1e-8
+        if np.any(np.abs(new_q[~nonzero]) > 1e-8):
+            raise ValueError("Cannot assign a charge to a site that has no "
+                             "charge in the base matrix.")
+        factors[nonzero] = new_q[nonzero] / base_q[nonzero]
+        return indices, factors - self._factors[indices]
+
+    def _get_delta(self, indices, dfactors):
+        sub_matrix = self._matrix[np.ix_(indices, indices)]
+        return float(2 * np.dot(dfactors, self._v[indices]) +
+                     np.dot(dfactors, np.dot(sub_matrix, dfactors)))
+
+    def get_delta_energy(self, charges=None, removals=None, swaps=None):
+        """
+        Computes the change in Ewald energy for a move without applying it.
+        All parts of the move are applied together, with swaps applied last
+        and in order.
+
+        Args:
+            charges (dict): {site index: new charge}.
+            removals ([int]): Indices of sites to remove, i.e., zero out.
+            swaps ([(int, int)]): Pairs of site indices whose charges are to
+                be swapped.
+
+        Returns:
+            Change in Ewald energy in eV.
+        """
+        indices, dfactors = self._get_move(charges, removals, swaps)
+        return self._get_delta(indices, dfactors)
+
+    def apply(self, charges=None, removals=None, swaps=None):
+        """
+        Applies a move to the current configuration. Arguments are the same
+        as in get_delta_energy.
+
+        Returns:
+            Change in Ewald energy in eV.
+        """
+        indices, dfactors = self._get_move(charges, removals, swaps)
+        delta = self._get_delta(indices, dfactors)
+        self._v += np.dot(self._matrix[:, indices], dfactors)
+        self._factors[indices] += dfactors
+        self._energy += delta
+        return delta
+
+
 class EwaldMinimizer:
     """
     This class determines the manipulations that will minimize an ewald matrix,
@@ -386,6 +857,17 @@ class EwaldMinimizer:
     candidate structures, and this class can be used to pick out those with the
     lowest ewald sum.
 
+    The search is a best-first branch and bound over the choices of indices
+    for each manipulation. Each node of the search tree is bounded from below
+    by relaxing the remaining choices: every candidate index contributes its
+    single site energy change plus the most negative interactions it can
+    possibly have with the other indices still to be chosen. The open node
+    with the lowest bound is expanded first, and the search dives depth first
+    from it so that complete orderings, which tighten the pruning, are found
+    early. The search tree may also be split across a process pool, in
+    which case the workers share the energy of the num_to_return-th best
+    ordering found so far to prune each other's subtrees.
+
     An alternative (possibly more intuitive) interface to this class is the
     order disordered structure transformation.
 
@@ -397,14 +879,21 @@ class EwaldMinimizer:
             self._matrix will not be the same as the input matrix.
         m_list: list of manipulations. each item is of the form
             (multiplication fraction, number_of_indices, indices, species)
-            These are sorted such that the first manipulation contains the
-            most permutations. this is actually evaluated last in the
-            recursion since I'm using pop.
+            Manipulations with the fewest permutations are performed first.
         num_to_return: The minimizer will find the number_returned lowest
             energy structures. This is likely to return a number of duplicate
             structures so it may be necessary to overestimate and then
             remove the duplicates later. (duplicate checking in this
             process is extremely expensive)
+        algo: Algorithm to use. ALGO_FAST (default) finds the num_to_return
+            lowest energy orderings. ALGO_BEST_FIRST stops as soon as
+            num_to_return complete orderings have been found.
+            ALGO_TIME_LIMIT slowly increases the speed (with the cost of
+            decreasing accuracy) as the minimizer runs, to limit the run time
+            to approximately TIME_LIMIT seconds.
+        ncpus (int): Number of processes to split the search tree across.
+            Defaults to None, which means that the search is done in the
+            current process.
     """
 
     ALGO_FAST = 0
@@ -418,15 +907,14 @@ class EwaldMinimizer:
     """
     ALGO_TIME_LIMIT = 3
 
-    def __init__(self, matrix, m_list, num_to_return=1, algo=ALGO_FAST):
+    TIME_LIMIT = 1800
+
+    def __init__(self, matrix, m_list, num_to_return=1, algo=ALGO_FAST,
+                 ncpus=None):
         # Setup and checking of inputs
-        self._matrix = copy(matrix)
+        matrix = np.array(matrix, dtype=np.float)
         # Make the matrix diagonally symmetric (so matrix[i,:] == matrix[:,j])
-        for i in range(len(self._matrix)):
-            for j in range(i, len(self._matrix)):
-                value = (self._matrix[i, j] + self._matrix[j, i]) / 2
-                self._matrix[i, j] = value
-                self._matrix[j, i] = value
+        self._matrix = (matrix + matrix.T) / 2
 
         # sort the m_list based on number of permutations
         self._m_list = sorted(m_list, key=lambda x: comb(len(x[2]), x[1]),
@@ -438,13 +926,16 @@ class EwaldMinimizer:
         self._current_minimum = float('inf')
         self._num_to_return = num_to_return
         self._algo = algo
+        self._ncpus = ncpus
         if algo == EwaldMinimizer.ALGO_COMPLETE:
             raise NotImplementedError('Complete algo not yet implemented for '
                                       'EwaldMinimizer')
 
         self._output_lists = []
-        # Tag that the recurse function looks at at each level. If a method
-        # sets this to true it breaks the recursion and stops the search.
+        self._stats = {}
+        # Tag that the deprecated _recurse function looks at at each level.
+        # If a method sets this to true it breaks the recursion and stops the
+        # search.
         self._finished = False
 
         self._start_time = datetime.utcnow()
@@ -457,33 +948,96 @@ class EwaldMinimizer:
     def minimize_matrix(self):
         """
         This method finds and returns the permutations that produce the lowest
-        ewald sum calls recursive function to iterate through permutations
+        ewald sum.
         """
-        if self._algo == EwaldMinimizer.ALGO_FAST or \
-                        self._algo == EwaldMinimizer.ALGO_BEST_FIRST:
-            return self._recurse(self._matrix, self._m_list,
-                                 set(range(len(self._matrix))))
+        # The manipulation with the fewest permutations is done first.
+        groups = [(m[0], m[1], list(m[2]), m[3])
+                  for m in reversed(self._m_list)]
+        search = _EwaldBranchAndBound(
+            self._matrix, groups, self._num_to_return,
+            stop_when_full=self._algo == EwaldMinimizer.ALGO_BEST_FIRST,
+            time_limit=self.TIME_LIMIT
+            if self._algo == EwaldMinimizer.ALGO_TIME_LIMIT else None)
+
+        if self._ncpus and self._ncpus > 1 and \
+                self._algo == EwaldMinimizer.ALGO_FAST:
+            import multiprocessing as mp
+            nodes = search.split(4 * self._ncpus)
+            args = [(self._matrix, groups, self._num_to_return,
+                     nodes[i::self._ncpus]) for i in range(self._ncpus)]
+            # Energy of the num_to_return-th best ordering found by any
+            # worker, which bounds the search in all of them.
+            cutoff = mp.Value("d", search.cutoff)
+            p = mp.Pool(self._ncpus, initializer=_init_ewald_worker,
+                        initargs=(cutoff,))
+            try:
+                results = p.map(_run_ewald_search, args)
+            finally:
+                p.close()
+                p.join()
+            for leaves, stats in results:
+                for energy, chosen in leaves:
+                    search.add_leaf(energy, chosen)
+                for k, v in stats.items():
+                    if k == "max_queue":
+                        search.stats[k] = max(search.stats[k], v)
+                    elif k != "time":
+                        search.stats[k] += v
+            search.stats["time"] = (datetime.utcnow() -
+                                    search.start_time).total_seconds()
+        else:
+            search.run()
+
+        for energy, chosen in search.leaves:
+            self.add_m_list(energy, [[i, groups[g][3]] for i, g in chosen])
+        self._stats = search.stats
 
     def add_m_list(self, matrix_sum, m_list):
         """
         This adds an m_list to the output_lists and updates the current
         minimum if the list is full.
         """
-        if self._output_lists is None:
-            self._output_lists = [[matrix_sum, m_list]]
-        else:
-            bisect.insort(self._output_lists, [matrix_sum, m_list])
+        bisect.insort(self._output_lists, [matrix_sum, m_list])
         if self._algo == EwaldMinimizer.ALGO_BEST_FIRST and \
-                        len(self._output_lists) == self._num_to_return:
+                len(self._output_lists) == self._num_to_return:
             self._finished = True
         if len(self._output_lists) > self._num_to_return:
             self._output_lists.pop()
         if len(self._output_lists) == self._num_to_return:
             self._current_minimum = self._output_lists[-1][0]
 
+    @deprecated(message="best_case is no longer used by the branch and bound "
+                        "search of EwaldMinimizer. Will be removed in "
+                        "pymatgen 5.0.")
     def best_case(self, matrix, m_list, indices_left):
         """
         Computes a best case given a matrix and manipulation list.
+        """
+        return self._get_best_case(matrix, m_list, indices_left)
+
+    @deprecated(message="get_next_index is no longer used by the branch and "
+                        "bound search of EwaldMinimizer. Will be removed in "
+                        "pymatgen 5.0.")
+    def get_next_index(self, matrix, manipulation, indices_left):
+        """
+        Returns an index that should have the most negative effect on the
+        matrix sum
+        """
+        return self._get_next_index(matrix, manipulation, indices_left)
+
+    @deprecated(message="_recurse has been replaced by the branch and bound "
+                        "search in minimize_matrix. Will be removed in "
+                        "pymatgen 5.0.")
+    def _recurse(self, matrix, m_list, indices, output_m_list=[]):
+        """
+        Recursively finds the minimal permutations using the previous binary
+        tree search. Found orderings are added to output_lists.
+        """
+        self._recurse_search(matrix, m_list, indices, output_m_list)
+
+    def _get_best_case(self, matrix, m_list, indices_left):
+        """
+        Computes a best case given a matrix and manipulation list.
 
         Args:
             matrix: the current matrix (with some permutations already
@@ -523,7 +1077,7 @@ class EwaldMinimizer:
 
         if self._algo == self.ALGO_TIME_LIMIT:
             elapsed_time = datetime.utcnow() - self._start_time
-            speedup_parameter = elapsed_time.total_seconds() / 1800
+            speedup_parameter = elapsed_time.total_seconds() / self.TIME_LIMIT
             avg_int = np.sum(interaction_matrix, axis=None)
             avg_frac = np.average(np.outer(1 - fractions, 1 - fractions))
             average_correction = avg_int * avg_frac
@@ -536,7 +1090,7 @@ class EwaldMinimizer:
 
         return best_case
 
-    def get_next_index(self, matrix, manipulation, indices_left):
+    def _get_next_index(self, matrix, manipulation, indices_left):
         """
         Returns an index that should have the most negative effect on the
         matrix sum
@@ -551,10 +1105,10 @@ class EwaldMinimizer:
 
         return next_index
 
-    def _recurse(self, matrix, m_list, indices, output_m_list=[]):
+    def _recurse_search(self, matrix, m_list, indices, output_m_list=[]):
         """
         This method recursively finds the minimal permutations using a binary
-        tree search strategy.
+        tree search strategy. Found orderings are added to output_lists.
 
         Args:
             matrix: The current matrix (with some permutations already
@@ -583,10 +1137,11 @@ class EwaldMinimizer:
             return
 
         if len(m_list) == 1 or m_list[-1][1] > 1:
-            if self.best_case(matrix, m_list, indices) > self._current_minimum:
+            if self._get_best_case(matrix, m_list, indices) > \
+                    self._current_minimum:
                 return
 
-        index = self.get_next_index(matrix, m_list[-1], indices)
+        index = self._get_next_index(matrix, m_list[-1], indices)
 
         m_list[-1][2].remove(index)
 
@@ -605,8 +1160,8 @@ class EwaldMinimizer:
 
         # recurse through both the modified and unmodified matrices
 
-        self._recurse(matrix2, m_list2, indices2, output_m_list2)
-        self._recurse(matrix, m_list, indices, output_m_list)
+        self._recurse_search(matrix2, m_list2, indices2, output_m_list2)
+        self._recurse_search(matrix, m_list, indices, output_m_list)
 
     @property
     def best_m_list(self):
@@ -620,6 +1175,290 @@ class EwaldMinimizer:
     def output_lists(self):
         return self._output_lists
 
+    @property
+    def stats(self):
+        """
+        Statistics of the search as a dict with the number of expanded nodes
+        ("nodes"), nodes discarded by the bound ("pruned"), complete
+        orderings evaluated ("leaves"), the largest size of the priority
+        queue ("max_queue") and the wall time in seconds ("time").
+        """
+        return self._stats
+
+
+class _EwaldBranchAndBound(object):
+    """
+    Best-first branch and bound used by EwaldMinimizer. A node is a tuple
+    (chosen, group, left, excluded), where chosen is a tuple of (index,
+    group) pairs already manipulated, group the manipulation currently being
+    performed, left the number of indices still to be chosen for it and
+    excluded the indices that have been rejected for it.
+
+    If time_limit is given, the bounds are relaxed toward the energies of
+    the partial orderings in proportion to the elapsed time, so that the
+    search prunes more aggressively (and less accurately) as it runs. A
+    multiprocessing Value may be given as shared_cutoff to share the energy
+    of the num_to_return-th best ordering between processes.
+    """
+
+    def __init__(self, matrix, groups, num_to_return, stop_when_full=False,
+                 time_limit=None, shared_cutoff=None):
+        self.matrix = matrix
+        self.groups = groups
+        self.num_to_return = num_to_return
+        self.stop_when_full = stop_when_full
+        self.time_limit = time_limit
+        self.shared_cutoff = shared_cutoff
+        self.diag = np.diag(matrix)
+        self.fractions = np.array([g[0] for g in groups], dtype=np.float)
+        self.members = np.zeros((len(groups), len(matrix)), dtype=bool)
+        for g, group in enumerate(groups):
+            self.members[g, group[2]] = True
+        self.leaves = []
+        self.stats = {"nodes": 0, "pruned": 0, "leaves": 0, "max_queue": 0,
+                      "time": 0}
+        self.start_time = datetime.utcnow()
+        self._counter = itertools.count()
+
+    @property
+    def cutoff(self):
+        cutoff = float("inf")
+        if len(self.leaves) >= self.num_to_return:
+            cutoff = self.leaves[-1][0]
+        if self.shared_cutoff is not None:
+            cutoff = min(cutoff, self.shared_cutoff.value)
+        return cutoff
+
+    def add_leaf(self, energy, chosen):
+        self.stats["leaves"] += 1
+        if energy < self.cutoff:
+            bisect.insort(self.leaves, (energy, chosen))
+            if len(self.leaves) > self.num_to_return:
+                self.leaves.pop()
+            if self.shared_cutoff is not None and \
+                    len(self.leaves) == self.num_to_return:
+                with self.shared_cutoff.get_lock():
+                    self.shared_cutoff.value = min(self.shared_cutoff.value,
+                                                   self.leaves[-1][0])
+
+    def _normalize(self, node):
+        """
+        Moves on to the next manipulation once the current one is complete.
+        Returns None for leaves.
+        """
+        chosen, group, left, excluded = node
+        while left == 0:
+            group += 1
+            if group == len(self.groups):
+                return None
+            left = self.groups[group][1]
+            excluded = frozenset()
+        return chosen, group, left, excluded
+
+    def _get_state(self, chosen):
+        """
+        Returns the scaling factors of all indices and a mask of the indices
+        that have not been manipulated yet.
+        """
+        f = np.ones(len(self.matrix))
+        free = np.ones(len(self.matrix), dtype=bool)
+        if chosen:
+            inds, groups = zip(*chosen)
+            inds = list(inds)
+            f[inds] = self.fractions[list(groups)]
+            free[inds] = False
+        return f, free
+
+    def _get_candidates(self, group, free, excluded):
+        mask = self.members[group] & free
+        if excluded:
+            mask[list(excluded)] = False
+        return mask
+
+    def evaluate(self, node):
+        """
+        Returns (bound, node), where bound is a lower bound to the energy of
+        all orderings below the node, or the exact energy for leaves, in
+        which case node is None. Infeasible nodes have an infinite bound.
+        """
+        f, free = self._get_state(node[0])
+        v = np.dot(self.matrix, f)
+        energy = np.dot(f, v)
+
+        node = self._normalize(node)
+        if node is None:
+            return energy, None
+        _, group, left, excluded = node
+
+        remaining = []
+        for g in range(group, len(self.groups)):
+            if g == group:
+                num = left
+                mask = self._get_candidates(g, free, excluded)
+            else:
+                num = self.groups[g][1]
+                mask = self.members[g] & free
+            if num > np.count_nonzero(mask):
+                return float("inf"), node
+            if num > 0:
+                remaining.append((self.fractions[g] - 1, num, mask))
+
+        all_cands = np.any([r[2] for r in remaining], axis=0)
+        num_left = sum(r[1] for r in remaining)
+        if num_left > np.count_nonzero(all_cands):
+            return float("inf"), node
+
+        # Range of the possible changes in scaling factor of each candidate.
+        dmin = np.full(len(f), np.inf)
+        dmax = np.full(len(f), -np.inf)
+        for d, num, mask in remaining:
+            dmin[mask] = np.minimum(dmin[mask], d)
+            dmax[mask] = np.maximum(dmax[mask], d)
+        dmin = dmin[all_cands]
+        dmax = dmax[all_cands]
+
+        bound = energy
+        for d, num, mask in remaining:
+            # Exact energy change of scaling each candidate on its own.
+            changes = 2 * d * v[mask] + d ** 2 * self.diag[mask]
+            if num_left > 1 and d != 0:
+                # Most negative interactions with the other chosen indices,
+                # excluding the interaction of each candidate with itself.
+                t = d * self.matrix[mask][:, all_cands]
+                inter = np.minimum(t * dmin, t * dmax)
+                inter[np.arange(len(t)), np.where(mask[all_cands])[0]] = \
+                    np.inf
+                changes += np.sum(np.partition(inter, num_left - 2, axis=1)
+                                  [:, :num_left - 1], axis=1)
+            bound += np.sum(np.partition(changes, num - 1)[:num])
+
+        if self.time_limit is not None:
+            speedup = (datetime.utcnow() -
+                       self.start_time).total_seconds() / self.time_limit
+            bound = speedup * energy + (1 - speedup) * bound
+        return bound, node
+
+    def expand(self, node):
+        """
+        Branches on the index of the current manipulation with the most
+        negative effect on the energy. Returns the [(bound, node, child)]
+        for including and excluding it, where node is the child moved on to
+        the next manipulation if needed or None for complete orderings.
+        """
+        chosen, group, left, excluded = node
+        f, free = self._get_state(chosen)
+        cands = np.where(self._get_candidates(group, free, excluded))[0]
+        d = self.fractions[group] - 1
+        changes = 2 * d * np.dot(self.matrix[cands], f) + \
+            d ** 2 * self.diag[cands]
+        index = int(cands[np.argmin(changes)])
+        children = [(chosen + ((index, group),), group, left - 1, excluded),
+                    (chosen, group, left, excluded | frozenset([index]))]
+        return [self.evaluate(child) + (child,) for child in children]
+
+    def _done(self):
+        return self.stop_when_full and len(self.leaves) >= self.num_to_return
+
+    def _push(self, queue, bound, node):
+        heapq.heappush(queue, (bound, -len(node[0]), next(self._counter),
+                               node))
+
+    def run(self, nodes=None):
+        """
+        Runs the search from the given nodes, or the root if None.
+        """
+        queue = []
+        for node in nodes or [((), 0, self.groups[0][1], frozenset())]:
+            bound, normalized = self.evaluate(node)
+            if normalized is None:
+                self.add_leaf(bound, node[0])
+            elif bound < self.cutoff:
+                self._push(queue, bound, normalized)
+
+        while queue and not self._done():
+            bound, _, _, node = heapq.heappop(queue)
+            if bound >= self.cutoff:
+                # Everything left in the queue is bounded by this.
+                self.stats["pruned"] += len(queue) + 1
+                break
+            # Dive depth first from the most promising node, always taking
+            # the branch that manipulates the most favorable index, as this
+            # quickly finds good complete orderings that tighten the cutoff.
+            # The other branch is left on the queue.
+            while node is not None and not self._done():
+                self.stats["nodes"] += 1
+                if self.stats["nodes"] % 10000 == 0:
+                    logger.debug("EwaldMinimizer: {} nodes expanded, {} "
+                                 "pruned, queue size {}".format(
+                                     self.stats["nodes"],
+                                     self.stats["pruned"], len(queue)))
+                next_node = None
+                for cbound, cnode, child in self.expand(node):
+                    if cnode is None:
+                        self.add_leaf(cbound, child[0])
+                    elif cbound >= self.cutoff:
+                        self.stats["pruned"] += 1
+                    elif next_node is None:
+                        next_node = cnode
+                    else:
+                        self._push(queue, cbound, cnode)
+                self.stats["max_queue"] = max(self.stats["max_queue"],
+                                              len(queue))
+                node = next_node
+
+        self.stats["time"] = (datetime.utcnow() -
+                              self.start_time).total_seconds()
+        return self.leaves
+
+    def split(self, num_nodes):
+        """
+        Expands the search tree breadth first by bound until there are at
+        least num_nodes open nodes, e.g., to distribute them over a process
+        pool. Complete orderings found on the way are added to the leaves.
+        """
+        queue = []
+        self._push(queue, 0, ((), 0, self.groups[0][1], frozenset()))
+        while queue and len(queue) < num_nodes:
+            bound, _, _, node = heapq.heappop(queue)
+            normalized = self._normalize(node)
+            if normalized is None:
+                self.add_leaf(self.evaluate(node)[0], node[0])
+                continue
+            self.stats["nodes"] += 1
+            for cbound, cnode, child in self.expand(normalized):
+                if cnode is None:
+                    self.add_leaf(cbound, child[0])
+                elif cbound < float("inf"):
+                    self._push(queue, cbound, cnode)
+                else:
+                    self.stats["pruned"] += 1
+        return [node for bound, _, _, node in sorted(queue)]
+
+
+_worker_cutoff = None
+
+
+def _init_ewald_worker(cutoff):
+    """
+    Sets the cutoff shared by the EwaldMinimizer searches of a worker
+    process.
+    """
+    global _worker_cutoff
+    _worker_cutoff = cutoff
+
+
+def _run_ewald_search(args):
+    """
+    Runs an EwaldMinimizer search over a subset of nodes of the search tree
+    in a separate process.
+    """
+    matrix, groups, num_to_return, nodes = args
+    search = _EwaldBranchAndBound(matrix, groups, num_to_return,
+                                  shared_cutoff=_worker_cutoff)
+    if nodes:
+        search.run(nodes)
+    return search.leaves, search.stats
+
 
 def compute_average_oxidation_state(site):
     """
@@ -221,6 +221,70 @@ class PourbaixAnalyzer(object):
         nPhi = -entry.nPhi
         return g0 - npH * pH - nPhi * V
 
+    def get_energy_grid(self, entries, pH, V):
+        """
+        Get free energies of entries on a grid of pH and V, as computed by
+        g for each entry and grid point.
+
+        Args:
+            entries ([PourbaixEntry]): Entries.
+            pH ([float]): 1D array of pH values.
+            V ([float]): 1D array of potentials.
+
+        Returns:
+            (len(entries), len(pH), len(V)) array of free energies.
+        """
+        pH = np.array(pH, dtype=np.float)
+        V = np.array(V, dtype=np.float)
+        g0 = np.array([entry.g0 for entry in entries])
+        npH = np.array([-entry.npH * 0.0591 for entry in entries])
+        nPhi = np.array([-entry.nPhi for entry in entries])
+        return g0[:, None, None] - npH[:, None, None] * pH[None, :, None] - \
+            nPhi[:, None, None] * V[None, None, :]
+
+    def get_stable_domain_grid(self, pH, V):
+        """
+        Get the stable entry at each point of a grid of pH and V, e.g., for
+        dense Pourbaix stability maps.
+
+        Args:
+            pH ([float]): 1D array of pH values.
+            V ([float]): 1D array of potentials.
+
+        Returns:
+            (stable_inds, stable_energies), which are (len(pH), len(V))
+            arrays of the indices in pd.stable_entries of the stable entry
+            and of its free energy at each grid point.
+        """
+        stable_inds = np.zeros((len(pH), len(V)), dtype=np.int)
+        stable_energies = np.full((len(pH), len(V)), np.inf)
+        # One entry at a time to avoid a (nentries, npH, nV) array.
+        for i, entry in enumerate(self._pd.stable_entries):
+            energies = self.get_energy_grid([entry], pH, V)[0]
+            lower = energies < stable_energies
+            stable_inds[lower] = i
+            stable_energies[lower] = energies[lower]
+        return stable_inds, stable_energies
+
+    def get_energy_above_stable_grid(self, entries, pH, V):
+        """
+        Get the free energies of entries above the stable entry on a grid
+        of pH and V, i.e., their decomposition energies in the Pourbaix
+        diagram.
+
+        Args:
+            entries ([PourbaixEntry]): Entries, normalized in the same way
+                as the entries of the Pourbaix diagram.
+            pH ([float]): 1D array of pH values.
+            V ([float]): 1D array of potentials.
+
+        Returns:
+            (len(entries), len(pH), len(V)) array of free energies above
+            the stable entry.
+        """
+        stable_energies = self.get_stable_domain_grid(pH, V)[1]
+        return self.get_energy_grid(entries, pH, V) - stable_energies
+
     def get_decomposition(self, entry):
         """
         Provides the decomposition at a particular composition
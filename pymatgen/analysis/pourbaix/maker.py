@@ -22,7 +22,6 @@ __date__ = "Nov 1, 2012"
 
 import logging
 import numpy as np
-import itertools
 from itertools import chain
 from pyhull.convex_hull import ConvexHull
 from pymatgen.analysis.pourbaix.entry import MultiEntry, ion_or_solid_comp_object
@@ -42,8 +41,13 @@ class PourbaixDiagram(object):
     Args:
         entries: Entries list containing both Solids and Ions
         comp_dict: Dictionary of compositions
+        prune_entries: For multi-element diagrams, whether to discard
+            single-element entries that are unstable in the Pourbaix
+            diagram of their element before combining entries. This does
+            not change the stable entries, but unstable combinations
+            containing these entries are left out of all_entries.
     """
-    def __init__(self, entries, comp_dict=None):
+    def __init__(self, entries, comp_dict=None, prune_entries=True):
         self._solid_entries = list()
         self._ion_entries = list()
         for entry in entries:
@@ -59,6 +63,7 @@ class PourbaixDiagram(object):
                             "is required to make a Pourbaix Diagram")
         self._unprocessed_entries = self._solid_entries + self._ion_entries
         self._elt_comp = comp_dict
+        self._prune_entries = prune_entries
         if comp_dict:
             self._multielement = True
             pbx_elements = set()
@@ -122,24 +127,18 @@ class PourbaixDiagram(object):
 
     def _process_multielement_entries(self):
         """
-        Create entries for multi-element Pourbaix construction
+        Create entries for multi-element Pourbaix construction. Combinations
+        of entries are generated lazily, skipping those which cannot be
+        mixed to the set composition with positive weights.
         """
         N = len(self._elt_comp)  # No. of elements
         entries = self._unprocessed_entries
-        el_list = self._elt_comp.keys()
+        if self._prune_entries:
+            entries = _get_single_element_stable_entries(entries)
+        el_list = list(self._elt_comp.keys())
         comp_list = [self._elt_comp[el] for el in el_list]
-        list_of_entries = list()
-        for j in range(1, N + 1):
-            list_of_entries += list(itertools.combinations(
-                                list(range(len(entries))), j))
         processed_entries = list()
-        for entry_list in list_of_entries:
-            # Check if all elements in composition list are present in
-            # entry_list
-            if not (set([Element(el) for el in el_list]).issubset(
-                    set(list(chain.from_iterable([entries[i].composition.keys()
-                                                  for i in entry_list]))))):
-                continue
+        for entry_list in _get_entry_combinations(entries, el_list, N):
             if len(entry_list) == 1:
                 # If only one entry in entry_list, then check if the composition matches with the set composition. 
                 entry = entries[entry_list[0]]
@@ -178,7 +177,7 @@ class PourbaixDiagram(object):
             try:
                 weights = np.linalg.solve(np.array(A), np.array(b))
             except np.linalg.linalg.LinAlgError as err:
-                if 'Singular matrix' in err.message:
+                if 'Singular matrix' in str(err):
                     continue
                 else:
                     raise Exception("Unknown Error message!")
@@ -203,60 +202,7 @@ class PourbaixDiagram(object):
         if len(self._qhull_data) == dim:
             self._facets = [list(range(dim))]
         else:
-            facets_pyhull = np.array(ConvexHull(self._qhull_data).vertices)
-            self._facets = np.sort(np.array(facets_pyhull))
-            logger.debug("Final facets are\n{}".format(self._facets))
-
-            logger.debug("Removing vertical facets...")
-            vert_facets_removed = list()
-            for facet in self._facets:
-                facetmatrix = np.zeros((len(facet), len(facet)))
-                count = 0
-                for vertex in facet:
-                    facetmatrix[count] = np.array(self._qhull_data[vertex])
-                    facetmatrix[count, dim - 1] = 1
-                    count += 1
-                if abs(np.linalg.det(facetmatrix)) > 1e-8:
-                    vert_facets_removed.append(facet)
-                else:
-                    logger.debug("Removing vertical facet : {}".format(facet))
-
-            logger.debug("Removing UCH facets by eliminating normal.z >0 ...")
-
-            # Find center of hull
-            vertices = set()
-            for facet in vert_facets_removed:
-                for vertex in facet:
-                    vertices.add(vertex)
-            c = [0.0, 0.0, 0.0]
-            c[0] = np.average([self._qhull_data[vertex][0]
-                               for vertex in vertices])
-            c[1] = np.average([self._qhull_data[vertex][1]
-                               for vertex in vertices])
-            c[2] = np.average([self._qhull_data[vertex][2]
-                               for vertex in vertices])
-
-            # Shift origin to c
-            new_qhull_data = np.array(self._qhull_data)
-            for vertex in vertices:
-                new_qhull_data[vertex] -= c
-
-            # For each facet, find normal n, find dot product with P, and
-            # check if this is -ve
-            final_facets = list()
-            for facet in vert_facets_removed:
-                a = new_qhull_data[facet[1]] - new_qhull_data[facet[0]]
-                b = new_qhull_data[facet[2]] - new_qhull_data[facet[0]]
-                n = np.cross(a, b)
-                val = np.dot(n, new_qhull_data[facet[0]])
-                if val < 0:
-                    n = -n
-                if n[2] <= 0:
-                    final_facets.append(facet)
-                else:
-                    logger.debug("Removing UCH facet : {}".format(facet))
-            final_facets = np.array(final_facets)
-            self._facets = final_facets
+            self._facets = _get_lower_hull_facets(self._qhull_data)
 
         stable_vertices = set()
         for facet in self._facets:
@@ -322,3 +268,165 @@ class PourbaixDiagram(object):
         Return unprocessed entries
         """
         return self._unprocessed_entries
+
+
+def _get_lower_hull_facets(qhull_data):
+    """
+    Facets of the lower convex hull of Pourbaix hull data, i.e., the convex
+    hull without vertical facets and facets of the upper convex hull.
+
+    Args:
+        qhull_data: Rows of [npH, nPhi, g0] of normalized entries.
+
+    Returns:
+        Array of facets.
+    """
+    dim = len(qhull_data[0])
+    facets_pyhull = np.array(ConvexHull(qhull_data).vertices)
+    facets = np.sort(np.array(facets_pyhull))
+    logger.debug("Final facets are\n{}".format(facets))
+
+    logger.debug("Removing vertical facets...")
+    vert_facets_removed = list()
+    for facet in facets:
+        facetmatrix = np.zeros((len(facet), len(facet)))
+        count = 0
+        for vertex in facet:
+            facetmatrix[count] = np.array(qhull_data[vertex])
+            facetmatrix[count, dim - 1] = 1
+            count += 1
+        if abs(np.linalg.det(facetmatrix)) > 1e-8:
+            vert_facets_removed.append(facet)
+        else:
+            logger.debug("Removing vertical facet : {}".format(facet))
+
+    logger.debug("Removing UCH facets by eliminating normal.z >0 ...")
+
+    # Find center of hull
+    vertices = set()
+    for facet in vert_facets_removed:
+        for vertex in facet:
+            vertices.add(vertex)
+    c = [0.0, 0.0, 0.0]
+    c[0] = np.average([qhull_data[vertex][0]
+                       for vertex in vertices])
+    c[1] = np.average([qhull_data[vertex][1]
+                       for vertex in vertices])
+    c[2] = np.average([qhull_data[vertex][2]
+                       for vertex in vertices])
+
+    # Shift origin to c
+    new_qhull_data = np.array(qhull_data)
+    for vertex in vertices:
+        new_qhull_data[vertex] -= c
+
+    # For each facet, find normal n, find dot product with P, and
+    # check if this is -ve
+    final_facets = list()
+    for facet in vert_facets_removed:
+        a = new_qhull_data[facet[1]] - new_qhull_data[facet[0]]
+        b = new_qhull_data[facet[2]] - new_qhull_data[facet[0]]
+        n = np.cross(a, b)
+        val = np.dot(n, new_qhull_data[facet[0]])
+        if val < 0:
+            n = -n
+        if n[2] <= 0:
+            final_facets.append(facet)
+        else:
+            logger.debug("Removing UCH facet : {}".format(facet))
+    final_facets = np.array(final_facets)
+    return final_facets
+
+
+def _get_single_element_stable_entries(entries):
+    """
+    Removes single-element entries which are not stable in the Pourbaix
+    diagram of their element. A combination of entries containing such an
+    entry is never stable, since at any pH and potential it is dominated by
+    the same combination with a stable entry of that element.
+
+    Args:
+        entries: PourbaixEntries.
+
+    Returns:
+        List of entries, in the original order.
+    """
+    groups = {}
+    for i, entry in enumerate(entries):
+        els = [el for el in entry.composition.elements
+               if el.symbol not in ["H", "O"]]
+        if len(els) == 1:
+            groups.setdefault(els[0], []).append(i)
+    unstable = set()
+    for el, inds in groups.items():
+        if len(inds) <= 3:
+            continue
+        data = []
+        for i in inds:
+            entry = entries[i]
+            f = entry.normalization_factor
+            data.append([f * entry.npH, f * entry.nPhi,
+                         f * (entry.g0 - MU_H2O * entry.nH2O) +
+                         entry.conc_term])
+        # The hull is flat, e.g., if all entries are neutral solids with
+        # npH == nPhi, so no entries can be removed.
+        data = np.array(data)
+        if np.linalg.matrix_rank(data[:, :2] - data[0, :2]) < 2 or \
+                np.linalg.matrix_rank(data - data[0]) < 3:
+            continue
+        stable = set(chain.from_iterable(_get_lower_hull_facets(data)))
+        if not stable:
+            continue
+        logger.debug("Removing {} unstable {} entries".format(
+            len(inds) - len(stable), el))
+        unstable.update(i for j, i in enumerate(inds) if j not in stable)
+    return [e for i, e in enumerate(entries) if i not in unstable]
+
+
+def _get_entry_combinations(entries, elements, max_size):
+    """
+    Generates combinations of up to max_size entries lazily, in the order
+    of itertools.combinations with increasing size. Only combinations
+    which contain all elements and whose compositions are linearly
+    independent are generated, since no other combination can be mixed to a
+    composition of the elements with positive weights.
+
+    Args:
+        entries: PourbaixEntries.
+        elements: Symbols of the elements which must be present.
+        max_size: Maximum number of entries in a combination.
+
+    Yields:
+        Tuples of indices of entries.
+    """
+    elements = set(Element(el) for el in elements)
+    el_sets = []
+    for entry in entries:
+        el_sets.append(set(el for el in entry.composition.elements
+                           if el.symbol not in ["H", "O"]))
+    all_els = sorted(set(chain.from_iterable(el_sets)))
+    vecs = np.array([[entry.composition[el] for el in all_els]
+                     for entry in entries], dtype=np.float)
+    max_nel = max(len(els & elements) for els in el_sets)
+
+    def _extend(combo, covered, size):
+        if len(combo) == size:
+            if covered.issuperset(elements):
+                yield tuple(combo)
+            return
+        remaining = size - len(combo) - 1
+        start = combo[-1] + 1 if combo else 0
+        for i in range(start, len(entries) - remaining):
+            new_covered = covered | (el_sets[i] & elements)
+            if len(elements - new_covered) > remaining * max_nel:
+                continue
+            new_combo = combo + [i]
+            if len(new_combo) > 1 and \
+                    np.linalg.matrix_rank(vecs[new_combo]) < len(new_combo):
+                continue
+            for c in _extend(new_combo, new_covered, size):
+                yield c
+
+    for size in range(1, max_size + 1):
+        for c in _extend([], set(), size):
+            yield c
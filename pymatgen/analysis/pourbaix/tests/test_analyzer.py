@@ -7,6 +7,8 @@ from __future__ import unicode_literals
 import unittest2 as unittest
 import os
 
+import numpy as np
+
 from pymatgen.analysis.pourbaix.maker import PourbaixDiagram
 from pymatgen.analysis.pourbaix.entry import PourbaixEntryIO
 
@@ -45,5 +47,24 @@ class TestPourbaixAnalyzer(unittest.TestCase):
             e_above_hull = self.analyzer.get_e_above_hull(entry)
             self.assertAlmostEqual(e_above_hull, self.e_above_hull_test[entry.name], 3)
 
+    def test_get_stable_domain_grid(self):
+        pH = np.linspace(-2, 16, 19)
+        V = np.linspace(-3, 3, 13)
+        inds, energies = self.analyzer.get_stable_domain_grid(pH, V)
+        self.assertEqual(inds.shape, (19, 13))
+        stable = self.pd.stable_entries
+        self.assertEqual(stable[inds[0, 0]].name, "Zn(s)")
+        self.assertEqual(stable[inds[-1, -1]].name, "ZnO2(s)")
+        for i in range(0, 19, 3):
+            for j in range(0, 13, 3):
+                g = [self.analyzer.g(e, pH[i], V[j]) for e in self.pd.all_entries]
+                self.assertAlmostEqual(energies[i, j], min(g))
+                self.assertAlmostEqual(self.analyzer.g(stable[inds[i, j]], pH[i], V[j]), min(g))
+        e_above = self.analyzer.get_energy_above_stable_grid(self.pd.all_entries, pH, V)
+        self.assertEqual(e_above.shape, (len(self.pd.all_entries), 19, 13))
+        self.assertAlmostEqual(e_above.min(axis=0).max(), 0)
+        self.assertAlmostEqual(e_above[0, 4, 5],
+                               self.analyzer.g(self.pd.all_entries[0], pH[4], V[5]) - energies[4, 5])
+
 if __name__ == '__main__':
     unittest.main()
@@ -7,16 +7,21 @@ from __future__ import unicode_literals
 import unittest2 as unittest
 import os
 
-from pymatgen.analysis.pourbaix.maker import PourbaixDiagram
-from pymatgen.analysis.pourbaix.entry import PourbaixEntryIO
+from pymatgen.analysis.pourbaix.maker import PourbaixDiagram, \
+    _get_entry_combinations
+from pymatgen.analysis.pourbaix.entry import PourbaixEntryIO, \
+    PourbaixEntry, IonEntry
+from pymatgen.phasediagram.entries import PDEntry
+from pymatgen.core.ion import Ion
+from pymatgen.core.composition import Composition
 
 
 class TestPourbaixDiagram(unittest.TestCase):
 
     def setUp(self):
         module_dir = os.path.dirname(os.path.abspath(__file__))
-        (elements, entries) = PourbaixEntryIO.from_csv(os.path.join(module_dir,
-                                                    "test_entries.csv"))
+        self._filename = os.path.join(module_dir, "test_entries.csv")
+        (elements, entries) = PourbaixEntryIO.from_csv(self._filename)
         self._entries = entries
         self._pd = PourbaixDiagram(entries)
         self.list_of_stable_entries = ["ZnO(s)", "Zn[2+]", "ZnO2(s)", "ZnHO2[-]", "ZnO2[2-]", "Zn(s)"]
@@ -27,5 +32,55 @@ class TestPourbaixDiagram(unittest.TestCase):
         for entry in self._pd.stable_entries:
             self.assertIn(entry.name, self.list_of_stable_entries, "List of stable entries does not match")
 
+    def _get_zn_fe_entries(self):
+        entries = PourbaixEntryIO.from_csv(self._filename)[1]
+        for formula, energy in [("Fe", 0.0), ("FeO", -2.6), ("Fe2O3", -7.6),
+                                ("Fe3O4", -10.5), ("ZnFe2O4", -11.5)]:
+            entries.append(PourbaixEntry(PDEntry(Composition(formula),
+                                                 energy)))
+        for formula, energy in [("Fe[2+]", -0.94), ("Fe[3+]", -0.05),
+                                ("FeOH[+]", -2.8), ("HFeO2[-]", -3.9)]:
+            entry = PourbaixEntry(IonEntry(Ion.from_formula(formula),
+                                           energy))
+            entry.conc = 1e-6
+            entries.append(entry)
+        return entries
+
+    def test_multielement(self):
+        comp_dict = {"Zn": 0.5, "Fe": 0.5}
+        pd = PourbaixDiagram(self._get_zn_fe_entries(), comp_dict=comp_dict)
+        pd_all = PourbaixDiagram(self._get_zn_fe_entries(),
+                                 comp_dict=comp_dict, prune_entries=False)
+        self.assertEqual(len(pd.all_entries), 42)
+        self.assertEqual(len(pd_all.all_entries), 72)
+        names = sorted(e.name for e in pd.stable_entries)
+        self.assertEqual(names, sorted(e.name for e in pd_all.stable_entries))
+        self.assertEqual(len(names), 19)
+        self.assertIn("ZnO(s) + Zn(FeO2)2(s)", names)
+
+        # Only neutral Fe solids, whose single-element hull is flat.
+        entries = [e for e in self._get_zn_fe_entries()
+                   if e.phase_type == "Solid" or "Fe" not in e.name]
+        pd = PourbaixDiagram(entries, comp_dict=comp_dict)
+        entries = [e for e in self._get_zn_fe_entries()
+                   if e.phase_type == "Solid" or "Fe" not in e.name]
+        pd_all = PourbaixDiagram(entries, comp_dict=comp_dict,
+                                 prune_entries=False)
+        self.assertEqual(sorted(e.name for e in pd.stable_entries),
+                         sorted(e.name for e in pd_all.stable_entries))
+        self.assertTrue(any("Fe" in e.name for e in pd.stable_entries))
+
+    def test_get_entry_combinations(self):
+        entries = self._get_zn_fe_entries()
+        combos = list(_get_entry_combinations(entries, ["Zn", "Fe"], 2))
+        names = [tuple(entries[i].name for i in c) for c in combos]
+        self.assertEqual(names[0], ("Zn(FeO2)2(s)",))
+        # Entries of the same element are never combined.
+        for c in combos[1:]:
+            self.assertEqual(len(c), 2)
+            self.assertNotEqual(entries[c[0]].composition.elements,
+                                entries[c[1]].composition.elements)
+        self.assertEqual(len(combos), 1 + 8 * 8 + 2 * 8)
+
 if __name__ == '__main__':
     unittest.main()
@@ -15,6 +15,7 @@ from six.moves import zip
 import numpy as np
 import itertools
 import abc
+import collections
 
 from monty.json import MSONable
 from pymatgen.core.structure import Structure
@@ -25,6 +26,7 @@ from pymatgen.core.periodic_table import get_el_sp
 from pymatgen.optimization.linear_assignment import LinearAssignment
 from pymatgen.util.coord_utils_cython import pbc_shortest_vectors, is_coord_subset_pbc
 from pymatgen.util.coord_utils import lattice_points_in_supercell
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
 
 __author__ = "William Davidson Richards, Stephen Dacek, Shyue Ping Ong"
 __copyright__ = "Copyright 2011, The Materials Project"
@@ -441,6 +443,23 @@ class StructureMatcher(MSONable):
                 # reorder generator output so s1 is still first
                 yield x[1], x[0], x[2], x[3]
 
+    @staticmethod
+    def _iter_cached(cache, iterator):
+        """
+        Iterates over the items already in cache, and then over the rest of
+        iterator, appending them to cache. Used to share a lazily computed
+        sequence between several loops, each of which may stop early.
+        """
+        i = 0
+        while True:
+            if i == len(cache):
+                try:
+                    cache.append(next(iterator))
+                except StopIteration:
+                    return
+            yield cache[i]
+            i += 1
+
     def _cmp_fstruct(self, s1, s2, frac_tol, mask):
         """
         Returns true if a matching exists between s2 and s2
@@ -638,7 +657,7 @@ class StructureMatcher(MSONable):
                 break_on_match=break_on_match, use_rms=use_rms)
 
     def _strict_match(self, struct1, struct2, fu, s1_supercell=True,
-                      use_rms=False, break_on_match=False):
+                      use_rms=False, break_on_match=False, supercells=None):
         """
         Matches struct2 onto struct1 (which should contain all sites in
         struct2).
@@ -651,6 +670,12 @@ class StructureMatcher(MSONable):
             use_rms (bool): whether to minimize the rms of the matching
             break_on_match (bool): whether to stop search at first
                 valid match
+            supercells (iterable): Output of _get_supercells for
+                struct1 and struct2, e.g., cached with _iter_cached. The
+                lattice mappings depend only on the lattices and
+                coordinates, so they can be shared between matches that
+                differ only by species (e.g., anonymous matching). Computed
+                on the fly if None.
         """
         if fu < 1:
             raise ValueError("fu cannot be less than 1")
@@ -671,8 +696,10 @@ class StructureMatcher(MSONable):
 
         best_match = None
         # loop over all lattices
-        for s1fc, s2fc, avg_l, sc_m in \
-                self._get_supercells(struct1, struct2, fu, s1_supercell):
+        if supercells is None:
+            supercells = self._get_supercells(struct1, struct2, fu,
+                                              s1_supercell)
+        for s1fc, s2fc, avg_l, sc_m in supercells:
             # compute fractional tolerance
             normalization = (len(s1fc) / avg_l.volume) ** (1/3)
             inv_abc = np.array(avg_l.reciprocal_lattice.abc)
@@ -767,6 +794,102 @@ class StructureMatcher(MSONable):
             primitive_cell=d["primitive_cell"], scale=d["scale"],
             comparator=AbstractComparator.from_dict(d["comparator"]))
 
+    def _get_species_mappings(self, struct1, struct2):
+        """
+        Yields candidate species mappings from struct1 to struct2.
+
+        Unless allow_subset is set, a species can only map onto a species
+        that occupies the same fraction of sites, so instead of all
+        permutations of the species only permutations within groups of
+        equal site fractions are generated. If both structures are ordered
+        and have the same space group, the groups are further split by the
+        Wyckoff-like fingerprints of the species (see
+        _get_species_fingerprints). E.g., for Na2Fe2PAsO4S4 this reduces
+        the 720 permutations to 4.
+
+        Args:
+            struct1, struct2 (Structure): Preprocessed input structures
+
+        Yields:
+            {sp1: sp2} dicts mapping all species of struct1 to struct2.
+        """
+        sp1 = struct1.composition.elements
+        sp2 = struct2.composition.elements
+
+        if self._subset:
+            for perm in itertools.permutations(sp2):
+                yield dict(zip(sp1, perm))
+            return
+
+        fracs = [(struct1.composition.get_atomic_fraction(sp), 0, sp)
+                 for sp in sp1]
+        fracs += [(struct2.composition.get_atomic_fraction(sp), 1, sp)
+                  for sp in sp2]
+        fracs.sort(key=lambda x: x[0])
+
+        # cluster species with equal site fractions
+        groups = []
+        for f, i, sp in fracs:
+            if not groups or \
+                    f - groups[-1][0] > Composition.amount_tolerance:
+                groups.append((f, [], []))
+            groups[-1][i + 1].append(sp)
+
+        fp1 = self._get_species_fingerprints(struct1)
+        fp2 = self._get_species_fingerprints(struct2)
+        if fp1 is not None and fp2 is not None and fp1[0] == fp2[0]:
+            # split the groups by fingerprint
+            split_groups = []
+            for f, g1, g2 in groups:
+                by_fp = collections.OrderedDict()
+                for i, (g, fps) in enumerate([(g1, fp1[1]), (g2, fp2[1])]):
+                    for sp in g:
+                        by_fp.setdefault(fps[sp], (f, [], []))[i + 1].append(
+                            sp)
+                split_groups.extend(by_fp.values())
+            groups = split_groups
+
+        if any(len(g1) != len(g2) for f, g1, g2 in groups):
+            return
+
+        for perms in itertools.product(*[itertools.permutations(g2)
+                                         for f, g1, g2 in groups]):
+            sp_mapping = {}
+            for (f, g1, g2), perm in zip(groups, perms):
+                sp_mapping.update(zip(g1, perm))
+            yield sp_mapping
+
+    @staticmethod
+    def _get_species_fingerprints(struct):
+        """
+        Computes a Wyckoff-like fingerprint of each species of an ordered
+        structure: the sorted fractions of the sites of the structure in
+        each of the symmetry orbits occupied by the species. Normalizing by
+        the number of sites makes the fingerprints independent of the
+        choice of supercell.
+
+        Args:
+            struct (Structure): Preprocessed input structure.
+
+        Returns:
+            (space_group_number, {species: fingerprint}), or None if the
+            structure is disordered or its symmetry cannot be determined.
+        """
+        if not struct.is_ordered:
+            return None
+        # A loose tolerance, so that the small distortions allowed by the
+        # matcher do not lower the symmetry.
+        dataset = SpacegroupAnalyzer(struct, symprec=0.1) \
+            .get_symmetry_dataset()
+        if dataset is None:
+            return None
+        orbits = collections.Counter(dataset["equivalent_atoms"])
+        fps = collections.defaultdict(list)
+        for i, count in orbits.items():
+            fps[struct[i].specie].append(count / len(struct))
+        return dataset["number"], {sp: tuple(sorted(f))
+                                   for sp, f in fps.items()}
+
     def _anonymous_match(self, struct1, struct2, fu, s1_supercell=True,
                          use_rms=False, break_on_match=False, single_match=False):
         """
@@ -791,9 +914,9 @@ class StructureMatcher(MSONable):
         s1_comp = struct1.composition
         s2_comp = struct2.composition
         matches = []
-        for perm in itertools.permutations(sp2):
-            sp_mapping = dict(zip(sp1, perm))
-
+        supercells = []
+        sc_iter = None
+        for sp_mapping in self._get_species_mappings(struct1, struct2):
             #do quick check that compositions are compatible
             mapped_comp = Composition({sp_mapping[k]: v
                                        for k, v in s1_comp.items()})
@@ -801,15 +924,28 @@ class StructureMatcher(MSONable):
                                       self._comparator.get_hash(s2_comp):
                 continue
 
+            # the lattice mappings are independent of the species, so they
+            # are computed lazily once and reused for every permutation. A
+            # match found early under break_on_match stops the computation.
+            if sc_iter is None:
+                if swapped:
+                    sc_iter = self._get_supercells(
+                        struct2, struct1, fu, not s1_supercell)
+                else:
+                    sc_iter = self._get_supercells(
+                        struct1, struct2, fu, s1_supercell)
+
             mapped_struct = struct1.copy()
             mapped_struct.replace_species(sp_mapping)
             if swapped:
                 m = self._strict_match(struct2, mapped_struct, fu,
                                        (not s1_supercell), use_rms,
-                                       break_on_match)
+                                       break_on_match,
+                                       self._iter_cached(supercells, sc_iter))
             else:
                 m = self._strict_match(mapped_struct, struct2, fu, s1_supercell,
-                                       use_rms, break_on_match)
+                                       use_rms, break_on_match,
+                                       self._iter_cached(supercells, sc_iter))
             if m:
                 matches.append((sp_mapping, m))
                 if single_match:
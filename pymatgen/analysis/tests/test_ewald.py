@@ -6,9 +6,11 @@ from __future__ import unicode_literals
 
 import unittest2 as unittest
 import os
+import itertools
 import warnings
 
-from pymatgen.analysis.ewald import EwaldSummation, EwaldMinimizer
+from pymatgen.analysis.ewald import EwaldSummation, EwaldMinimizer, \
+    IncrementalEwaldEnergy, ParticleMeshEwaldSummation
 from pymatgen.io.vasp.inputs import Poscar
 import numpy as np
 
@@ -62,6 +64,116 @@ class EwaldSummationTest(unittest.TestCase):
         ham2 = EwaldSummation(original_s)
         self.assertAlmostEqual(ham2.real_space_energy, -502.23549897772602, 4)
 
+    def test_recip_chunks(self):
+        filepath = os.path.join(test_dir, 'POSCAR')
+        s = Poscar.from_file(filepath).structure
+        s.add_oxidation_state_by_element({"Li": 1, "Fe": 2,
+                                          "P": 5, "O": -2})
+        ham = EwaldSummation(s, compute_forces=True)
+        # A tiny memory limit forces one G vector per chunk.
+        ham2 = EwaldSummation(s, compute_forces=True, recip_chunk_mem=1)
+        self.assertTrue(np.allclose(ham.reciprocal_space_energy_matrix,
+                                    ham2.reciprocal_space_energy_matrix))
+        self.assertTrue(np.allclose(ham.forces, ham2.forces))
+        self.assertAlmostEqual(ham2.reciprocal_space_energy,
+                               6.1541071599534654, 4)
+
+    def test_neighbor_list(self):
+        filepath = os.path.join(test_dir, 'POSCAR')
+        s = Poscar.from_file(filepath).structure
+        s.add_oxidation_state_by_element({"Li": 1, "Fe": 2,
+                                          "P": 5, "O": -2})
+        ham = EwaldSummation(s, real_space_cut=6)
+        centers, neighbors, dists, vectors = ham._get_neighbor_list()
+        all_nn = s.get_all_neighbors(6, include_index=True)
+        for i, nn in enumerate(all_nn):
+            self.assertTrue(np.allclose(sorted(d for site, d, j in nn),
+                                        sorted(dists[centers == i])))
+            self.assertEqual(sorted(j for site, d, j in nn),
+                             sorted(neighbors[centers == i]))
+        self.assertTrue(np.allclose(np.sqrt(np.sum(vectors ** 2, axis=1)),
+                                    dists))
+
+
+class ParticleMeshEwaldSummationTest(unittest.TestCase):
+
+    def setUp(self):
+        filepath = os.path.join(test_dir, 'POSCAR')
+        self.s = Poscar.from_file(filepath).structure
+        self.s.add_oxidation_state_by_element({"Fe": 3, "P": 5, "O": -2})
+        self.s.make_supercell([1, 2, 2])
+        np.random.seed(0)
+        self.s.perturb(0.1)
+
+    def test_energy_and_forces(self):
+        ewald = EwaldSummation(self.s, compute_forces=True)
+        pme = ParticleMeshEwaldSummation(self.s, compute_forces=True)
+        self.assertAlmostEqual(pme.total_energy, ewald.total_energy, 2)
+        self.assertTrue(np.allclose(pme.forces, ewald.forces, atol=1e-2))
+        # Same eta and cutoffs as the matrix based summation.
+        ewald = EwaldSummation(self.s, eta=pme.eta, real_space_cut=10,
+                               recip_space_cut=pme._gmax)
+        self.assertAlmostEqual(pme.real_space_energy,
+                               ewald.real_space_energy, 6)
+        self.assertAlmostEqual(pme.point_energy, ewald.point_energy, 6)
+        self.assertAlmostEqual(pme.reciprocal_space_energy,
+                               ewald.reciprocal_space_energy, 2)
+
+        pme8 = ParticleMeshEwaldSummation(self.s, order=8, grid=pme.grid)
+        self.assertEqual(pme8.grid, pme.grid)
+        self.assertAlmostEqual(pme8.total_energy, ewald.total_energy, 3)
+        self.assertRaises(AttributeError, getattr, pme8, "forces")
+        self.assertRaises(ValueError, ParticleMeshEwaldSummation, self.s,
+                          order=5)
+
+
+class IncrementalEwaldEnergyTest(unittest.TestCase):
+
+    def setUp(self):
+        filepath = os.path.join(test_dir, 'POSCAR')
+        self.s = Poscar.from_file(filepath).structure
+        self.s.add_oxidation_state_by_element({"Li": 1, "Fe": 2,
+                                               "P": 5, "O": -2})
+        self.ewald = EwaldSummation(self.s)
+        self.inc = IncrementalEwaldEnergy.from_ewald_summation(self.ewald)
+
+    def test_removals(self):
+        self.assertAlmostEqual(self.inc.energy,
+                               np.sum(self.ewald.total_energy_matrix))
+        delta = self.inc.get_delta_energy(removals=[0, 5, 11])
+        self.assertAlmostEqual(
+            self.inc.energy + delta,
+            self.ewald.compute_partial_energy([0, 5, 11]))
+        # get_delta_energy does not change the state.
+        self.assertAlmostEqual(self.inc.energy,
+                               np.sum(self.ewald.total_energy_matrix))
+        self.inc.apply(removals=[0])
+        self.inc.apply(removals=[5, 11])
+        self.assertAlmostEqual(self.inc.energy,
+                               self.ewald.compute_partial_energy([0, 5, 11]))
+        self.assertEqual(self.inc.charges[5], 0)
+
+    def test_charges_and_swaps(self):
+        o_index = self.s.indices_from_symbol("O")[0]
+        s = self.s.copy()
+        s.replace(0, "O2-")
+        s.replace(o_index, "Fe2+")
+        delta = self.inc.get_delta_energy(swaps=[(0, o_index)])
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.assertAlmostEqual(self.inc.energy + delta,
+                                   EwaldSummation(s).total_energy, 4)
+        self.assertAlmostEqual(
+            delta, self.inc.get_delta_energy(charges={0: -2, o_index: 2}))
+        self.inc.apply(swaps=[(0, o_index)])
+        # Swapping back restores the original energy.
+        self.assertAlmostEqual(self.inc.apply(swaps=[(0, o_index)]), -delta)
+        self.assertAlmostEqual(self.inc.energy,
+                               np.sum(self.ewald.total_energy_matrix))
+        inc = IncrementalEwaldEnergy(self.ewald.total_energy_matrix,
+                                     [0] + self.ewald._oxi_states[1:])
+        self.assertRaises(ValueError, inc.apply, charges={0: 1})
+
 
 class EwaldMinimizerTest(unittest.TestCase):
 
@@ -87,6 +199,51 @@ class EwaldMinimizerTest(unittest.TestCase):
                                "Returned wrong minimum value")
         self.assertEqual(len(e_min.best_m_list), 6,
                          "Returned wrong number of permutations")
+        self.assertEqual(e_min.stats["leaves"], 15)
+        self.assertTrue(e_min.stats["nodes"] > 0)
+
+        # Compare with a brute force enumeration of all orderings.
+        e_min = EwaldMinimizer(matrix, m_list, 5)
+        sym = (matrix + matrix.T) / 2
+        energies = []
+        for a in itertools.combinations([1, 2, 3, 4, 8], 4):
+            for b in itertools.combinations([5, 6, 7], 2):
+                f = np.ones(10)
+                f[list(a)] = 0.9
+                f[list(b)] = -1
+                energies.append(np.dot(f, np.dot(sym, f)))
+        self.assertTrue(np.allclose([o[0] for o in e_min.output_lists],
+                                    sorted(energies)[:5]))
+        self.assertTrue(e_min.stats["pruned"] > 0)
+
+        e_min2 = EwaldMinimizer(matrix, m_list, 5, ncpus=2)
+        self.assertTrue(np.allclose([o[0] for o in e_min.output_lists],
+                                    [o[0] for o in e_min2.output_lists]))
+
+        e_min = EwaldMinimizer(matrix, m_list, 2,
+                               algo=EwaldMinimizer.ALGO_BEST_FIRST)
+        self.assertEqual(len(e_min.output_lists), 2)
+        self.assertRaises(NotImplementedError, EwaldMinimizer, matrix,
+                          m_list, 2, EwaldMinimizer.ALGO_COMPLETE)
+
+        e_min = EwaldMinimizer(matrix, m_list, 5,
+                               algo=EwaldMinimizer.ALGO_TIME_LIMIT)
+        self.assertTrue(np.allclose([o[0] for o in e_min.output_lists],
+                                    sorted(energies)[:5]))
+
+    def test_deprecated(self):
+        matrix = np.array([[1., 2., -1.], [2., 3., 0.], [-1., 0., 2.]])
+        m_list = [[0.5, 1, [0, 1, 2], 'a']]
+        e_min = EwaldMinimizer(matrix, m_list, 3)
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            self.assertLessEqual(e_min.best_case(matrix, m_list, {0, 1, 2}),
+                                 e_min.minimized_sum + 1e-8)
+            self.assertIn(e_min.get_next_index(matrix, m_list[0], {0, 1, 2}),
+                          [0, 1, 2])
+            self.assertTrue(all(issubclass(x.category, DeprecationWarning)
+                                for x in w))
+            self.assertEqual(len(w), 2)
 
 if __name__ == "__main__":
     unittest.main()
@@ -679,6 +679,44 @@ class StructureMatcherTest(PymatgenTest):
         for mapping, d in sm.get_all_anonymous_mappings(s1, s2, include_dist=True):
             self.assertAlmostEqual(dists[mapping[Element('As')]], d)
 
+    def test_get_species_mappings(self):
+        sm = StructureMatcher(ltol=0.2, stol=0.3, angle_tol=5)
+        s1 = Structure.from_file(os.path.join(test_dir, "Na2Fe2PAsO4S4.json"))
+        s2 = Structure.from_file(os.path.join(test_dir, "Na2Fe2PNO4Se4.json"))
+        mappings = list(sm._get_species_mappings(s1, s2))
+        # only species with equal site fractions and fingerprints are
+        # permuted
+        self.assertEqual(len(mappings), 4)
+        for m in mappings:
+            self.assertEqual(m[Element('Na')], Element('Na'))
+            self.assertIn(m[Element('S')], [Element('O'), Element('Se')])
+            self.assertIn(m[Element('As')], [Element('P'), Element('N')])
+        self.assertTrue(sm.fit_anonymous(s1, s2))
+
+        # Na and Fe occupy the same fraction of sites, but Na is in one
+        # orbit and Fe in two.
+        fps = sm._get_species_fingerprints(s1)
+        self.assertEqual(fps[0], 31)
+        self.assertEqual(fps[1][Element('Na')], (1 / 7,))
+        self.assertEqual(fps[1][Element('Fe')], (1 / 14, 1 / 14))
+
+        # Without the same space group, only site fractions are used.
+        s5 = s2.copy()
+        np.random.seed(0)
+        s5.perturb(0.5)
+        self.assertEqual(len(list(sm._get_species_mappings(s1, s5))), 8)
+
+        # incompatible site fractions give no candidate mappings
+        s3 = Structure(Lattice.cubic(3), ["Na", "Na", "Cl"],
+                       [[0, 0, 0], [0.5, 0.5, 0.5], [0, 0.5, 0]])
+        s4 = Structure(Lattice.cubic(3), ["K", "Br", "Br", "Br"],
+                       [[0, 0, 0], [0.5, 0.5, 0.5], [0, 0.5, 0],
+                        [0.5, 0, 0]])
+        self.assertEqual(list(sm._get_species_mappings(s3, s4)), [])
+
+        sm = StructureMatcher(allow_subset=True)
+        self.assertEqual(len(list(sm._get_species_mappings(s1, s2))), 720)
+
     def test_rms_vs_minimax(self):
         # This tests that structures with adjusted RMS less than stol, but minimax
         # greater than stol are treated properly
@@ -696,6 +734,19 @@ class StructureMatcherTest(PymatgenTest):
         self.assertEqual(sm.fit_anonymous(s1, s2), False)
         self.assertEqual(sm.get_mapping(s1, s2), None)
 
+    def test_iter_cached(self):
+        cache = []
+        it = iter(range(5))
+        for i in StructureMatcher._iter_cached(cache, it):
+            if i == 1:
+                break
+        # Only the consumed items are computed.
+        self.assertEqual(cache, [0, 1])
+        self.assertEqual(list(StructureMatcher._iter_cached(cache, it)),
+                         list(range(5)))
+        self.assertEqual(list(StructureMatcher._iter_cached(cache, it)),
+                         list(range(5)))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -10,7 +10,6 @@ functionals.
 """
 
 import six
-from six.moves import filter, map
 
 __author__ = "Shyue Ping Ong, Anubhav Jain, Stephen Dacek, Sai Jayaraman"
 __copyright__ = "Copyright 2012, The Materials Project"
@@ -21,6 +20,7 @@ __date__ = "Mar 19, 2012"
 
 
 import os
+import multiprocessing as mp
 
 from collections import defaultdict
 
@@ -70,6 +70,31 @@ class Correction(six.with_metaclass(abc.ABCMeta, object)):
         """
         return
 
+    def get_corrections(self, entries, comp_keys=None):
+        """
+        Returns corrections for a sequence of entries. The default
+        implementation calls get_correction for each entry. Subclasses
+        override this to share work among entries with the same composition
+        and calculation parameters.
+
+        Args:
+            entries: A sequence of ComputedEntry objects.
+            comp_keys: Optional keys of the compositions of the entries from
+                get_composition_keys, to avoid recomputing them for each
+                correction.
+
+        Returns:
+            List of the energy corrections, with None for entries which are
+            not compatible.
+        """
+        return [self._get_correction_or_none(entry) for entry in entries]
+
+    def _get_correction_or_none(self, entry):
+        try:
+            return self.get_correction(entry)
+        except CompatibilityError:
+            return None
+
     def correct_entry(self, entry):
         """
         Corrects a single entry.
@@ -158,6 +183,25 @@ class PotcarCorrection(Correction):
             raise CompatibilityError('Incompatible potcar')
         return 0
 
+    def get_corrections(self, entries, comp_keys=None):
+        # Results are cached for each composition and set of POTCARs.
+        comp_keys = comp_keys or get_composition_keys(entries)
+        cache = {}
+        corrections = []
+        for entry, comp_key in zip(entries, comp_keys):
+            spec = entry.parameters.get("potcar_spec")
+            if spec:
+                psp_key = tuple((d.get("hash"), d.get("titel")) if d else None
+                                for d in spec)
+            else:
+                psp_key = entry.parameters.get("potcar_symbols")
+                psp_key = psp_key if psp_key is None else tuple(psp_key)
+            key = (comp_key, bool(spec), psp_key)
+            if key not in cache:
+                cache[key] = self._get_correction_or_none(entry)
+            corrections.append(cache[key])
+        return corrections
+
     def __str__(self):
         return "{} Potcar Correction".format(self.input_set.__name__)
 
@@ -188,6 +232,11 @@ class GasCorrection(Correction):
 
         return 0
 
+    def get_corrections(self, entries, comp_keys=None):
+        rforms = _get_reduced_formulas(entries, comp_keys)
+        return [self.get_correction(entry) if rform in self.cpd_energies
+                else 0 for entry, rform in zip(entries, rforms)]
+
     def __str__(self):
         return "{} Gas Correction".format(self.name)
 
@@ -268,6 +317,35 @@ class AnionCorrection(Correction):
 
         return correction
 
+    def get_corrections(self, entries, comp_keys=None):
+        # Results are cached for each composition and oxide and sulfide
+        # type, except for entries whose types are determined from their
+        # structures.
+        comp_keys = comp_keys or get_composition_keys(entries)
+        cache = {}
+        corrections = []
+        for entry, comp_key in zip(entries, comp_keys):
+            if self._uses_structure(entry):
+                corrections.append(self.get_correction(entry))
+                continue
+            key = (comp_key, entry.data.get("sulfide_type"),
+                   entry.data.get("oxide_type"))
+            if key not in cache:
+                cache[key] = self.get_correction(entry)
+            corrections.append(cache[key])
+        return corrections
+
+    def _uses_structure(self, entry):
+        if not hasattr(entry, "structure"):
+            return False
+        comp = entry.composition
+        if len(comp) == 1:
+            return False
+        if Element("S") in comp and not entry.data.get("sulfide_type"):
+            return True
+        return self.correct_peroxide and Element("O") in comp and \
+            not entry.data.get("oxide_type")
+
     def __str__(self):
         return "{} Anion Correction".format(self.name)
 
@@ -301,6 +379,21 @@ class AqueousCorrection(Correction):
             correction += 0.5 * 2.46 * min(comp["H"]/2.0, comp["O"])
         return correction
 
+    def get_corrections(self, entries, comp_keys=None):
+        # Only the corrections of H2 and H2O depend on the energies.
+        comp_keys = comp_keys or get_composition_keys(entries)
+        rforms = _get_reduced_formulas(entries, comp_keys)
+        cache = {}
+        corrections = []
+        for entry, comp_key, rform in zip(entries, comp_keys, rforms):
+            if rform in ["H2", "H2O"]:
+                corrections.append(self.get_correction(entry))
+                continue
+            if comp_key not in cache:
+                cache[comp_key] = self.get_correction(entry)
+            corrections.append(cache[comp_key])
+        return corrections
+
     def __str__(self):
         return "{} Aqueous Correction".format(self.name)
 
@@ -379,6 +472,20 @@ class UCorrection(Correction):
 
         return correction
 
+    def get_corrections(self, entries, comp_keys=None):
+        # Results are cached for each composition and set of U values.
+        comp_keys = comp_keys or get_composition_keys(entries)
+        cache = {}
+        corrections = []
+        for entry, comp_key in zip(entries, comp_keys):
+            calc_u = entry.parameters.get("hubbards", None)
+            key = (comp_key, entry.parameters.get("run_type", "GGA"),
+                   None if calc_u is None else frozenset(calc_u.items()))
+            if key not in cache:
+                cache[key] = self._get_correction_or_none(entry)
+            corrections.append(cache[key])
+        return corrections
+
     def __str__(self):
         return "{} {} Correction".format(self.name, self.compat_type)
 
@@ -434,18 +541,70 @@ class Compatibility(object):
                 corrections[str(c)] = val
         return corrections
 
-    def process_entries(self, entries):
+    def process_entries(self, entries, ncpus=None):
         """
         Process a sequence of entries with the chosen Compatibility scheme.
+        The corrections are evaluated for all entries at once, so that work
+        is shared among entries with the same composition and calculation
+        parameters. The corrected energies are identical to those of
+        process_entry.
 
         Args:
             entries: A sequence of entries.
+            ncpus (int): Number of processes to evaluate the corrections
+                with, which is mainly useful if oxide types have to be
+                determined from structures. Defaults to None, i.e., serial.
+                The corrections are not picklable, so the worker processes
+                inherit this Compatibility by forking, which is the default
+                on Linux and Mac OS.
 
         Returns:
             An list of adjusted entries.  Entries in the original list which
             are not compatible are excluded.
         """
-        return list(filter(None, map(self.process_entry, entries)))
+        entries = list(entries)
+        if ncpus is None or len(entries) <= 1:
+            corrections = self._get_total_corrections(entries)
+        else:
+            chunk_size = -(-len(entries) // ncpus)
+            pool = mp.Pool(ncpus, initializer=_init_worker, initargs=(self,))
+            try:
+                results = pool.map(_get_total_corrections, [
+                    entries[i:i + chunk_size]
+                    for i in range(0, len(entries), chunk_size)])
+            finally:
+                pool.close()
+                pool.join()
+            corrections = [c for r in results for c in r]
+        processed_entries = []
+        for entry, correction in zip(entries, corrections):
+            if correction is not None:
+                entry.correction = correction
+                processed_entries.append(entry)
+        return processed_entries
+
+    def _get_total_corrections(self, entries):
+        """
+        Returns the sum of the corrections for each entry, or None if the
+        entry is not compatible, adding the corrections in the same order
+        as process_entry.
+        """
+        comp_keys = get_composition_keys(entries)
+        totals = [0] * len(entries)
+        inds = list(range(len(entries)))
+        for c in self.corrections:
+            values = c.get_corrections([entries[i] for i in inds],
+                                       [comp_keys[i] for i in inds])
+            compatible = []
+            for i, val in zip(inds, values):
+                if val is None:
+                    totals[i] = None
+                    continue
+                if val != 0:
+                    totals[i] += val
+                compatible.append(i)
+            inds = compatible
+        return totals
 
     def get_explanation_dict(self, entry):
         """
@@ -633,3 +792,50 @@ class MaterialsProjectAqueousCompatibility(Compatibility):
              GasCorrection(fp),
              AnionCorrection(fp, correct_peroxide=correct_peroxide),
              UCorrection(fp, MPRelaxSet, compat_type), AqueousCorrection(fp)])
+
+
+_worker_compat = None
+
+
+def _init_worker(compat):
+    """
+    Sets the Compatibility used by a worker process.
+    """
+    global _worker_compat
+    _worker_compat = compat
+
+
+def _get_total_corrections(entries):
+    """
+    Evaluates the corrections of a chunk of entries in a worker process.
+    """
+    return _worker_compat._get_total_corrections(entries)
+
+
+def get_composition_keys(entries):
+    """
+    Returns hashable keys of the exact element amounts of the compositions
+    of entries, which are used to cache corrections.
+
+    Args:
+        entries: A sequence of entries.
+
+    Returns:
+        List of keys.
+    """
+    return [frozenset(entry.composition.items()) for entry in entries]
+
+
+def _get_reduced_formulas(entries, comp_keys=None):
+    """
+    Reduced formulas of the compositions of entries, computed once for
+    each distinct composition.
+    """
+    comp_keys = comp_keys or get_composition_keys(entries)
+    cache = {}
+    rforms = []
+    for entry, key in zip(entries, comp_keys):
+        if key not in cache:
+            cache[key] = entry.composition.reduced_formula
+        rforms.append(cache[key])
+    return rforms
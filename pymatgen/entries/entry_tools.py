@@ -9,7 +9,7 @@ This module implements functions to perform various useful operations on
 entries, such as grouping entries by structure.
 """
 
-from six.moves import filter, zip
+from six.moves import zip
 
 __author__ = "Shyue Ping Ong"
 __copyright__ = "Copyright 2012, The Materials Project"
@@ -19,11 +19,10 @@ __email__ = "shyuep@gmail.com"
 __date__ = "Feb 24, 2012"
 
 import logging
-import json
 import datetime
 import collections
 
-from monty.json import MontyEncoder, MontyDecoder
+import numpy as np
 
 from pymatgen.core.structure import Structure
 from pymatgen.analysis.structure_matcher import StructureMatcher, \
@@ -41,37 +40,69 @@ def _get_host(structure, species_to_remove):
         return structure
 
 
+def _get_reduced_nsites(structure, primitive_cell):
+    """
+    Returns the number of sites of a structure after the Niggli and
+    (optionally) primitive cell reduction done by StructureMatcher. Without
+    supercell matching, structures with different numbers of reduced sites
+    can never match, so this is a cheap, scale-invariant fingerprint.
+    """
+    s = structure.get_reduced_structure(reduction_algo="niggli")
+    if primitive_cell:
+        s = s.get_primitive_structure()
+    return len(s)
+
+
 def _perform_grouping(args):
-    (entries_json, hosts_json, ltol, stol, angle_tol,
-     primitive_cell, scale, comparator, groups) = args
-
-    entries = json.loads(entries_json, cls=MontyDecoder)
-    hosts = json.loads(hosts_json, cls=MontyDecoder)
-    unmatched = list(zip(entries, hosts))
-    while len(unmatched) > 0:
-        ref_host = unmatched[0][1]
-        logger.info(
-            "Reference tid = {}, formula = {}".format(unmatched[0][0].entry_id,
-                                                      ref_host.formula)
-        )
-        ref_formula = ref_host.composition.reduced_formula
-        logger.info("Reference host = {}".format(ref_formula))
-        matches = [unmatched[0]]
-        for i in range(1, len(unmatched)):
-            test_host = unmatched[i][1]
-            logger.info("Testing tid = {}, formula = {}"
-                        .format(unmatched[i][0].entry_id, test_host.formula))
-            test_formula = test_host.composition.reduced_formula
-            logger.info("Test host = {}".format(test_formula))
-            m = StructureMatcher(ltol=ltol, stol=stol, angle_tol=angle_tol,
-                                 primitive_cell=primitive_cell, scale=scale,
-                                 comparator=comparator)
-            if m.fit(ref_host, test_host):
-                logger.info("Fit found")
-                matches.append(unmatched[i])
-        groups.append(json.dumps([m[0] for m in matches], cls=MontyEncoder))
-        unmatched = list(filter(lambda x: x not in matches, unmatched))
-        logger.info("{} unmatched remaining".format(len(unmatched)))
+    """
+    Groups the structures of a bucket with the same composition hash. Only
+    compact arrays of the structures are passed to worker processes. The
+    bucket is first split by the number of sites of the reduced structures,
+    which is computed once per structure, and StructureMatcher.fit is only
+    called within each part.
+
+    Args:
+        args: (lattices, nsites, species, species_inds, frac_coords, ltol,
+            stol, angle_tol, primitive_cell, scale, comparator), where
+            lattices is a (n, 3, 3) array, nsites the number of sites of
+            each structure, species a table of the site species, and
+            species_inds and frac_coords the concatenated species indices
+            and fractional coordinates of the sites.
+
+    Returns:
+        List of groups of indices of structures in the bucket.
+    """
+    (lattices, nsites, species, species_inds, frac_coords, ltol, stol,
+     angle_tol, primitive_cell, scale, comparator) = args
+    offsets = np.concatenate([[0], np.cumsum(nsites)])
+    hosts = [Structure(lattices[i],
+                       [species[j] for j in species_inds[a:b]],
+                       frac_coords[a:b])
+             for i, (a, b) in enumerate(zip(offsets[:-1], offsets[1:]))]
+    m = StructureMatcher(ltol=ltol, stol=stol, angle_tol=angle_tol,
+                         primitive_cell=primitive_cell, scale=scale,
+                         comparator=comparator)
+    parts = collections.OrderedDict()
+    for i, host in enumerate(hosts):
+        parts.setdefault(_get_reduced_nsites(host, primitive_cell),
+                         []).append(i)
+    groups = []
+    for unmatched in parts.values():
+        while len(unmatched) > 0:
+            ref = unmatched[0]
+            logger.debug("Reference formula = {}".format(
+                hosts[ref].formula))
+            matches = [ref]
+            remaining = []
+            for i in unmatched[1:]:
+                if m.fit(hosts[ref], hosts[i]):
+                    matches.append(i)
+                else:
+                    remaining.append(i)
+            groups.append(matches)
+            unmatched = remaining
+            logger.debug("{} unmatched remaining".format(len(unmatched)))
+    return groups
 
 
 def group_entries_by_structure(entries, species_to_remove=None,
@@ -83,8 +114,23 @@ def group_entries_by_structure(entries, species_to_remove=None,
     Given a sequence of ComputedStructureEntries, use structure fitter to group
     them by structural similarity.
 
+    The entries are read in a single pass and their host structures are
+    bucketed by the composition hash of the comparator, since structures in
+    different buckets can never match. Within each bucket, the structures
+    are further split by the number of sites of their reduced cells, and
+    StructureMatcher.fit is only called within each part, matching the
+    remaining structures against a reference structure. Progress is logged
+    as buckets are completed.
+
+    Since an entry read last may belong to any bucket, grouping starts only
+    after all entries have been read. All entries are kept in memory (they
+    are returned), together with compact arrays of the host structures,
+    i.e., the lattice and the species index and fractional coordinates of
+    each site. The host Structure objects are not kept, and only these
+    arrays are shipped to the workers.
+
     Args:
-        entries: Sequence of ComputedStructureEntries.
+        entries: Sequence of ComputedStructureEntries. Can be an iterator.
         species_to_remove: Sometimes you want to compare a host framework
             (e.g., in Li-ion battery analysis). This allows you to specify
             species to remove before structural comparison.
@@ -103,39 +149,93 @@ def group_entries_by_structure(entries, species_to_remove=None,
 
     Returns:
         Sequence of sequence of entries by structural similarity. e.g,
-        [[ entry1, entry2], [entry3, entry4, entry5]]
+        [[ entry1, entry2], [entry3, entry4, entry5]]. The groups are
+        ordered by their first entry, and the entries within a group keep
+        their input order.
     """
     start = datetime.datetime.now()
     logger.info("Started at {}".format(start))
-    entries_host = [(entry, _get_host(entry.structure, species_to_remove))
-                    for entry in entries]
+    all_entries = []
+    buckets = collections.OrderedDict()
+    for entry in entries:
+        host = _get_host(entry.structure, species_to_remove)
+        key = comparator.get_hash(host.composition)
+        if key not in buckets:
+            buckets[key] = _StructureBucket()
+        buckets[key].add(len(all_entries), host)
+        all_entries.append(entry)
+    logger.info("{} entries in {} buckets".format(len(all_entries),
+                                                   len(buckets)))
+
+    # Largest buckets first for better load balancing.
+    buckets = sorted(buckets.values(), key=lambda b: -len(b.inds))
+    args = (b.get_args() + (ltol, stol, angle_tol, primitive_cell, scale,
+                            comparator) for b in buckets)
+    groups = []
+    ngrouped = 0
+
+    def _add_groups(bucket, bucket_groups):
+        groups.extend([bucket.inds[i] for i in g] for g in bucket_groups)
+        logger.info("Grouped {} of {} entries".format(
+            ngrouped, len(all_entries)))
+
     if ncpus:
-        symm_entries = collections.defaultdict(list)
-        for entry, host in entries_host:
-            symm_entries[comparator.get_structure_hash(host)].append((entry,
-                                                                      host))
         import multiprocessing as mp
-        logging.info("Using {} cpus".format(ncpus))
-        manager = mp.Manager()
-        groups = manager.list()
+        logger.info("Using {} cpus".format(ncpus))
         p = mp.Pool(ncpus)
-        #Parallel processing only supports Python primitives and not objects.
-        p.map(_perform_grouping,
-              [(json.dumps([e[0] for e in eh], cls=MontyEncoder),
-                json.dumps([e[1] for e in eh], cls=MontyEncoder),
-                ltol, stol, angle_tol, primitive_cell, scale,
-                comparator, groups)
-               for eh in symm_entries.values()])
+        try:
+            for i, bucket_groups in p.imap_unordered(_perform_indexed_grouping,
+                                                     enumerate(args)):
+                ngrouped += len(buckets[i].inds)
+                _add_groups(buckets[i], bucket_groups)
+        finally:
+            p.close()
+            p.join()
     else:
-        groups = []
-        hosts = [host for entry, host in entries_host]
-        _perform_grouping((json.dumps(entries, cls=MontyEncoder),
-                           json.dumps(hosts, cls=MontyEncoder),
-                           ltol, stol, angle_tol, primitive_cell, scale,
-                           comparator, groups))
-    entry_groups = []
-    for g in groups:
-        entry_groups.append(json.loads(g, cls=MontyDecoder))
-    logging.info("Finished at {}".format(datetime.datetime.now()))
-    logging.info("Took {}".format(datetime.datetime.now() - start))
+        for bucket, a in zip(buckets, args):
+            ngrouped += len(bucket.inds)
+            _add_groups(bucket, _perform_grouping(a))
+    groups.sort(key=lambda g: g[0])
+    entry_groups = [[all_entries[i] for i in g] for g in groups]
+    logger.info("Finished at {}".format(datetime.datetime.now()))
+    logger.info("Took {}".format(datetime.datetime.now() - start))
     return entry_groups
+
+
+def _perform_indexed_grouping(args):
+    i, grouping_args = args
+    return i, _perform_grouping(grouping_args)
+
+
+class _StructureBucket(object):
+    """
+    Compact storage of the structures with the same composition hash, i.e.,
+    the lattices, a table of species, and the species indices and
+    fractional coordinates of the sites.
+    """
+
+    def __init__(self):
+        self.inds = []
+        self.lattices = []
+        self.nsites = []
+        self.species = []
+        self._species_inds = {}
+        self.site_species = []
+        self.frac_coords = []
+
+    def add(self, ind, structure):
+        self.inds.append(ind)
+        self.lattices.append(structure.lattice.matrix)
+        self.nsites.append(len(structure))
+        for site in structure:
+            sp = site.species_and_occu
+            if sp not in self._species_inds:
+                self._species_inds[sp] = len(self.species)
+                self.species.append(sp)
+            self.site_species.append(self._species_inds[sp])
+        self.frac_coords.append(structure.frac_coords)
+
+    def get_args(self):
+        return (np.array(self.lattices), np.array(self.nsites, dtype=np.int),
+                self.species, np.array(self.site_species, dtype=np.int),
+                np.concatenate(self.frac_coords))
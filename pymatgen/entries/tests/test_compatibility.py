@@ -226,6 +226,25 @@ class MaterialsProjectCompatibilityTest(unittest.TestCase):
                                                self.entry3])
         self.assertEqual(len(entries), 2)
 
+    def test_process_entries_batched(self):
+        entries = [self.entry1, self.entry2, self.entry3, self.entry_sulfide]
+        entries += [ComputedEntry(e.composition, e.uncorrected_energy - 1,
+                                  parameters=e.parameters) for e in entries]
+        entries.append(ComputedEntry(
+            'O2', -10, parameters={'run_type': 'GGA',
+                                   'potcar_symbols': ['PAW_PBE O 08Apr2002']}))
+        for compat in [self.compat, self.ggacompat]:
+            expected = []
+            for e in entries:
+                e = compat.process_entry(ComputedEntry.from_dict(e.as_dict()))
+                if e is not None:
+                    expected.append(e.energy)
+            for ncpus in [None, 2]:
+                processed = compat.process_entries(
+                    [ComputedEntry.from_dict(e.as_dict()) for e in entries],
+                    ncpus=ncpus)
+                self.assertEqual([e.energy for e in processed], expected)
+
 
 class MITCompatibilityTest(unittest.TestCase):
 
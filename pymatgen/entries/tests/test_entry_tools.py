@@ -21,7 +21,8 @@ import os
 import json
 
 from monty.json import MontyDecoder
-from pymatgen.entries.entry_tools import group_entries_by_structure
+from pymatgen.entries.entry_tools import group_entries_by_structure, \
+    _get_reduced_nsites
 
 test_dir = os.path.join(os.path.dirname(__file__), "..", "..", "..",
                         'test_files')
@@ -38,6 +39,22 @@ class FuncTest(unittest.TestCase):
         self.assertLess(len(groups), len(entries))
         #Make sure no entries are left behind
         self.assertEqual(sum([len(g) for g in groups]), len(entries))
+        #Groups are ordered by their first entry and keep the input entries
+        self.assertEqual([g[0] for g in groups],
+                         sorted([g[0] for g in groups], key=entries.index))
+        self.assertIs(groups[0][0], entries[0])
+        groups2 = group_entries_by_structure(iter(entries), ncpus=2)
+        self.assertEqual([[entries.index(e) for e in g] for g in groups2],
+                         [[entries.index(e) for e in g] for g in groups])
+
+    def test_get_reduced_nsites(self):
+        with open(os.path.join(test_dir, "TiO2_entries.json"), "r") as f:
+            entries = json.load(f, cls=MontyDecoder)
+        s = entries[0].structure
+        nsites = _get_reduced_nsites(s, True)
+        s.make_supercell([1, 1, 2])
+        self.assertEqual(_get_reduced_nsites(s, True), nsites)
+        self.assertEqual(_get_reduced_nsites(s, False), len(s))
 
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
@@ -26,7 +26,7 @@ from monty.functools import lru_cache
 
 from pymatgen.core.composition import Composition
 from pymatgen.phasediagram.maker import PhaseDiagram, \
-    GrandPotentialPhaseDiagram, get_facets
+    GrandPotentialPhaseDiagram, PatchedPhaseDiagram, get_facets
 from pymatgen.analysis.reaction_calculator import Reaction
 from pymatgen.util.coord_utils import Simplex
 
@@ -57,6 +57,8 @@ class PDAnalyzer(object):
             pd: Phase Diagram to analyze.
         """
         self._pd = pd
+        self._facet_data = None
+        self._sub_analyzers = {}
 
     def _make_comp_matrix(self, complist):
         """
@@ -66,20 +68,93 @@ class PDAnalyzer(object):
         return np.array([[comp.get_atomic_fraction(el)
                           for el in self._pd.elements] for comp in complist])
 
+    def _get_facet_data(self):
+        """
+        Helper function to get the arrays used to locate compositions in the
+        facets, computed once per analyzer. Returns (facets, inverses,
+        energies), where facets is the (nfacets, dim) array of qhull_entries
+        indices, inverses[i] is the inverse of the composition matrix of
+        facet i, so that the barycentric coordinates (i.e., the
+        decomposition amounts) of a composition c in facet i are
+        c.inverses[i], and energies holds the energies per atom of the facet
+        vertices.
+        """
+        if self._facet_data is None:
+            pd = self._pd
+            facets = np.array(pd.facets, dtype=np.int)
+            comps = self._make_comp_matrix(
+                [e.composition for e in pd.qhull_entries])
+            energies = np.array([e.energy_per_atom for e in pd.qhull_entries])
+            self._facet_data = (facets, np.linalg.inv(comps[facets]),
+                                energies[facets])
+        return self._facet_data
+
+    def _check_comps(self, comps):
+        for comp in comps:
+            if set(comp.elements).difference(self._pd.elements):
+                raise ValueError('{} has elements not in the phase diagram {}'
+                                 ''.format(comp, self._pd.elements))
+
+    def get_facet_indices(self, comps, chunk_mem=1e8):
+        """
+        Locates the facets that a sequence of compositions fall into. All
+        facets are tested at once for each chunk of compositions using the
+        precomputed inverse barycentric matrices. The first facet
+        containing a composition is used, as in get_decomposition.
+
+        Args:
+            comps ([Composition]): Compositions to locate.
+            chunk_mem (float): Approximate memory in bytes used by the
+                intermediate barycentric coordinate arrays. Compositions are
+                tested in chunks sized to fit within this limit. Defaults to
+                1e8, i.e., ~100 MB.
+
+        Returns:
+            (facet_inds, amounts), where facet_inds is an array of indices
+            into pd.facets, and amounts[i] are the decomposition amounts
+            of comps[i] into the entries of pd.facets[facet_inds[i]].
+        """
+        self._check_comps(comps)
+        inverses = self._get_facet_data()[1]
+        c = self._make_comp_matrix(comps).reshape((len(comps), self._pd.dim))
+        facet_inds = np.zeros(len(comps), dtype=np.int)
+        amounts = np.zeros((len(comps), self._pd.dim))
+        tol = PDAnalyzer.numerical_tol / 10
+        chunk = max(1, int(chunk_mem // (len(inverses) * self._pd.dim * 8)))
+        for start in range(0, len(comps), chunk):
+            sl = slice(start, start + chunk)
+            # (ncomps, nfacets, dim) barycentric coordinates.
+            bary = np.dot(c[sl], inverses)
+            inside = np.all(bary >= -tol, axis=2)
+            missing = np.where(~np.any(inside, axis=1))[0]
+            if len(missing):
+                raise RuntimeError("No facet found for comp = {}".format(
+                    comps[start + missing[0]]))
+            inds = np.argmax(inside, axis=1)
+            facet_inds[sl] = inds
+            amounts[sl] = bary[np.arange(len(inds)), inds]
+        return facet_inds, amounts
+
+    def _get_sub_analyzer(self, comp):
+        """
+        Returns an analyzer for the sub-diagram of a PatchedPhaseDiagram that
+        answers queries at a composition, or None for other phase diagrams.
+        """
+        if not isinstance(self._pd, PatchedPhaseDiagram):
+            return None
+        pd = self._pd.get_containing_diagram(comp.elements)
+        if id(pd) not in self._sub_analyzers:
+            self._sub_analyzers[id(pd)] = PDAnalyzer(pd)
+        return self._sub_analyzers[id(pd)]
+
     @lru_cache(1)
     def _get_facet(self, comp):
         """
         Get any facet that a composition falls into. Cached so successive
         calls at same composition are fast.
         """
-        if set(comp.elements).difference(self._pd.elements):
-            raise ValueError('{} has elements not in the phase diagram {}'
-                             ''.format(comp, self._pd.elements))
-        c = [comp.get_atomic_fraction(e) for e in self._pd.elements[1:]]
-        for f, s in zip(self._pd.facets, self._pd.simplices):
-            if Simplex(s).in_simplex(c, PDAnalyzer.numerical_tol / 10):
-                return f
-        raise RuntimeError("No facet found for comp = {}".format(comp))
+        facet_inds, _ = self.get_facet_indices([comp])
+        return self._pd.facets[facet_inds[0]]
 
     def get_decomposition(self, comp):
         """
@@ -91,6 +166,9 @@ class PDAnalyzer(object):
         Returns:
             Decomposition as a dict of {Entry: amount}
         """
+        analyzer = self._get_sub_analyzer(comp)
+        if analyzer is not None:
+            return analyzer.get_decomposition(comp)
         facet = self._get_facet(comp)
         comp_list = [self._pd.qhull_entries[i].composition for i in facet]
         m = self._make_comp_matrix(comp_list)
@@ -133,6 +211,9 @@ class PDAnalyzer(object):
         if entry in self._pd.stable_entries:
             return {entry: 1}, 0
 
+        analyzer = self._get_sub_analyzer(entry.composition)
+        if analyzer is not None:
+            return analyzer.get_decomp_and_e_above_hull(entry, allow_negative)
         facet = self._get_facet(entry.composition)
         comp_list = [self._pd.qhull_entries[i].composition for i in facet]
         m = self._make_comp_matrix(comp_list)
@@ -147,6 +228,71 @@ class PDAnalyzer(object):
             return decomp, ehull
         raise ValueError("No valid decomp found!")
 
+    def get_decomp_and_e_above_hull_arrays(self, entries,
+                                           allow_negative=False,
+                                           chunk_mem=1e8):
+        """
+        Provides the decompositions and energies above convex hull for a
+        sequence of entries at once, which is much faster than calling
+        get_decomp_and_e_above_hull for each of a large number of entries.
+
+        Args:
+            entries ([PDEntry]): PDEntry like objects.
+            allow_negative: Whether to allow negative e_above_hulls. Used to
+                calculate equilibrium reaction energies. Defaults to False.
+            chunk_mem (float): Approximate memory in bytes used to locate
+                the compositions. See get_facet_indices.
+
+        Returns:
+            (e_above_hull, decomp_inds, decomp_amts) arrays. e_above_hull[i]
+            is the energy above convex hull of entries[i], and entries[i]
+            decomposes into decomp_amts[i][j] of
+            pd.qhull_entries[decomp_inds[i][j]]. Amounts smaller than
+            numerical_tol are set to 0. As in get_decomp_and_e_above_hull,
+            stable entries have an energy above hull of 0. For a
+            PatchedPhaseDiagram, decompositions into fewer entries than the
+            number of elements are padded with zero amounts.
+        """
+        if isinstance(self._pd, PatchedPhaseDiagram):
+            return self._get_patched_arrays(entries, allow_negative,
+                                            chunk_mem)
+        facets, _, energies = self._get_facet_data()
+        facet_inds, amounts = self.get_facet_indices(
+            [e.composition for e in entries], chunk_mem=chunk_mem)
+        ehulls = np.array([e.energy_per_atom for e in entries]) - \
+            np.sum(amounts * energies[facet_inds], axis=1)
+        stable = self._pd.stable_entries
+        ehulls[[i for i, e in enumerate(entries) if e in stable]] = 0
+        if not allow_negative and np.any(
+                ehulls < -PDAnalyzer.numerical_tol):
+            raise ValueError("No valid decomp found!")
+        amounts[np.abs(amounts) <= PDAnalyzer.numerical_tol] = 0
+        return ehulls, facets[facet_inds], amounts
+
+    def _get_patched_arrays(self, entries, allow_negative, chunk_mem):
+        """
+        get_decomp_and_e_above_hull_arrays for a PatchedPhaseDiagram, with
+        the entries grouped by the sub-diagram answering their queries.
+        """
+        inds = {id(e): i for i, e in enumerate(self._pd.qhull_entries)}
+        groups = collections.defaultdict(list)
+        for i, entry in enumerate(entries):
+            groups[self._get_sub_analyzer(entry.composition)].append(i)
+        ehulls = np.zeros(len(entries))
+        decomp_inds = np.zeros((len(entries), self._pd.dim), dtype=np.int)
+        decomp_amts = np.zeros((len(entries), self._pd.dim))
+        for analyzer, group in groups.items():
+            sub_ehulls, sub_inds, sub_amts = \
+                analyzer.get_decomp_and_e_above_hull_arrays(
+                    [entries[i] for i in group], allow_negative, chunk_mem)
+            sub_qhull_entries = analyzer._pd.qhull_entries
+            ehulls[group] = sub_ehulls
+            decomp_inds[group, :sub_inds.shape[1]] = [
+                [inds[id(sub_qhull_entries[j])] for j in row]
+                for row in sub_inds]
+            decomp_amts[group, :sub_amts.shape[1]] = sub_amts
+        return ehulls, decomp_inds, decomp_amts
+
     def get_e_above_hull(self, entry):
         """
         Provides the energy above convex hull for an entry
@@ -178,6 +324,9 @@ class PDAnalyzer(object):
                              "for stable entries.")
         if entry.is_element:
             return 0
+        analyzer = self._get_sub_analyzer(entry.composition)
+        if analyzer is not None:
+            return analyzer.get_equilibrium_reaction_energy(entry)
         entries = [e for e in self._pd.stable_entries if e != entry]
         modpd = PhaseDiagram(entries, self._pd.elements)
         analyzer = PDAnalyzer(modpd)
@@ -200,6 +349,22 @@ class PDAnalyzer(object):
         chempots = np.linalg.solve(m, energylist)
         return dict(zip(self._pd.elements, chempots))
 
+    def get_all_facet_chempots(self):
+        """
+        Calculates the chemical potentials of all facets at once.
+
+        Returns:
+            (nfacets, dim) array of the chemical potentials of the elements
+            in pd.elements for each facet in pd.facets.
+        """
+        facets = np.array(self._pd.facets, dtype=np.int)
+        comps = self._make_comp_matrix(
+            [e.composition for e in self._pd.qhull_entries])
+        energies = np.array([e.energy_per_atom
+                             for e in self._pd.qhull_entries])
+        return np.linalg.solve(comps[facets],
+                               energies[facets][:, :, None])[:, :, 0]
+
     def get_composition_chempots(self, comp):
         facet = self._get_facet(comp)
         return self.get_facet_chempots(facet)
@@ -220,10 +385,8 @@ class PDAnalyzer(object):
             raise ValueError("get_transition_chempots can only be called with "
                              "elements in the phase diagram.")
 
-        critical_chempots = []
-        for facet in self._pd.facets:
-            chempots = self.get_facet_chempots(facet)
-            critical_chempots.append(chempots[element])
+        critical_chempots = self.get_all_facet_chempots()[
+            :, self._pd.elements.index(element)]
 
         clean_pots = []
         for c in sorted(critical_chempots):
@@ -320,36 +483,32 @@ class PDAnalyzer(object):
             simplices are the sides of the N-1 dim polytope bounding the
             allowable chemical potential range of each entry.
         """
-        all_chempots = []
         pd = self._pd
-        facets = pd.facets
-        for facet in facets:
-            chempots = self.get_facet_chempots(facet)
-            all_chempots.append([chempots[el] for el in pd.elements])
+        facets = np.array(pd.facets, dtype=np.int)
+        all_chempots = self.get_all_facet_chempots()
         inds = [pd.elements.index(el) for el in elements]
-        el_energies = {el: 0.0 for el in elements}
+        el_energies = np.zeros(len(elements))
         if referenced:
-            el_energies = {el: pd.el_refs[el].energy_per_atom
-                           for el in elements}
+            el_energies = np.array([pd.el_refs[el].energy_per_atom
+                                    for el in elements])
+        chempots = all_chempots[:, inds] - el_energies
         chempot_ranges = collections.defaultdict(list)
         vertices = [list(range(len(self._pd.elements)))]
         if len(all_chempots) > len(self._pd.elements):
             vertices = get_facets(all_chempots, joggle=joggle,
                                   force_use_pyhull=force_use_pyhull)
-        for ufacet in vertices:
-            for combi in itertools.combinations(ufacet, 2):
-                data1 = facets[combi[0]]
-                data2 = facets[combi[1]]
-                common_ent_ind = set(data1).intersection(set(data2))
-                if len(common_ent_ind) == len(elements):
-                    common_entries = [pd.qhull_entries[i]
-                                      for i in common_ent_ind]
-                    data = np.array([[all_chempots[i][j]
-                                      - el_energies[pd.elements[j]]
-                                      for j in inds] for i in combi])
-                    sim = Simplex(data)
-                    for entry in common_entries:
-                        chempot_ranges[entry].append(sim)
+        # All pairs of facets sharing a facet of the chemical potential hull.
+        pairs = np.array([combi for ufacet in vertices
+                          for combi in itertools.combinations(ufacet, 2)],
+                         dtype=np.int).reshape((-1, 2))
+        # Pairs of phase diagram facets with len(elements) common entries
+        # bound the chemical potential ranges of these entries.
+        common = facets[pairs[:, 0]][:, :, None] == \
+            facets[pairs[:, 1]][:, None, :]
+        for k in np.where(np.sum(common, axis=(1, 2)) == len(elements))[0]:
+            sim = Simplex(chempots[pairs[k]])
+            for i in set(facets[pairs[k, 0]][np.any(common[k], axis=1)]):
+                chempot_ranges[pd.qhull_entries[i]].append(sim)
 
         return chempot_ranges
 
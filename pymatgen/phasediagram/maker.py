@@ -175,6 +175,162 @@ class PhaseDiagram(MSONable):
         self.elements = elements
         self.qhull_entries = qhull_entries
 
+    @classmethod
+    def _from_hull_data(cls, all_entries, qhull_entries, qhull_data, facets,
+                        el_refs, elements):
+        """
+        Creates a PhaseDiagram from precomputed convex hull data, e.g., as
+        derived by get_sub_diagram or stored by a PhaseDiagramStore, without
+        running qhull. The arguments are the attributes of the same name.
+        """
+        pd = cls.__new__(cls)
+        pd.all_entries = all_entries
+        pd.qhull_entries = qhull_entries
+        pd.qhull_data = qhull_data
+        pd.facets = facets
+        pd.simplices = [qhull_data[f, :-1] for f in facets]
+        pd.dim = len(elements)
+        pd.el_refs = el_refs
+        pd.elements = elements
+        return pd
+
+    def get_sub_diagram(self, elements):
+        """
+        Returns the phase diagram of a chemical subsystem without running
+        qhull. The facets of a phase diagram restricted to a chemical
+        subsystem triangulate the hull of the subsystem, so its facets are
+        those sets of vertices of the facets lying in the subsystem that
+        form non-degenerate simplices.
+
+        Args:
+            elements ([Element]): Elements of the subsystem.
+
+        Returns:
+            PhaseDiagram of the subsystem.
+        """
+        chemsys = set(elements)
+        if chemsys.difference(self.elements):
+            raise ValueError('{} has elements not in the phase diagram {}'
+                             ''.format(list(chemsys), self.elements))
+        elements = [el for el in self.elements if el in chemsys]
+        in_chemsys = lambda e: chemsys.issuperset(e.composition.elements)
+        all_entries = [e for e in self.all_entries if in_chemsys(e)]
+        inds = [i for i, e in enumerate(self.qhull_entries) if in_chemsys(e)]
+        new_inds = {j: i for i, j in enumerate(inds)}
+        qhull_entries = [self.qhull_entries[i] for i in inds]
+        cols = [self.elements.index(el) for el in elements[1:]]
+        qhull_data = np.array([
+            [e.composition.get_atomic_fraction(self.elements[c])
+             for c in cols] + [e.energy_per_atom] for e in qhull_entries])
+        extra_point = np.zeros(len(elements)) + 1 / len(elements)
+        extra_point[-1] = np.max(qhull_data) + 1
+        qhull_data = np.concatenate([qhull_data, [extra_point]], axis=0)
+        if len(elements) == 1:
+            facets = [qhull_data.argmin(axis=0)]
+        else:
+            facets = []
+            found = set()
+            for facet in self.facets:
+                vertices = tuple(sorted(new_inds[i] for i in facet
+                                        if i in new_inds))
+                if len(vertices) != len(elements) or vertices in found:
+                    continue
+                found.add(vertices)
+                m = qhull_data[list(vertices)]
+                m[:, -1] = 1
+                if abs(np.linalg.det(m)) > 1e-14:
+                    facets.append(np.array(vertices))
+        el_refs = {el: self.el_refs[el] for el in elements}
+        return PhaseDiagram._from_hull_data(all_entries, qhull_entries,
+                                            qhull_data, facets, el_refs,
+                                            elements)
+
+    def add_entries(self, entries):
+        """
+        Adds entries to the phase diagram without rebuilding it from scratch.
+        Entries above the current hull are only added to all_entries. For an
+        entry below the hull, the facets whose hyperplanes lie above it are
+        replaced by new facets joining it to their horizon ridges, as in the
+        beneath-beyond convex hull algorithm. Only a new elemental reference
+        lower in energy than the current one, which changes all formation
+        energies, triggers a full rebuild. Note that PDAnalyzers created
+        before the update must be recreated.
+
+        Args:
+            entries ([PDEntry]): PDEntry-like objects, as passed to the
+                constructor. Subclasses transform them as their constructors
+                do, e.g., into GrandPotPDEntries for a
+                GrandPotentialPhaseDiagram.
+        """
+        entries = self._get_entries_to_add(entries)
+        for entry in entries:
+            if set(entry.composition.elements).difference(self.elements):
+                raise ValueError("{} has elements not in the phase diagram {}"
+                                 "".format(entry.composition, self.elements))
+        if any(entry.composition.is_element and entry.energy_per_atom <
+               self.el_refs[entry.composition.elements[0]].energy_per_atom
+               for entry in entries):
+            self._rebuild(self.all_entries + entries)
+            return
+        for entry in entries:
+            self.all_entries.append(entry)
+            self._add_to_hull(entry)
+
+    def _get_entries_to_add(self, entries):
+        """
+        Returns the list of entries to be added by add_entries, transformed
+        into the kind of entries of this phase diagram.
+        """
+        return list(entries)
+
+    def _rebuild(self, entries):
+        """
+        Recomputes the phase diagram from scratch from entries of the kind
+        of entries of this phase diagram, i.e., its all_entries.
+        """
+        PhaseDiagram.__init__(self, entries, self.elements)
+
+    def _add_to_hull(self, entry):
+        """
+        Updates the facets of the hull with an entry if it lies below it.
+        """
+        data = self.qhull_data
+        comps = np.concatenate([1 - np.sum(data[:, :-1], axis=1)[:, None],
+                                data[:, :-1]], axis=1)
+        facets = np.array(self.facets)
+        x = np.array([entry.composition.get_atomic_fraction(el)
+                      for el in self.elements])
+        # The chemical potentials of each facet define its hyperplane. As the
+        # hull is convex, an entry is below it if it is below any of them.
+        chempots = np.linalg.solve(comps[facets],
+                                   data[facets, -1][:, :, None])[:, :, 0]
+        visible = np.dot(chempots, x) - entry.energy_per_atom > \
+            self.formation_energy_tol
+        if not np.any(visible):
+            return
+        # Ridges of only one visible facet form the horizon, which is either
+        # shared with a remaining facet or on the boundary of the
+        # composition space.
+        ridges = collections.Counter()
+        for facet in facets[visible]:
+            ridges.update(itertools.combinations(sorted(facet),
+                                                 self.dim - 1))
+        ind = len(self.qhull_entries)
+        self.qhull_entries.append(entry)
+        # The extra point must remain last.
+        self.qhull_data = np.insert(
+            data, ind, np.append(x[1:], entry.energy_per_atom), axis=0)
+        newfacets = [f for f, v in zip(self.facets, visible) if not v]
+        for ridge, count in ridges.items():
+            if count == 1:
+                facet = np.array(ridge + (ind,))
+                m = self.qhull_data[facet]
+                m[:, -1] = 1
+                if abs(np.linalg.det(m)) > 1e-14:
+                    newfacets.append(facet)
+        self.facets = newfacets
+        self.simplices = [self.qhull_data[f, :-1] for f in self.facets]
+
     @property
     def all_entries_hulldata(self):
         data = []
@@ -253,6 +409,276 @@ class PhaseDiagram(MSONable):
         return cls(entries, elements)
 
 
+class PatchedPhaseDiagram(PhaseDiagram):
+    """
+    A phase diagram assembled from the phase diagrams of its chemical
+    subsystems, for diagrams with too many elements for a single convex
+    hull. The stability of an entry only depends on the entries within its
+    own chemical system, so a separate hull is computed for each maximal
+    chemical system spanned by the entries with negative formation energies,
+    and the stable entries are the union of the stable entries of these
+    sub-diagrams. The facets of the full diagram are never computed.
+    PDAnalyzer answers decomposition and energy above hull queries from the
+    smallest sub-diagram containing the composition, which gives the same
+    results as the full phase diagram. Analyses that need the facets of the
+    full diagram, e.g., chemical potential range maps, are not available.
+
+    .. attribute: pds
+
+        Dict of {frozenset(elements): PhaseDiagram} of the sub-diagrams.
+
+    .. attribute: qhull_entries
+
+        Entries that would be used in the convex hull of the full diagram,
+        i.e., the lowest energy entries at each composition with negative
+        formation energies and the elemental references.
+    """
+
+    def __init__(self, entries, elements=None, ncpus=None):
+        """
+        Args:
+            entries ([PDEntry]): A list of PDEntry-like objects having an
+                energy, energy_per_atom and composition.
+            elements ([Element]): Optional list of elements in the phase
+                diagram. If set to None, the elements are determined from
+                the the entries themselves.
+            ncpus (int): Number of processes used to compute the
+                sub-diagrams. Default of None means serial processing.
+        """
+        if elements is None:
+            elements = set()
+            for entry in entries:
+                elements.update(entry.composition.elements)
+        elements = list(elements)
+
+        get_reduced_comp = lambda e: e.composition.reduced_composition
+        el_refs = {}
+        min_entries = []
+        all_entries = []
+        for c, g in itertools.groupby(sorted(entries, key=get_reduced_comp),
+                                      key=get_reduced_comp):
+            g = list(g)
+            min_entry = min(g, key=lambda e: e.energy_per_atom)
+            if c.is_element:
+                el_refs[c.elements[0]] = min_entry
+            min_entries.append(min_entry)
+            all_entries.extend(g)
+
+        if len(el_refs) != len(elements):
+            raise PhaseDiagramError(
+                "There are no entries associated with a terminal element!.")
+
+        # Only entries with negative formation energy and the elemental
+        # references are part of any hull.
+        qhull_entries = []
+        for e in min_entries:
+            comp = e.composition
+            form_e = e.energy_per_atom - sum(
+                comp.get_atomic_fraction(el) * el_refs[el].energy_per_atom
+                for el in comp.elements)
+            if form_e < -self.formation_energy_tol or comp.is_element:
+                qhull_entries.append(e)
+
+        self.all_entries = all_entries
+        self.dim = len(elements)
+        self.el_refs = el_refs
+        self.elements = elements
+        self.qhull_entries = qhull_entries
+
+        # Group the entries by chemical system.
+        self._ranks = {id(e): i for i, e in enumerate(qhull_entries)}
+        self._entries_by_chemsys = collections.defaultdict(list)
+        for e in qhull_entries:
+            self._entries_by_chemsys[
+                frozenset(e.composition.elements)].append(e)
+        self.pds = {}
+        self._update_sub_diagrams(ncpus)
+
+    def add_entries(self, entries, ncpus=None):
+        """
+        Adds entries to the phase diagram. Only the sub-diagrams whose
+        chemical systems contain a new hull entry are recomputed, unless an
+        entry is lower in energy than its elemental reference, which changes
+        all formation energies and triggers a full rebuild.
+
+        Args:
+            entries ([PDEntry]): PDEntry-like objects.
+            ncpus (int): Number of processes used to compute the
+                sub-diagrams. Default of None means serial processing.
+        """
+        entries = list(entries)
+        for entry in entries:
+            if set(entry.composition.elements).difference(self.elements):
+                raise ValueError("{} has elements not in the phase diagram {}"
+                                 "".format(entry.composition, self.elements))
+        if any(entry.composition.is_element and entry.energy_per_atom <
+               self.el_refs[entry.composition.elements[0]].energy_per_atom
+               for entry in entries):
+            PatchedPhaseDiagram.__init__(self, self.all_entries + entries,
+                                         self.elements, ncpus)
+            return
+
+        get_reduced_comp = lambda e: e.composition.reduced_composition
+        min_entries = {get_reduced_comp(e): e for e in self.qhull_entries}
+        changed = set()
+        for entry in entries:
+            self.all_entries.append(entry)
+            comp = entry.composition
+            if comp.is_element:
+                continue
+            form_e = entry.energy_per_atom - sum(
+                comp.get_atomic_fraction(el) *
+                self.el_refs[el].energy_per_atom for el in comp.elements)
+            if form_e >= -self.formation_energy_tol:
+                continue
+            c = get_reduced_comp(entry)
+            old = min_entries.get(c)
+            if old is not None and \
+                    old.energy_per_atom <= entry.energy_per_atom:
+                continue
+            chemsys = frozenset(comp.elements)
+            if old is not None:
+                self._entries_by_chemsys[chemsys].remove(old)
+            self._entries_by_chemsys[chemsys].append(entry)
+            min_entries[c] = entry
+            changed.add(chemsys)
+        if not changed:
+            return
+
+        self.qhull_entries = sorted(min_entries.values(),
+                                    key=get_reduced_comp)
+        self._ranks = {id(e): i for i, e in enumerate(self.qhull_entries)}
+        # Drop the sub-diagrams, including cached non-maximal ones, whose
+        # entries changed.
+        for space in list(self.pds.keys()):
+            if any(chemsys.issubset(space) for chemsys in changed):
+                del self.pds[space]
+        self._update_sub_diagrams(ncpus)
+
+    def _update_sub_diagrams(self, ncpus=None):
+        """
+        Computes the sub-diagrams of the maximal chemical systems, i.e.,
+        those not contained in any other, that are missing from pds and
+        updates the stable entries.
+        """
+        spaces = []
+        for chemsys in sorted(self._entries_by_chemsys, key=len,
+                              reverse=True):
+            if not any(chemsys.issubset(s) for s in spaces):
+                spaces.append(chemsys)
+        spaces = [s for s in spaces if s not in self.pds]
+
+        args = [self._get_sub_diagram_args(s) for s in spaces]
+        if ncpus:
+            import multiprocessing as mp
+            p = mp.Pool(ncpus)
+            try:
+                results = p.map(_get_sub_diagram, args)
+            finally:
+                p.close()
+                p.join()
+        else:
+            results = [_get_sub_diagram(a) for a in args]
+        for space, (sub_entries, _), (pd, inds) in zip(spaces, args,
+                                                       results):
+            # Restore the original entries for entries pickled to processes.
+            pd.all_entries = [sub_entries[i] for i in inds[0]]
+            pd.qhull_entries = [sub_entries[i] for i in inds[1]]
+            pd.el_refs = {el: sub_entries[i] for el, i in inds[2].items()}
+            self.pds[space] = pd
+
+        self._stable_entries = set()
+        for pd in self.pds.values():
+            self._stable_entries.update(pd.stable_entries)
+
+    def _get_sub_diagram_args(self, chemsys):
+        entries = []
+        for s, group in self._entries_by_chemsys.items():
+            if s.issubset(chemsys):
+                entries.extend(group)
+        # Keep the sorted order of qhull_entries, which makes sorting by
+        # composition in the PhaseDiagram constructor cheap.
+        entries.sort(key=lambda e: self._ranks[id(e)])
+        return entries, [el for el in self.elements if el in chemsys]
+
+    def get_containing_diagram(self, elements):
+        """
+        Returns the smallest sub-diagram containing a set of elements.
+
+        Args:
+            elements ([Element]): Elements, e.g., of a composition.
+
+        Returns:
+            PhaseDiagram containing all elements.
+        """
+        chemsys = frozenset(elements)
+        if chemsys.difference(self.elements):
+            raise ValueError('{} has elements not in the phase diagram {}'
+                             ''.format(list(chemsys), self.elements))
+        spaces = [s for s in self.pds if chemsys.issubset(s)]
+        if spaces:
+            return self.pds[min(spaces, key=len)]
+        # No maximal chemical system contains the elements, so there are no
+        # compounds spanning them. Construct the diagram from the entries in
+        # its subsystems.
+        pd = PhaseDiagram(*self._get_sub_diagram_args(chemsys))
+        self.pds[chemsys] = pd
+        return pd
+
+    def get_sub_diagram(self, elements):
+        """
+        Returns the phase diagram of a chemical subsystem, derived from the
+        smallest sub-diagram containing it.
+
+        Args:
+            elements ([Element]): Elements of the subsystem.
+
+        Returns:
+            PhaseDiagram of the subsystem.
+        """
+        pd = self.get_containing_diagram(elements)
+        if len(pd.elements) == len(set(elements)):
+            return pd
+        return pd.get_sub_diagram(elements)
+
+    @property
+    def stable_entries(self):
+        """
+        Returns the stable entries in the phase diagram.
+        """
+        return self._stable_entries
+
+    @property
+    def facets(self):
+        raise PhaseDiagramError("The facets of the full phase diagram are not "
+                                "computed for a PatchedPhaseDiagram.")
+
+    @property
+    def qhull_data(self):
+        raise PhaseDiagramError("The qhull data of the full phase diagram is "
+                                "not computed for a PatchedPhaseDiagram.")
+
+    @property
+    def simplices(self):
+        raise PhaseDiagramError("The simplices of the full phase diagram are "
+                                "not computed for a PatchedPhaseDiagram.")
+
+
+def _get_sub_diagram(args):
+    """
+    Computes a sub-diagram of a PatchedPhaseDiagram. The indices of the
+    entries of the sub-diagram in the input entries are also returned, so
+    that the original entries can be restored when this runs in another
+    process.
+    """
+    entries, elements = args
+    pd = PhaseDiagram(entries, elements)
+    inds = {id(e): i for i, e in enumerate(entries)}
+    return pd, ([inds[id(e)] for e in pd.all_entries],
+                [inds[id(e)] for e in pd.qhull_entries],
+                {el: inds[id(e)] for el, e in pd.el_refs.items()})
+
+
 class GrandPotentialPhaseDiagram(PhaseDiagram):
     """
     A class representing a Grand potential phase diagram. Grand potential phase
@@ -300,6 +726,25 @@ class GrandPotentialPhaseDiagram(PhaseDiagram):
                 all_entries.append(GrandPotPDEntry(e, self.chempots))
         super(GrandPotentialPhaseDiagram, self).__init__(all_entries, elements)
 
+    def _get_entries_to_add(self, entries):
+        """
+        Transforms the entries to add into GrandPotPDEntries with the
+        chemical potentials of this diagram. Entries that only contain open
+        elements are skipped, as in the constructor. GrandPotPDEntries must
+        have the same chemical potentials.
+        """
+        new_entries = []
+        for e in entries:
+            if isinstance(e, GrandPotPDEntry):
+                if e.chempots != self.chempots:
+                    raise ValueError("{} has chemical potentials {} instead "
+                                     "of {}".format(e, e.chempots,
+                                                    self.chempots))
+                new_entries.append(e)
+            elif set(e.composition.elements).intersection(self.elements):
+                new_entries.append(GrandPotPDEntry(e, self.chempots))
+        return new_entries
+
     def __str__(self):
         output = []
         chemsys = "-".join([el.symbol for el in self.elements])
@@ -325,6 +770,199 @@ class GrandPotentialPhaseDiagram(PhaseDiagram):
         return cls(entries, d["chempots"], elements)
 
 
+class GrandPotentialSweep(object):
+    """
+    Stable phases and decompositions of a system open to one or more
+    elements, for many values of their chemical potentials, e.g., to screen
+    the oxygen or lithium stability windows of compounds. The results at
+    each set of chemical potentials are those of a GrandPotentialPhaseDiagram
+    constructed with them, but the entries are only transformed once. As
+    the grand potentials are linear in the chemical potentials, they are
+    recomputed for all entries as arrays. The facets of the previous convex
+    hull are reused as long as all entries remain above their hyperplanes,
+    so that qhull only needs to be rerun when the set of stable phases
+    changes.
+    """
+
+    def __init__(self, entries, open_elements, elements=None):
+        """
+        Args:
+            entries ([PDEntry]): A list of PDEntry-like objects having an
+                energy, energy_per_atom and composition.
+            open_elements ([Element]): The open elements.
+            elements ([Element]): Optional list of elements in the phase
+                diagram, including the open elements. If set to None, the
+                elements are determined from the the entries themselves.
+        """
+        if elements is None:
+            elements = set()
+            for entry in entries:
+                elements.update(entry.composition.elements)
+        self.open_elements = [get_el_sp(el) for el in open_elements]
+        self.elements = [el for el in elements
+                         if el not in self.open_elements]
+        self.entries = [e for e in entries if set(
+            e.composition.elements).intersection(self.elements)]
+
+        groups = {}
+        x = []
+        open_amts = []
+        energies = []
+        group_inds = []
+        for e in self.entries:
+            comp = e.composition
+            amts = np.array([comp[el] for el in self.elements])
+            natoms = np.sum(amts)
+            x.append(amts / natoms)
+            open_amts.append([comp[el] / natoms for el in self.open_elements])
+            energies.append(e.energy / natoms)
+            # Entries are grouped by the reduced composition of the
+            # elements that are not open, as in GrandPotPDEntry.
+            c = Composition({el: amt for el, amt in zip(self.elements, amts)
+                             if amt}).reduced_composition
+            group_inds.append(groups.setdefault(c, len(groups)))
+        el_groups = {c.elements[0]: i for c, i in groups.items()
+                     if c.is_element}
+        if len(el_groups) != len(self.elements):
+            raise PhaseDiagramError(
+                "There are no entries associated with a terminal element!.")
+        self._el_groups = np.array([el_groups[el] for el in self.elements])
+        self._x = np.array(x)
+        self._open_amts = np.array(open_amts).reshape(
+            (len(self.entries), len(self.open_elements)))
+        self._energies = np.array(energies)
+        self._groups = np.array(group_inds, dtype=np.int)
+        self._facets = None
+        self._facet_inverses = None
+
+    def _update_hull(self, chempots):
+        """
+        Computes the grand potentials and the facets (as arrays of indices
+        in self.entries) of the convex hull at a set of chemical potentials.
+        """
+        try:
+            mu = np.array([chempots[el] for el in self.open_elements])
+        except KeyError:
+            raise ValueError("Chemical potentials of all open elements {} "
+                             "must be given.".format(self.open_elements))
+        grandpots = self._energies - np.dot(self._open_amts, mu)
+
+        # Lowest energy entry of each composition.
+        order = np.lexsort((grandpots, self._groups))
+        starts = np.concatenate(
+            [[0], np.where(np.diff(self._groups[order]))[0] + 1])
+        min_entries = np.zeros(len(starts), dtype=np.int)
+        min_entries[self._groups[order[starts]]] = order[starts]
+        refs = min_entries[self._el_groups]
+        form_e = grandpots[min_entries] - np.dot(self._x[min_entries],
+                                                 grandpots[refs])
+        inds = np.union1d(min_entries[
+            form_e < -PhaseDiagram.formation_energy_tol], refs)
+
+        if self._facets is not None and np.all(
+                np.in1d(self._facets, inds)):
+            # The facets remain valid if all entries lie above their
+            # hyperplanes.
+            planes = np.linalg.solve(
+                self._x[self._facets],
+                grandpots[self._facets][:, :, None])[:, :, 0]
+            ehulls = grandpots[inds] - np.dot(planes, self._x[inds].T)
+            if np.min(ehulls) >= -PhaseDiagram.formation_energy_tol:
+                return grandpots
+
+        dim = len(self.elements)
+        qhull_data = np.concatenate(
+            [self._x[inds][:, 1:], grandpots[inds][:, None]], axis=1)
+        extra_point = np.zeros(dim) + 1 / dim
+        extra_point[-1] = np.max(qhull_data) + 1
+        qhull_data = np.concatenate([qhull_data, [extra_point]], axis=0)
+        if dim == 1:
+            facets = [[np.argmin(qhull_data[:, -1])]]
+        else:
+            facets = []
+            for facet in get_facets(qhull_data):
+                # Skip facets that include the extra point
+                if max(facet) == len(qhull_data) - 1:
+                    continue
+                m = qhull_data[facet]
+                m[:, -1] = 1
+                if abs(np.linalg.det(m)) > 1e-14:
+                    facets.append(facet)
+        self._facets = inds[np.array(facets, dtype=np.int)]
+        self._facet_inverses = np.linalg.inv(self._x[self._facets])
+        return grandpots
+
+    def get_stable_entries(self, chempots):
+        """
+        Returns the stable entries at a set of chemical potentials.
+
+        Args:
+            chempots ({Element: float}): Chemical potentials of the open
+                elements.
+
+        Returns:
+            Set of stable entries. These are the original entries, not
+            GrandPotPDEntries.
+        """
+        self._update_hull(chempots)
+        return set(self.entries[i] for i in np.unique(self._facets))
+
+    def get_decomposition(self, comp, chempots):
+        """
+        Provides the decomposition of a composition at a set of chemical
+        potentials.
+
+        Args:
+            comp (Composition): A composition. The amounts of the open
+                elements are ignored.
+            chempots ({Element: float}): Chemical potentials of the open
+                elements.
+
+        Returns:
+            Decomposition as a dict of {Entry: amount}, with amounts
+            normalized to the total amount of the elements that are not
+            open.
+        """
+        self._update_hull(chempots)
+        amts = np.array([comp[el] for el in self.elements])
+        if np.sum(amts) == 0 or set(comp.elements).difference(
+                self.elements + self.open_elements):
+            raise ValueError("{} is not in the phase diagram".format(comp))
+        bary = np.dot(amts / np.sum(amts), self._facet_inverses)
+        inside = np.where(np.all(bary >= -1e-9, axis=1))[0]
+        if len(inside) == 0:
+            raise RuntimeError("No facet found for comp = {}".format(comp))
+        facet = self._facets[inside[0]]
+        return {self.entries[i]: amt
+                for i, amt in zip(facet, bary[inside[0]]) if abs(amt) > 1e-8}
+
+    def sweep(self, chempots_list, comps=None):
+        """
+        Computes the stable entries, and optionally the decompositions of
+        some compositions, at a sequence of chemical potentials. The convex
+        hull is reused between consecutive chemical potentials, so these
+        are best ordered, e.g., along a grid.
+
+        Args:
+            chempots_list ([{Element: float}]): Chemical potentials of the
+                open elements.
+            comps ([Composition]): Compositions to decompose.
+
+        Returns:
+            A list with a dict for each set of chemical potentials, of the
+            form {"chempots": chempots, "stable_entries": set of entries,
+            "decompositions": [{Entry: amount} for each comp]}.
+        """
+        results = []
+        for chempots in chempots_list:
+            results.append({
+                "chempots": chempots,
+                "stable_entries": self.get_stable_entries(chempots),
+                "decompositions": [self.get_decomposition(c, chempots)
+                                   for c in comps or []]})
+        return results
+
+
 class CompoundPhaseDiagram(PhaseDiagram):
     """
     Generates phase diagrams from compounds as terminations instead of
@@ -361,6 +999,16 @@ class CompoundPhaseDiagram(PhaseDiagram):
         super(CompoundPhaseDiagram, self).__init__(
             pentries, elements=species_mapping.values())
 
+    def _get_entries_to_add(self, entries):
+        """
+        Transforms the entries to add to the composition coordinates of the
+        terminal compositions. As in the constructor, entries outside the
+        phase space are ignored.
+        """
+        entries = list(entries)
+        self.original_entries = list(self.original_entries) + entries
+        return self.transform_entries(entries, self.terminal_compositions)[0]
+
     def transform_entries(self, entries, terminal_compositions):
         """
         Method to transform all entries to the composition coordinate in the
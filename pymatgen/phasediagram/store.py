@@ -0,0 +1,240 @@
+# coding: utf-8
+# Copyright (c) Pymatgen Development Team.
+# Distributed under the terms of the MIT License.
+
+from __future__ import division, unicode_literals
+
+"""
+This module provides an on-disk cache of phase diagrams, so that the phase
+diagrams of frequently used chemical systems are only computed once.
+"""
+
+__author__ = "Shyue Ping Ong"
+__copyright__ = "Copyright 2012, The Materials Project"
+__version__ = "0.1"
+__maintainer__ = "Shyue Ping Ong"
+__email__ = "shyuep@gmail.com"
+__date__ = "Oct 18, 2016"
+
+import os
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+from monty.json import MontyEncoder, MontyDecoder
+
+from pymatgen.core.periodic_table import get_el_sp
+from pymatgen.phasediagram.maker import PhaseDiagram
+
+
+class PhaseDiagramStore(object):
+    """
+    A cache of phase diagrams in a directory, keyed by chemical system and
+    a hash of the entries. Each phase diagram is stored as a compressed
+    numpy .npz file holding the entries, the qhull data and the facets, so
+    that it can be reloaded without running qhull. The phase diagram of any
+    chemical subsystem can also be derived from a stored diagram of a
+    superset chemical system.
+
+    Usage::
+
+        store = PhaseDiagramStore("pd_cache")
+        pd = store.get_phase_diagram(mpr.get_entries_in_chemsys(["Li", "O"]))
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): Directory of the cache. Created if it does not
+                exist.
+        """
+        self.directory = directory
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def get_key(entries, elements=None):
+        """
+        Returns the key of a set of entries, i.e., the chemical system, e.g.,
+        "Fe-Li-O", and a hash of the compositions, energies and ids of the
+        entries. The hash does not depend on the order of the entries.
+
+        Args:
+            entries ([PDEntry]): A list of PDEntry-like objects.
+            elements ([Element]): Optional list of elements in the phase
+                diagram. If set to None, the elements are determined from
+                the the entries themselves.
+
+        Returns:
+            (chemsys, hash)
+        """
+        if elements is None:
+            elements = set()
+            for entry in entries:
+                elements.update(entry.composition.elements)
+        chemsys = "-".join(sorted(el.symbol for el in elements))
+        sha = hashlib.sha1()
+        for s in sorted(_get_entry_string(e) for e in entries):
+            sha.update(s.encode("utf-8"))
+        return chemsys, sha.hexdigest()
+
+    def _get_filename(self, chemsys, hash_):
+        return os.path.join(self.directory,
+                            "{}_{}.npz".format(chemsys, hash_))
+
+    def get_phase_diagram(self, entries, elements=None):
+        """
+        Returns the phase diagram of a set of entries, loaded from the cache
+        if it has been computed before. Otherwise, it is computed and
+        stored.
+
+        Args:
+            entries ([PDEntry]): A list of PDEntry-like objects.
+            elements ([Element]): Optional list of elements in the phase
+                diagram. If set to None, the elements are determined from
+                the the entries themselves.
+
+        Returns:
+            PhaseDiagram made of the given entry objects.
+        """
+        filename = self._get_filename(*self.get_key(entries, elements))
+        if os.path.exists(filename):
+            return load_phase_diagram(filename, entries)
+        pd = PhaseDiagram(entries, elements)
+        save_phase_diagram(pd, filename)
+        return pd
+
+    @property
+    def chemsys(self):
+        """
+        Chemical systems with stored phase diagrams, as a dict of
+        {chemsys: [filenames]}. The filenames of each chemical system are
+        ordered from the most to the least recently written.
+        """
+        d = {}
+        for f in os.listdir(self.directory):
+            if f.endswith(".npz"):
+                d.setdefault(f.rsplit("_", 1)[0], []).append(
+                    os.path.join(self.directory, f))
+        for filenames in d.values():
+            filenames.sort(key=lambda f: (-os.path.getmtime(f), f))
+        return d
+
+    def get_sub_diagram(self, elements, entries=None):
+        """
+        Returns the phase diagram of a chemical system, derived from a stored
+        phase diagram of a superset chemical system.
+
+        Args:
+            elements ([Element]): Elements of the chemical system.
+            entries ([PDEntry]): Entries of the superset phase diagram to
+                derive the phase diagram from. It is computed and stored if
+                necessary. If None, the most recently written phase diagram
+                of the smallest stored superset chemical system is used,
+                which may have been computed from a different set of
+                entries if several are stored for that chemical system.
+
+        Returns:
+            PhaseDiagram, or None if entries is None and no stored phase
+            diagram contains the chemical system.
+        """
+        elements = [get_el_sp(el) for el in elements]
+        symbols = set(el.symbol for el in elements)
+        if entries is not None:
+            pd = self.get_phase_diagram(entries)
+            if not symbols.issubset(el.symbol for el in pd.elements):
+                raise ValueError("Entries do not contain the elements {}"
+                                 .format(sorted(symbols)))
+        else:
+            candidates = [(len(chemsys.split("-")), filenames[0])
+                          for chemsys, filenames in self.chemsys.items()
+                          if symbols.issubset(chemsys.split("-"))]
+            if not candidates:
+                return None
+            pd = load_phase_diagram(min(candidates)[1])
+        if len(pd.elements) == len(symbols):
+            return pd
+        return pd.get_sub_diagram(elements)
+
+
+def save_phase_diagram(pd, filename):
+    """
+    Writes a phase diagram with its convex hull data to a compressed numpy
+    .npz file. The entries are stored as json. The file is written to a
+    temporary file first and moved into place, so that concurrent
+    processes never read a partially written file.
+
+    Args:
+        pd (PhaseDiagram): Phase diagram.
+        filename (str): Filename. The .npz extension is appended if it is
+            not already there.
+    """
+    if not filename.endswith(".npz"):
+        filename += ".npz"
+    order = sorted(range(len(pd.all_entries)),
+                   key=lambda i: _get_entry_string(pd.all_entries[i]))
+    entries = [pd.all_entries[i] for i in order]
+    inds = {id(e): i for i, e in enumerate(entries)}
+    fd, tmpname = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(filename)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(
+                f,
+                entries=np.array(json.dumps([e.as_dict() for e in entries],
+                                            cls=MontyEncoder)),
+                elements=np.array([el.symbol for el in pd.elements]),
+                all_entries=np.array([inds[id(e)] for e in pd.all_entries],
+                                     dtype=np.int),
+                qhull_entries=np.array(
+                    [inds[id(e)] for e in pd.qhull_entries], dtype=np.int),
+                el_refs=np.array(
+                    [inds[id(pd.el_refs[el])] for el in pd.elements],
+                    dtype=np.int),
+                qhull_data=pd.qhull_data,
+                facets=np.array(pd.facets, dtype=np.int).reshape(
+                    (len(pd.facets), pd.dim)))
+        os.rename(tmpname, filename)
+    finally:
+        if os.path.exists(tmpname):
+            os.remove(tmpname)
+
+
+def load_phase_diagram(filename, entries=None):
+    """
+    Reads a phase diagram written by save_phase_diagram without running
+    qhull.
+
+    Args:
+        filename (str): Filename.
+        entries ([PDEntry]): The entries the phase diagram was computed
+            from. If supplied, the phase diagram is made of these entry
+            objects instead of the stored copies.
+
+    Returns:
+        PhaseDiagram
+    """
+    with np.load(filename) as d:
+        if entries is None:
+            entries = MontyDecoder().process_decoded(
+                json.loads(str(d["entries"])))
+        else:
+            entries = sorted(entries, key=_get_entry_string)
+        elements = [get_el_sp(el) for el in d["elements"].tolist()]
+        all_entries = [entries[i] for i in d["all_entries"]]
+        qhull_entries = [entries[i] for i in d["qhull_entries"]]
+        el_refs = {el: entries[i] for el, i in zip(elements, d["el_refs"])}
+        qhull_data = d["qhull_data"]
+        facets = list(d["facets"])
+    return PhaseDiagram._from_hull_data(all_entries, qhull_entries,
+                                        qhull_data, facets, el_refs, elements)
+
+
+def _get_entry_string(entry):
+    """
+    String identifying an entry for hashing and ordering.
+    """
+    return "{} {!r} {}".format(entry.composition.formula, entry.energy,
+                               getattr(entry, "entry_id", None) or
+                               getattr(entry, "name", ""))
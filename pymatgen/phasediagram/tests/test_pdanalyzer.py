@@ -35,6 +35,31 @@ class PDAnalyzerTest(unittest.TestCase):
                 self.assertGreaterEqual(e_ah, 0)
                 self.assertTrue(isinstance(e_ah, Number))
 
+    def test_get_decomp_and_e_above_hull_arrays(self):
+        entries = self.pd.all_entries
+        ehulls, inds, amts = \
+            self.analyzer.get_decomp_and_e_above_hull_arrays(entries,
+                                                             chunk_mem=1e4)
+        self.assertEqual(ehulls.shape, (len(entries),))
+        self.assertEqual(inds.shape, (len(entries), 3))
+        for entry, ehull, ind, amt in zip(entries, ehulls, inds, amts):
+            decomp, e = self.analyzer.get_decomp_and_e_above_hull(entry)
+            self.assertAlmostEqual(ehull, e)
+            if entry not in self.pd.stable_entries:
+                decomp2 = {self.pd.qhull_entries[i]: a
+                           for i, a in zip(ind, amt) if a != 0}
+                self.assertEqual(set(decomp2.keys()), set(decomp.keys()))
+                for k, v in decomp.items():
+                    self.assertAlmostEqual(decomp2[k], v)
+
+        facet_inds, amts = self.analyzer.get_facet_indices(
+            [Composition("Li3Fe7O11")])
+        decomp = self.analyzer.get_decomposition(Composition("Li3Fe7O11"))
+        for i, a in zip(self.pd.facets[facet_inds[0]], amts[0]):
+            self.assertAlmostEqual(decomp[self.pd.qhull_entries[i]], a)
+        self.assertRaises(ValueError, self.analyzer.get_facet_indices,
+                          [Composition("LiCo")])
+
     def test_get_equilibrium_reaction_energy(self):
         for entry in self.pd.stable_entries:
             self.assertLessEqual(
@@ -66,6 +91,14 @@ class PDAnalyzerTest(unittest.TestCase):
             self.assertLessEqual(len(self.analyzer.get_transition_chempots(el)),
                                  len(self.pd.facets))
 
+    def test_get_all_facet_chempots(self):
+        all_chempots = self.analyzer.get_all_facet_chempots()
+        self.assertEqual(all_chempots.shape, (len(self.pd.facets), 3))
+        for facet, chempots in zip(self.pd.facets, all_chempots):
+            d = self.analyzer.get_facet_chempots(facet)
+            for el, mu in zip(self.pd.elements, chempots):
+                self.assertAlmostEqual(d[el], mu)
+
     def test_get_element_profile(self):
         for el in self.pd.elements:
             for entry in self.pd.stable_entries:
@@ -76,6 +109,16 @@ class PDAnalyzerTest(unittest.TestCase):
     def test_get_get_chempot_range_map(self):
         elements = [el for el in self.pd.elements if el.symbol != "Fe"]
         self.assertEqual(len(self.analyzer.get_chempot_range_map(elements)), 10)
+        ranges = self.analyzer.get_chempot_range_map(elements,
+                                                     referenced=False)
+        li2o = [e for e in ranges if e.composition.reduced_formula == "Li2O"]
+        for sim in ranges[li2o[0]]:
+            for mus in sim.coords:
+                mu = dict(zip(elements, mus))
+                # Li2O is in equilibrium along its chemical potential range.
+                self.assertAlmostEqual(
+                    (2 * mu[Element("Li")] + mu[Element("O")]) / 3,
+                    li2o[0].energy_per_atom)
 
     def test_getmu_vertices_stability_phase(self):
         results = self.analyzer.getmu_vertices_stability_phase(Composition("LiFeO2"), Element("O"))
@@ -8,9 +8,11 @@ import unittest2 as unittest
 import os
 
 from pymatgen import Element, Composition
-from pymatgen.phasediagram.entries import PDEntryIO, PDEntry
+from pymatgen.phasediagram.entries import PDEntryIO, PDEntry, \
+    GrandPotPDEntry
 from pymatgen.phasediagram.maker import PhaseDiagram, \
-    GrandPotentialPhaseDiagram, CompoundPhaseDiagram, PhaseDiagramError
+    GrandPotentialPhaseDiagram, CompoundPhaseDiagram, PhaseDiagramError, \
+    PatchedPhaseDiagram, GrandPotentialSweep
 from pymatgen.phasediagram.analyzer import PDAnalyzer
 from pymatgen.phasediagram.plotter import PDPlotter
 
@@ -48,6 +50,34 @@ class PhaseDiagramTest(unittest.TestCase):
             lines, stable_entries, unstable_entries = plotter.pd_plot_data
             self.assertEqual(lines[0][1], [0, 0])
 
+    def test_add_entries(self):
+        refs = {}
+        for e in self.entries:
+            if e.composition.is_element:
+                refs.setdefault(e.composition.elements[0], e)
+        others = [e for e in self.entries if e not in refs.values()]
+        pd = PhaseDiagram(refs.values())
+        pd.add_entries(others[:200])
+        pd.add_entries(others[200:])
+        self.assertEqual(len(pd.all_entries), len(self.entries))
+        self.assertEqual(len(pd.facets), len(self.pd.facets))
+        get_key = lambda e: (e.composition.reduced_formula,
+                             round(e.energy_per_atom, 8))
+        self.assertEqual(set(map(get_key, pd.stable_entries)),
+                         set(map(get_key, self.pd.stable_entries)))
+        a1 = PDAnalyzer(pd)
+        a2 = PDAnalyzer(self.pd)
+        for e in self.entries:
+            self.assertAlmostEqual(a1.get_e_above_hull(e),
+                                   a2.get_e_above_hull(e))
+
+        # A lower elemental reference triggers a full rebuild.
+        li_energy = self.pd.el_refs[Element("Li")].energy_per_atom - 1
+        pd.add_entries([PDEntry("Li", li_energy)])
+        self.assertEqual(pd.el_refs[Element("Li")].energy_per_atom,
+                         li_energy)
+        self.assertRaises(ValueError, pd.add_entries, [PDEntry("Co", 0)])
+
     def test_stable_entries(self):
         stable_formulas = [ent.composition.reduced_formula
                            for ent in self.pd.stable_entries]
@@ -94,6 +124,93 @@ class PhaseDiagramTest(unittest.TestCase):
         self.assertIsNotNone(str(self.pd))
 
 
+class PatchedPhaseDiagramTest(unittest.TestCase):
+
+    def setUp(self):
+        els = ["Li", "Fe", "O", "P", "Mn"]
+        entries = [PDEntry(el, -1) for el in els]
+        # Compounds spanning the binaries and ternaries of the Li-Fe-O-P-Mn
+        # system, but no quaternaries containing both Fe and Mn.
+        for i, chemsys in enumerate(
+                [("Li", "O"), ("Fe", "O"), ("Mn", "O"), ("P", "O"),
+                 ("Li", "Fe", "O"), ("Li", "Mn", "O"), ("Fe", "P", "O"),
+                 ("Li", "Fe", "P", "O"), ("Li", "Mn", "P", "O"),
+                 ("Li", "Fe"), ("Fe", "Mn")]):
+            for j, amts in enumerate([(1, 1, 2, 4), (2, 1, 1, 1),
+                                      (1, 3, 2, 2)]):
+                comp = Composition(dict(zip(chemsys, amts)))
+                entries.append(PDEntry(comp, comp.num_atoms * (
+                    -1.5 - 0.1 * ((7 * i + 3 * j) % 5))))
+        self.entries = entries
+        self.pd = PhaseDiagram(entries)
+        self.ppd = PatchedPhaseDiagram(entries)
+
+    def test_stable_entries(self):
+        self.assertEqual(self.ppd.stable_entries, self.pd.stable_entries)
+        self.assertEqual(len(self.ppd.pds), 3)
+        self.assertEqual(PatchedPhaseDiagram(self.entries, ncpus=2)
+                         .stable_entries, self.pd.stable_entries)
+        self.assertRaises(PhaseDiagramError, getattr, self.ppd, "facets")
+        for els in [["Li", "O"], ["Li", "Fe", "O"], ["Li", "Fe", "Mn"]]:
+            els = [Element(el) for el in els]
+            self.assertEqual(self.ppd.get_sub_diagram(els).stable_entries,
+                             self.pd.get_sub_diagram(els).stable_entries)
+
+    def test_analyzer(self):
+        a1 = PDAnalyzer(self.pd)
+        a2 = PDAnalyzer(self.ppd)
+        for e in self.entries:
+            self.assertAlmostEqual(a1.get_e_above_hull(e),
+                                   a2.get_e_above_hull(e))
+        for e in self.pd.stable_entries:
+            if not e.is_element:
+                self.assertAlmostEqual(
+                    a1.get_equilibrium_reaction_energy(e),
+                    a2.get_equilibrium_reaction_energy(e))
+        ehulls, inds, amts = a2.get_decomp_and_e_above_hull_arrays(
+            self.entries)
+        for e, ehull in zip(self.entries, ehulls):
+            self.assertAlmostEqual(a1.get_e_above_hull(e), ehull)
+        for formula in ["LiFeMnPO", "FeMn2O", "LiFeMnO", "Li2FeMn"]:
+            comp = Composition(formula)
+            d1 = a1.get_decomposition(comp)
+            d2 = a2.get_decomposition(comp)
+            self.assertEqual(set(d1.keys()), set(d2.keys()))
+            for k, v in d1.items():
+                self.assertAlmostEqual(d2[k], v)
+        self.assertRaises(ValueError, a2.get_decomposition,
+                          Composition("LiCo"))
+
+    def test_add_entries(self):
+        ppd = PatchedPhaseDiagram(self.entries[:20])
+        # Cache a non-maximal sub-diagram that is changed by the new entries.
+        ppd.get_sub_diagram([Element("Li"), Element("Fe"), Element("Mn")])
+        new_entries = self.entries[20:] + [
+            PDEntry("LiFeMnO4", -20), PDEntry("LiFeMn", -5),
+            PDEntry("Li2O", -6), PDEntry("LiO2", -1)]
+        ppd.add_entries(new_entries)
+        entries = self.entries + new_entries[-4:]
+        pd = PhaseDiagram(entries)
+        self.assertEqual(len(ppd.all_entries), len(entries))
+        self.assertEqual(ppd.stable_entries, pd.stable_entries)
+        self.assertEqual(ppd.stable_entries,
+                         PatchedPhaseDiagram(entries).stable_entries)
+        a1 = PDAnalyzer(pd)
+        a2 = PDAnalyzer(ppd)
+        for e in entries:
+            self.assertAlmostEqual(a1.get_e_above_hull(e),
+                                   a2.get_e_above_hull(e))
+
+        # A lower elemental reference triggers a full rebuild.
+        ppd.add_entries([PDEntry("Li", -2)])
+        entries.append(PDEntry("Li", -2))
+        self.assertEqual(ppd.el_refs[Element("Li")].energy_per_atom, -2)
+        self.assertEqual(set(e.name for e in ppd.stable_entries),
+                         set(e.name for e in
+                             PhaseDiagram(entries).stable_entries))
+        self.assertRaises(ValueError, ppd.add_entries, [PDEntry("Co", 0)])
+
+
 class GrandPotentialPhaseDiagramTest(unittest.TestCase):
 
     def setUp(self):
@@ -128,10 +245,60 @@ class GrandPotentialPhaseDiagramTest(unittest.TestCase):
                                    7, "Calculated formation for " +
                                    formula + " is not correct!")
 
+    def test_add_entries(self):
+        refs = [e for e in self.entries if e.composition.is_element]
+        others = [e for e in self.entries if e not in refs]
+        pd = GrandPotentialPhaseDiagram(refs, {Element("O"): -5},
+                                        self.elements)
+        # Plain entries are transformed with the chemical potentials of the
+        # diagram, as in the constructor.
+        pd.add_entries(others)
+        self.assertTrue(all(isinstance(e, GrandPotPDEntry)
+                            for e in pd.all_entries))
+        self.assertEqual(len(pd.all_entries), len(self.pd.all_entries))
+        self.assertEqual(
+            set(e.original_entry for e in pd.stable_entries),
+            set(e.original_entry for e in self.pd.stable_entries))
+        a1 = PDAnalyzer(pd)
+        a2 = PDAnalyzer(self.pd)
+        for e in self.pd.all_entries:
+            self.assertAlmostEqual(a1.get_e_above_hull(e),
+                                   a2.get_e_above_hull(e))
+        self.assertRaises(ValueError, pd.add_entries,
+                          [GrandPotPDEntry(others[0], {Element("O"): -6})])
+
     def test_str(self):
         self.assertIsNotNone(str(self.pd))
 
 
+class GrandPotentialSweepTest(unittest.TestCase):
+
+    def setUp(self):
+        module_dir = os.path.dirname(os.path.abspath(__file__))
+        (self.elements, self.entries) = PDEntryIO.from_csv(
+            os.path.join(module_dir, "pdentries_test.csv"))
+        self.sweep = GrandPotentialSweep(self.entries, [Element("O")])
+
+    def test_sweep(self):
+        o = Element("O")
+        chempots_list = [{o: mu} for mu in [-8, -7, -6.5, -6, -5, -4]]
+        results = self.sweep.sweep(chempots_list, [Composition("LiFeO2")])
+        self.assertEqual(len(results), 6)
+        for chempots, result in zip(chempots_list, results):
+            pd = GrandPotentialPhaseDiagram(self.entries, chempots)
+            self.assertEqual(result["stable_entries"],
+                             set(e.original_entry for e in pd.stable_entries))
+            decomp = PDAnalyzer(pd).get_decomposition(Composition("LiFe"))
+            decomp2 = result["decompositions"][0]
+            self.assertEqual(set(decomp2.keys()),
+                             set(e.original_entry for e in decomp))
+            for e, amt in decomp.items():
+                self.assertAlmostEqual(decomp2[e.original_entry], amt)
+        self.assertEqual(len(self.sweep.get_stable_entries({o: -6})), 4)
+        self.assertRaises(ValueError, self.sweep.get_stable_entries,
+                          {Element("Li"): -2})
+
+
 class CompoundPhaseDiagramTest(unittest.TestCase):
 
     def setUp(self):
@@ -159,6 +326,18 @@ class CompoundPhaseDiagramTest(unittest.TestCase):
             self.assertAlmostEqual(energy, stable_formation_energies[formula],
                                    7)
 
+    def test_add_entries(self):
+        terminals = [Composition("Li2O"), Composition("Fe2O3")]
+        refs = [e for e in self.entries
+                if e.composition.reduced_formula in ("Li2O", "Fe2O3")]
+        others = [e for e in self.entries if e not in refs]
+        pd = CompoundPhaseDiagram(refs, terminals)
+        pd.add_entries(others)
+        self.assertEqual(len(pd.original_entries), len(self.entries))
+        self.assertEqual(len(pd.all_entries), len(self.pd.all_entries))
+        self.assertEqual(set(e.name for e in pd.stable_entries),
+                         set(e.name for e in self.pd.stable_entries))
+
     def test_str(self):
         self.assertIsNotNone(str(self.pd))
 
@@ -0,0 +1,118 @@
+# coding: utf-8
+# Copyright (c) Pymatgen Development Team.
+# Distributed under the terms of the MIT License.
+
+from __future__ import unicode_literals
+
+import unittest2 as unittest
+import os
+import tempfile
+import shutil
+
+from pymatgen.core.periodic_table import Element
+from pymatgen.phasediagram.entries import PDEntryIO, PDEntry
+from pymatgen.phasediagram.maker import PhaseDiagram
+from pymatgen.phasediagram.analyzer import PDAnalyzer
+from pymatgen.phasediagram.store import PhaseDiagramStore, \
+    save_phase_diagram, load_phase_diagram
+
+
+class PhaseDiagramStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        module_dir = os.path.dirname(os.path.abspath(__file__))
+        (self.elements, self.entries) = \
+            PDEntryIO.from_csv(os.path.join(module_dir, "pdentries_test.csv"))
+        self.pd = PhaseDiagram(self.entries)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_save_load(self):
+        filename = os.path.join(self.tmpdir, "pd.npz")
+        save_phase_diagram(self.pd, filename)
+        pd = load_phase_diagram(filename)
+        self.assertEqual(len(pd.all_entries), len(self.pd.all_entries))
+        self.assertEqual(len(pd.facets), len(self.pd.facets))
+        self.assertEqual(sorted(e.name for e in pd.stable_entries),
+                         sorted(e.name for e in self.pd.stable_entries))
+        a1 = PDAnalyzer(self.pd)
+        a2 = PDAnalyzer(pd)
+        for e1, e2 in zip(self.pd.all_entries, pd.all_entries):
+            self.assertAlmostEqual(a1.get_e_above_hull(e1),
+                                   a2.get_e_above_hull(e2))
+        # Supplying the entries restores the original entry objects.
+        pd = load_phase_diagram(filename, self.entries)
+        self.assertEqual(pd.stable_entries, self.pd.stable_entries)
+
+    def test_get_phase_diagram(self):
+        store = PhaseDiagramStore(self.tmpdir)
+        pd = store.get_phase_diagram(self.entries)
+        self.assertEqual(list(store.chemsys.keys()), ["Fe-Li-O"])
+        pd2 = store.get_phase_diagram(self.entries)
+        self.assertEqual(pd2.stable_entries, pd.stable_entries)
+        key = PhaseDiagramStore.get_key(self.entries)
+        self.assertEqual(key, PhaseDiagramStore.get_key(self.entries[::-1]))
+        self.assertNotEqual(key,
+                            PhaseDiagramStore.get_key(self.entries[1:]))
+
+    def test_get_sub_diagram(self):
+        store = PhaseDiagramStore(self.tmpdir)
+        self.assertIsNone(store.get_sub_diagram(["Li", "O"]))
+        store.get_phase_diagram(self.entries)
+        for els in [["Li", "O"], ["Fe", "O"], ["Li"], ["Fe", "Li", "O"]]:
+            pd = store.get_sub_diagram(els)
+            entries = [e for e in self.entries
+                       if set(e.composition.elements).issubset(
+                           map(Element, els))]
+            ref = PhaseDiagram(entries)
+            self.assertEqual(len(pd.facets), len(ref.facets))
+            self.assertEqual(
+                sorted(e.composition.reduced_formula
+                       for e in pd.stable_entries),
+                sorted(e.composition.reduced_formula
+                       for e in ref.stable_entries))
+            a1 = PDAnalyzer(pd)
+            a2 = PDAnalyzer(ref)
+            for e1, e2 in zip(pd.all_entries, ref.all_entries):
+                self.assertAlmostEqual(a1.get_e_above_hull(e1),
+                                       a2.get_e_above_hull(e2))
+
+    def test_get_sub_diagram_entries(self):
+        store = PhaseDiagramStore(self.tmpdir)
+        # A second entry set of the same chemical system, in which Li2O is
+        # much less stable.
+        entries2 = [PDEntry(e.composition, e.energy + 10, name=e.name)
+                    if e.composition.reduced_formula == "Li2O" else e
+                    for e in self.entries]
+        store.get_phase_diagram(self.entries)
+        store.get_phase_diagram(entries2)
+        self.assertEqual(len(store.chemsys["Fe-Li-O"]), 2)
+        for entries in [self.entries, entries2, self.entries]:
+            pd = store.get_sub_diagram(["Li", "O"], entries)
+            ref = PhaseDiagram([e for e in entries if set(
+                e.composition.elements).issubset([Element("Li"),
+                                                  Element("O")])])
+            self.assertEqual(
+                sorted(e.composition.reduced_formula
+                       for e in pd.stable_entries),
+                sorted(e.composition.reduced_formula
+                       for e in ref.stable_entries))
+        self.assertRaises(ValueError, store.get_sub_diagram, ["Mn", "O"],
+                          self.entries)
+        # Without entries, the most recently written diagram is used.
+        os.utime(store.chemsys["Fe-Li-O"][-1], None)
+        newest = load_phase_diagram(store.chemsys["Fe-Li-O"][0])
+        pd = store.get_sub_diagram(["Li", "O"])
+        self.assertEqual(
+            sorted(e.energy for e in pd.all_entries),
+            sorted(e.energy for e in newest.all_entries
+                   if set(e.composition.elements).issubset(
+                       [Element("Li"), Element("O")])))
+        self.assertFalse([f for f in os.listdir(self.tmpdir)
+                          if f.endswith(".tmp")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,13 @@
 from __future__ import division, unicode_literals, print_function
 import itertools
 import logging
-from collections import defaultdict
+import os
+import copy
+import hashlib
+import json
+import tempfile
+import zipfile
+from collections import defaultdict, OrderedDict
 
 import math
 from math import cos
@@ -13,6 +19,7 @@ from math import sin
 from fractions import Fraction
 
 import numpy as np
+from scipy.spatial import cKDTree
 
 from six.moves import filter, map, zip
 from monty.dev import deprecated
@@ -23,7 +30,7 @@ from pymatgen.symmetry.structure import SymmetrizedStructure
 from pymatgen.core.lattice import Lattice
 from pymatgen.core.structure import PeriodicSite
 from pymatgen.core.operations import SymmOp
-from pymatgen.util.coord_utils import find_in_coord_list, pbc_diff
+from pymatgen.util.coord_utils import pbc_diff, is_coord_subset_pbc
 
 """
 An interface to the excellent spglib library by Atsushi Togo
@@ -47,6 +54,187 @@ __date__ = "May 14, 2016"
 logger = logging.getLogger(__name__)
 
 
+class SymmetryDatasetCache(object):
+    """
+    A bounded least-recently-used cache of spglib symmetry datasets, keyed by
+    the spglib cell (lattice, fractional coordinates, species numbers and
+    magnetic moments), symprec and angle_tolerance. Many code paths
+    (get_space_group_info, XRDCalculator, CifWriter, HighSymmKpath, ...)
+    create a SpacegroupAnalyzer on the same structure, and the cache makes
+    all but the first spglib call essentially free.
+
+    A process-wide instance is used by all SpacegroupAnalyzers and can be
+    obtained or replaced with get_symmetry_dataset_cache and
+    set_symmetry_dataset_cache. The default instance holds up to 64
+    datasets in memory.
+
+    Args:
+        maxsize (int): Maximum number of datasets held in memory. Set to 0
+            to disable caching.
+        cache_dir (str): Optional directory in which datasets are
+            persisted, one .npz file per dataset, so that they can be reused
+            between sessions and shared between processes. Arrays are
+            stored as npz arrays and other values as JSON, and files are
+            read without unpickling. The directory is created if it does
+            not exist. The on-disk store is not bounded by maxsize; use
+            clear(disk=True) to empty it.
+    """
+
+    def __init__(self, maxsize=256, cache_dir=None):
+        self.maxsize = maxsize
+        if cache_dir is not None:
+            cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    @staticmethod
+    def get_key(cell, symprec, angle_tolerance):
+        """
+        Returns the hash key for a spglib cell and tolerances.
+
+        Args:
+            cell (tuple): spglib cell, i.e., (lattice, positions, numbers)
+                or (lattice, positions, numbers, magmoms).
+            symprec (float): Tolerance for symmetry finding.
+            angle_tolerance (float): Angle tolerance for symmetry finding.
+
+        Returns:
+            (str) SHA1 hex digest.
+        """
+        h = hashlib.sha1()
+        for a, dtype in zip(cell, (np.float64, np.float64, np.int64,
+                                   np.float64)):
+            a = np.ascontiguousarray(a, dtype=dtype)
+            h.update(str(a.shape).encode("ascii"))
+            h.update(a.tobytes())
+        h.update(("%r %r" % (float(symprec), float(angle_tolerance)))
+                 .encode("ascii"))
+        return h.hexdigest()
+
+    def get_symmetry_dataset(self, cell, symprec=1e-3, angle_tolerance=5):
+        """
+        Returns the spglib symmetry dataset for a cell, calling spglib only
+        if it is not already in the cache. Arguments are the same as for
+        spglib.get_symmetry_dataset.
+
+        Returns:
+            (dict) The symmetry dataset. A copy is returned, so it can be
+            safely modified.
+        """
+        if not self.maxsize and self.cache_dir is None:
+            return spglib.get_symmetry_dataset(
+                cell, symprec=symprec, angle_tolerance=angle_tolerance)
+
+        key = self.get_key(cell, symprec, angle_tolerance)
+        dataset = self._data.pop(key, None)
+        if dataset is None and self.cache_dir is not None:
+            dataset = self._load(key)
+        if dataset is None:
+            self.misses += 1
+            dataset = spglib.get_symmetry_dataset(
+                cell, symprec=symprec, angle_tolerance=angle_tolerance)
+            if dataset is None:
+                # spglib failed. Don't cache the failure.
+                return None
+            if self.cache_dir is not None:
+                self._dump(key, dataset)
+        else:
+            self.hits += 1
+
+        if self.maxsize:
+            self._data[key] = dataset
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return copy.deepcopy(dataset)
+
+    def _get_filename(self, key):
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def _load(self, key):
+        try:
+            with np.load(self._get_filename(key), allow_pickle=False) as d:
+                dataset = json.loads(str(d["__json__"]))
+                for k in d.files:
+                    if k != "__json__":
+                        dataset[k] = d[k]
+            return dataset
+        except (IOError, OSError, ValueError, KeyError, zipfile.BadZipfile):
+            return None
+
+    def _dump(self, key, dataset):
+        arrays = {k: v for k, v in dataset.items()
+                  if isinstance(v, np.ndarray)}
+        others = {k: v.item() if isinstance(v, np.generic) else v
+                  for k, v in dataset.items() if k not in arrays}
+        try:
+            arrays["__json__"] = json.dumps(others)
+        except TypeError:
+            # Not JSON serializable. Only keep the dataset in memory.
+            return
+        # Write to a temporary file and move it into place so that
+        # concurrent processes never see partially written files.
+        fd, tmpname = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.rename(tmpname, self._get_filename(key))
+        except (IOError, OSError):
+            # e.g., another process already wrote the file on Windows.
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
+    def clear(self, disk=False):
+        """
+        Empties the cache.
+
+        Args:
+            disk (bool): Whether to also remove the datasets persisted in
+                cache_dir.
+        """
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+        if disk and self.cache_dir is not None:
+            for fname in os.listdir(self.cache_dir):
+                if fname.endswith(".npz"):
+                    os.remove(os.path.join(self.cache_dir, fname))
+
+    def __len__(self):
+        return len(self._data)
+
+
+_dataset_cache = SymmetryDatasetCache(maxsize=64)
+
+
+def get_symmetry_dataset_cache():
+    """
+    Returns the process-wide SymmetryDatasetCache used by
+    SpacegroupAnalyzer.
+    """
+    return _dataset_cache
+
+
+def set_symmetry_dataset_cache(cache):
+    """
+    Replaces the process-wide SymmetryDatasetCache used by
+    SpacegroupAnalyzer, e.g., to change its size or to enable on-disk
+    persistence::
+
+        set_symmetry_dataset_cache(SymmetryDatasetCache(
+            maxsize=10000, cache_dir="~/.pmg_symmetry_cache"))
+
+    Args:
+        cache (SymmetryDatasetCache): The new cache. Use
+            SymmetryDatasetCache(maxsize=0) to disable caching.
+    """
+    global _dataset_cache
+    _dataset_cache = cache
+
+
 class SpacegroupAnalyzer(object):
     """
     Takes a pymatgen.core.structure.Structure object and a symprec.
@@ -95,8 +283,10 @@ class SpacegroupAnalyzer(object):
         self._numbers = zs
         # For now, we are setting magmom to zero.
         self._cell = latt, positions, zs, magmoms
+        self._refined_cell = None
+        self._ir_meshes = {}
 
-        self._space_group_data = spglib.get_symmetry_dataset(
+        self._space_group_data = _dataset_cache.get_symmetry_dataset(
             self._cell, symprec=self._symprec, angle_tolerance=angle_tolerance)
 
     @deprecated(message="get_spacegroup has been renamed "
@@ -346,8 +536,12 @@ class SpacegroupAnalyzer(object):
             Refined structure.
         """
         # Atomic positions have to be specified by scaled positions for spglib.
-        lattice, scaled_positions, numbers \
-            = spglib.refine_cell(self._cell, self._symprec, self._angle_tol)
+        # The spglib output is kept, since the conventional and primitive
+        # standard structures are both derived from the refined cell.
+        if self._refined_cell is None:
+            self._refined_cell = spglib.refine_cell(
+                self._cell, self._symprec, self._angle_tol)
+        lattice, scaled_positions, numbers = self._refined_cell
 
         species = [self._unique_species[i - 1] for i in numbers]
         s = Structure(lattice, species, scaled_positions)
@@ -388,16 +582,29 @@ class SpacegroupAnalyzer(object):
             in fractional coordinates
         """
         shift = np.array([1 if i else 0 for i in is_shift])
-        mapping, grid = spglib.get_ir_reciprocal_mesh(
-            np.array(mesh), self._cell, is_shift=shift)
+        mapping, grid = self._get_ir_mesh_mapping(mesh, shift)
 
         results = []
-        tmp_map = list(mapping)
+        counts = np.bincount(mapping)
         for i in np.unique(mapping):
             results.append(((grid[i] + shift * (0.5, 0.5, 0.5)) / mesh,
-                            tmp_map.count(i)))
+                            int(counts[i])))
         return results
 
+    def _get_ir_mesh_mapping(self, mesh, shift):
+        """
+        Returns the (mapping, grid) from spglib.get_ir_reciprocal_mesh. The
+        result is kept for each mesh and shift, so that repeated calls with
+        the same mesh do not call spglib again.
+        """
+        key = (tuple(int(i) for i in mesh), tuple(int(i) for i in shift))
+        if key not in self._ir_meshes:
+            mapping, grid = spglib.get_ir_reciprocal_mesh(
+                np.array(mesh), self._cell, is_shift=np.array(shift))
+            self._ir_meshes[key] = (np.array(mapping, dtype=np.int_),
+                                    np.array(grid, dtype=np.int_))
+        return self._ir_meshes[key]
+
     def get_primitive_standard_structure(self, international_monoclinic=True):
         """
         Gives a structure with a primitive cell according to certain standards
@@ -761,38 +968,126 @@ class SpacegroupAnalyzer(object):
         shift = []
         mesh = []
         for i in range(3):
-            nonzero = [i for i in kpts[:, i] if abs(i) > 1e-5]
+            nonzero = kpts[:, i][np.abs(kpts[:, i]) > 1e-5]
             if len(nonzero) != len(kpts):
                 # gamma centered
-                if not nonzero:
+                if len(nonzero) == 0:
                     mesh.append(1)
                 else:
-                    m = np.abs(np.round(1/np.array(nonzero)))
+                    m = np.abs(np.round(1/nonzero))
                     mesh.append(int(max(m)))
                 shift.append(0)
             else:
                 # Monk
-                m = np.abs(np.round(0.5/np.array(nonzero)))
+                m = np.abs(np.round(0.5/nonzero))
                 mesh.append(int(max(m)))
                 shift.append(1)
 
-        mapping, grid = spglib.get_ir_reciprocal_mesh(
-            np.array(mesh), self._cell, is_shift=shift)
-        mapping = list(mapping)
-        grid = (np.array(grid) + np.array(shift) * (0.5, 0.5, 0.5)) / mesh
-        weights = []
-        mapped = defaultdict(int)
-        for k in kpoints:
-            for i, g in enumerate(grid):
-                if np.allclose(pbc_diff(k, g), (0, 0, 0), atol=atol):
-                    mapped[tuple(g)] += 1
-                    weights.append(mapping.count(mapping[i]))
-                    break
-        if (len(mapped) != len(set(mapping))) or (
-                not all([v == 1 for v in mapped.values()])):
+        mapping, grid = self._get_ir_mesh_mapping(mesh, shift)
+        mesh = np.array(mesh)
+        shift = np.array(shift)
+
+        # Hash the grid points by their address modulo the mesh, and find
+        # the nearest grid point of every kpoint by rounding.
+        grid_index = np.zeros(np.prod(mesh), dtype=np.int_)
+        grid_index[np.ravel_multi_index((grid % mesh).T, mesh)] = \
+            np.arange(len(grid))
+        address = np.round(kpts * mesh - shift * 0.5).astype(np.int_)
+        inds = grid_index[np.ravel_multi_index((address % mesh).T, mesh)]
+        fgrid = (grid + shift * (0.5, 0.5, 0.5)) / mesh
+        diff = pbc_diff(kpts, fgrid[inds])
+        inds = inds[np.all(np.abs(diff) <= atol, axis=1)]
+
+        counts = np.bincount(inds, minlength=len(grid))
+        if np.count_nonzero(counts) != len(np.unique(mapping)) or \
+                np.any(counts > 1):
             raise ValueError("Unable to find 1:1 corresponding between input "
                              "kpoints and irreducible grid!")
-        return [w/sum(weights) for w in weights]
+        weights = np.bincount(mapping)[mapping[inds]]
+        return list(weights / np.sum(weights))
+
+
+SYMMETRY_RECORD_PROPERTIES = (
+    "space_group_symbol", "space_group_number", "hall", "point_group",
+    "crystal_system", "lattice_type", "wyckoffs", "equivalent_atoms",
+    "refined_structure", "conventional_standard_structure",
+    "primitive_standard_structure")
+
+
+def _get_symmetry_record(args):
+    """
+    Computes the requested symmetry properties of a single structure. The
+    spglib cell is built once by the SpacegroupAnalyzer and shared by all
+    properties.
+    """
+    structure, symprec, angle_tolerance, properties = args
+    try:
+        a = SpacegroupAnalyzer(structure, symprec=symprec,
+                               angle_tolerance=angle_tolerance)
+        if a.get_symmetry_dataset() is None:
+            raise ValueError("spglib failed to find the symmetry.")
+        record = {}
+        for prop in properties:
+            if prop in ("wyckoffs", "equivalent_atoms"):
+                record[prop] = list(a.get_symmetry_dataset()[prop])
+            elif prop == "point_group":
+                record[prop] = a.get_point_group_symbol()
+            elif prop == "hall":
+                record[prop] = a.get_hall()
+            else:
+                record[prop] = getattr(a, "get_" + prop)()
+        return record
+    except Exception as ex:
+        logger.warning("Symmetry analysis of {} failed: {}".format(
+            structure.composition.reduced_formula, ex))
+        return None
+
+
+def get_symmetry_records(structures, symprec=1e-3, angle_tolerance=5,
+                         properties=("space_group_symbol",
+                                     "space_group_number", "point_group",
+                                     "crystal_system", "wyckoffs"),
+                         ncpus=None, chunksize=20):
+    """
+    Bulk symmetry analysis of a collection of structures, e.g., for
+    database-wide space group assignment. Each structure is converted to a
+    spglib cell once, and all requested properties are computed from it in
+    a single pass (the refined, conventional and primitive standard
+    structures share a single spglib refinement).
+
+    Args:
+        structures ([Structure]): Structures to analyze.
+        symprec (float): Tolerance for symmetry finding. See
+            SpacegroupAnalyzer.
+        angle_tolerance (float): Angle tolerance for symmetry finding.
+        properties ([str]): Properties to compute, from
+            SYMMETRY_RECORD_PROPERTIES. Most are the return values of the
+            corresponding SpacegroupAnalyzer get_* methods; "wyckoffs" and
+            "equivalent_atoms" are lists taken from the symmetry dataset.
+        ncpus (int): Number of processes to use. Default of None means
+            serial processing.
+        chunksize (int): Number of structures sent to a process at a time
+            when ncpus is set.
+
+    Returns:
+        A list of {property: value} dicts in the same order as structures.
+        The record is None for structures where the symmetry analysis
+        failed.
+    """
+    properties = tuple(properties)
+    for prop in properties:
+        if prop not in SYMMETRY_RECORD_PROPERTIES:
+            raise ValueError("Unknown symmetry property {}".format(prop))
+    args = [(s, symprec, angle_tolerance, properties) for s in structures]
+    if ncpus:
+        import multiprocessing as mp
+        p = mp.Pool(ncpus)
+        try:
+            return p.map(_get_symmetry_record, args, chunksize)
+        finally:
+            p.close()
+            p.join()
+    return [_get_symmetry_record(a) for a in args]
 
 
 class PointGroupAnalyzer(object):
@@ -839,24 +1134,30 @@ class PointGroupAnalyzer(object):
         self.tol = tolerance
         self.eig_tol = eigen_tolerance
         self.mat_tol = matrix_tol
+
+        # Species are replaced by integer labels and the coordinates are put
+        # in a KD-tree so that symmetry operations can be tested for all
+        # sites at once.
+        species_ids = {}
+        self._species_ids = np.array(
+            [species_ids.setdefault(site.species_and_occu, len(species_ids))
+             for site in self.centered_mol], dtype=np.int_)
+        self._tree = cKDTree(self.centered_mol.cart_coords)
+        self._clustered_sites = None
         self._analyze()
 
     def _analyze(self):
         if len(self.centered_mol) == 1:
             self.sch_symbol = "Kh"
         else:
-            inertia_tensor = np.zeros((3, 3))
-            total_inertia = 0
-            for site in self.mol:
-                c = site.coords
-                wt = site.species_and_occu.weight
-                for i in range(3):
-                    inertia_tensor[i, i] += wt * (c[(i + 1) % 3] ** 2
-                                                  + c[(i + 2) % 3] ** 2)
-                for i, j in itertools.combinations(list(range(3)), 2):
-                    inertia_tensor[i, j] += -wt * c[i] * c[j]
-                    inertia_tensor[j, i] += -wt * c[j] * c[i]
-                total_inertia += wt * np.dot(c, c)
+            c = self.mol.cart_coords
+            wt = np.array([float(site.species_and_occu.weight)
+                           for site in self.mol])
+            sq = np.sum(c ** 2, axis=1)
+            inertia_tensor = -np.dot(c.T * wt, c)
+            inertia_tensor[np.diag_indices(3)] = np.dot(
+                wt, sq[:, None] - c ** 2)
+            total_inertia = np.dot(wt, sq)
 
             # Normalize the inertia tensor so that it does not scale with size
             # of the system.  This mitigates the problem of choosing a proper
@@ -1008,27 +1309,47 @@ class PointGroupAnalyzer(object):
             self.symmops.append(SymmOp.reflection(axis))
             mirror_type = "h"
         else:
-            # Iterate through all pairs of atoms to find mirror
-            for s1, s2 in itertools.combinations(self.centered_mol, 2):
-                if s1.species_and_occu == s2.species_and_occu:
-                    normal = s1.coords - s2.coords
-                    if np.dot(normal, axis) < self.tol:
-                        op = SymmOp.reflection(normal)
-                        if self.is_valid_op(op):
-                            self.symmops.append(op)
-                            if len(self.rot_sym) > 1:
-                                mirror_type = "d"
-                                for v, r in self.rot_sym:
-                                    if not np.linalg.norm(v - axis) < self.tol:
-                                        if np.dot(v, normal) < self.tol:
-                                            mirror_type = "v"
-                                            break
-                            else:
-                                mirror_type = "v"
-                            break
+            # Iterate through all pairs of atoms to find mirror. The
+            # candidate normals for all partners of an atom are generated at
+            # once. A mirror through the center of mass can only map an atom
+            # onto an atom of the same species at the same distance from
+            # the center, so other pairs are rejected before testing.
+            coords = self.centered_mol.cart_coords
+            dists = np.linalg.norm(coords, axis=1)
+            ids = self._species_ids
+            for i in range(len(coords) - 1):
+                normals = coords[i] - coords[i + 1:]
+                valid = np.logical_and(ids[i + 1:] == ids[i],
+                                       np.dot(normals, axis) < self.tol)
+                valid = np.logical_and(
+                    valid, np.abs(dists[i + 1:] - dists[i]) < 2 * self.tol)
+                for normal in normals[valid]:
+                    op = SymmOp.reflection(normal)
+                    if self.is_valid_op(op):
+                        self.symmops.append(op)
+                        if len(self.rot_sym) > 1:
+                            mirror_type = "d"
+                            for v, r in self.rot_sym:
+                                if not np.linalg.norm(v - axis) < self.tol:
+                                    if np.dot(v, normal) < self.tol:
+                                        mirror_type = "v"
+                                        break
+                        else:
+                            mirror_type = "v"
+                        return mirror_type
 
         return mirror_type
 
+    def _get_clustered_sites(self):
+        """
+        Returns the sites clustered by distance from the center of mass and
+        species (see cluster_sites). The clustering is only done once.
+        """
+        if self._clustered_sites is None:
+            self._clustered_sites = cluster_sites(self.centered_mol,
+                                                  self.tol)
+        return self._clustered_sites
+
     def _get_smallest_set_not_on_axis(self, axis):
         """
         Returns the smallest list of atoms with the same species and
@@ -1043,7 +1364,7 @@ class PointGroupAnalyzer(object):
             return np.linalg.norm(v) > self.tol
 
         valid_sets = []
-        origin_site, dist_el_sites = cluster_sites(self.centered_mol, self.tol)
+        origin_site, dist_el_sites = self._get_clustered_sites()
         for test_set in dist_el_sites.values():
             valid_set = list(filter(not_on_axis, test_set))
             if len(valid_set) > 0:
@@ -1130,7 +1451,7 @@ class PointGroupAnalyzer(object):
         have a unique 5-fold axis.
         """
         rot_present = defaultdict(bool)
-        origin_site, dist_el_sites = cluster_sites(self.centered_mol, self.tol)
+        origin_site, dist_el_sites = self._get_clustered_sites()
         test_set = min(dist_el_sites.values(), key=lambda s: len(s))
         coords = [s.coords for s in test_set]
         for c1, c2, c3 in itertools.combinations(coords, 3):
@@ -1178,13 +1499,19 @@ class PointGroupAnalyzer(object):
         Returns:
             (bool): Whether SymmOp is valid for Molecule.
         """
-        coords = self.centered_mol.cart_coords
-        for site in self.centered_mol:
-            coord = symmop.operate(site.coords)
-            ind = find_in_coord_list(coords, coord, self.tol)
-            if not (len(ind) == 1 and
-                            self.centered_mol[ind[0]].species_and_occu
-                            == site.species_and_occu):
+        coords = symmop.operate_multi(self.centered_mol.cart_coords)
+        # Most candidate operations are invalid, so test a few sites
+        # first to reject them without querying the whole molecule.
+        for sl in (slice(0, 8), slice(8, None)):
+            if len(coords[sl]) == 0:
+                continue
+            # Same criterion as find_in_coord_list: exactly one site within
+            # tol along each direction (Chebyshev distance), with the same
+            # species.
+            d, ind = self._tree.query(coords[sl], k=2, p=np.inf)
+            valid = np.logical_and(d[:, 0] < self.tol, d[:, 1] >= self.tol)
+            if not (np.all(valid) and np.all(
+                    self._species_ids[ind[:, 0]] == self._species_ids[sl])):
                 return False
         return True
 
@@ -1202,11 +1529,16 @@ def cluster_sites(mol, tol):
         of mass (None if there are no origin atoms). clustered_sites is a
         dict of {(avg_dist, species_and_occu): [list of sites]}
     """
-    # Cluster works for dim > 2 data. We just add a dummy 0 for second
-    # coordinate.
+    # The distances are clustered by single linkage with a distance
+    # criterion, which in one dimension amounts to splitting the sorted
+    # distances wherever consecutive values differ by more than tol. A dummy
+    # 0 is kept as the second coordinate of each distance, as the average
+    # distances are taken over these pairs.
     dists = [[np.linalg.norm(site.coords), 0] for site in mol]
-    import scipy.cluster as spcluster
-    f = spcluster.hierarchy.fclusterdata(dists, tol, criterion='distance')
+    d = np.array([x[0] for x in dists])
+    order = np.argsort(d, kind="mergesort")
+    f = np.zeros(len(d), dtype=np.int_)
+    f[order] = np.concatenate([[1], np.diff(d[order]) > tol]).cumsum()
     clustered_dists = defaultdict(list)
     for i, site in enumerate(mol):
         clustered_dists[f[i]].append(dists[i])
@@ -1224,31 +1556,57 @@ def cluster_sites(mol, tol):
 
 def generate_full_symmops(symmops, tol):
     """
-    Recursive algorithm to permute through all possible combinations of the
-    initially supplied symmetry operations to arrive at a complete set of
-    operations mapping a single atom to all other equivalent atoms in the
-    point group.  This assumes that the initial number already uniquely
+    Iteratively adds products of pairs of the supplied symmetry operations
+    until the set is closed under multiplication, to arrive at a complete
+    set of operations mapping a single atom to all other equivalent atoms in
+    the point group.  This assumes that the initial number already uniquely
     identifies all operations.
 
     Args:
         symmops ([SymmOp]): Initial set of symmetry operations.
+        tol (float): Tolerance for two operations to be considered equal.
 
     Returns:
         Full set of symmetry operations.
     """
 
-    a = [o.affine_matrix for o in symmops]
-
-    if len(symmops) > 300:
-        logger.debug("Generation of symmetry operations in infinite loop.  " +
-                     "Possible error in initial operations or tolerance too "
-                     "low.")
-    else:
-        for op1, op2 in itertools.product(symmops, symmops):
-            m = np.dot(op1.affine_matrix, op2.affine_matrix)
-            d = np.abs(a - m) < tol
-            if not np.any(np.all(np.all(d, axis=2), axis=1)):
-                return generate_full_symmops(symmops + [SymmOp(m)], tol)
+    # The products are checked in the order of
+    # itertools.product(symmops, symmops), and the first product not in the
+    # set is added before starting over. Since the set only grows, products
+    # that were found in the set once do not need to be checked again, and
+    # all products of one operation with the others are computed at once.
+    symmops = list(symmops)
+    a = np.array([o.affine_matrix for o in symmops])
+    known = np.zeros((len(a), len(a)), dtype=bool)
+
+    while True:
+        if len(symmops) > 300:
+            logger.debug("Generation of symmetry operations in infinite "
+                         "loop.  Possible error in initial operations or "
+                         "tolerance too low.")
+            break
+        new_op = None
+        for i in range(len(a)):
+            js = np.where(np.logical_not(known[i]))[0]
+            if len(js) == 0:
+                continue
+            m = np.einsum("ij,njk->nik", a[i], a[js])
+            d = np.abs(a[None, :, :, :] - m[:, None, :, :]) < tol
+            in_set = np.any(np.all(np.all(d, axis=3), axis=2), axis=1)
+            if np.all(in_set):
+                known[i, js] = True
+            else:
+                first = np.argmin(in_set)
+                known[i, js[:first]] = True
+                new_op = m[first]
+                break
+        if new_op is None:
+            break
+        symmops.append(SymmOp(new_op))
+        a = np.concatenate([a, new_op[None, :, :]])
+        k = np.zeros((len(a), len(a)), dtype=bool)
+        k[:-1, :-1] = known
+        known = k
 
     return symmops
 
@@ -1289,21 +1647,33 @@ class SpacegroupOperations(list):
             (bool): Whether the two sets of sites are symmetrically
             equivalent.
         """
-        def in_sites(site):
-            for test_site in sites1:
-                if test_site.is_periodic_image(site, symm_prec, False):
-                    return True
-            return False
-        for op in self:
-            newsites2 = [PeriodicSite(site.species_and_occu,
-                                      op.operate(site.frac_coords),
-                                      site.lattice) for site in sites2]
-            ismapping = True
-            for site in newsites2:
-                if not in_sites(site):
-                    ismapping = False
-                    break
-            if ismapping:
+        # Sites can only be mapped onto sites with the same species.
+        species = []
+        ids = []
+        for sites in (sites1, sites2):
+            site_ids = []
+            for site in sites:
+                sp = site.species_and_occu
+                for i, s in enumerate(species):
+                    if s == sp:
+                        site_ids.append(i)
+                        break
+                else:
+                    species.append(sp)
+                    site_ids.append(len(species) - 1)
+            ids.append(np.array(site_ids))
+        mask = ids[1][:, None] != ids[0][None, :]
+
+        if len(sites2) == 0:
+            return len(self) > 0
+        fcoords1 = np.reshape([site.frac_coords for site in sites1], (-1, 3))
+        fcoords2 = np.array([site.frac_coords for site in sites2])
+        # Apply all operations to all of sites2 at once.
+        affine = np.array([op.affine_matrix for op in self])
+        newcoords = np.einsum("oij,nj->oni", affine[:, :3, :3], fcoords2) \
+            + affine[:, None, :3, 3]
+        for fcoords in newcoords:
+            if is_coord_subset_pbc(fcoords, fcoords1, symm_prec, mask):
                 return True
         return False
 
@@ -18,6 +18,8 @@ __date__ = "Mar 9, 2012"
 
 import unittest2 as unittest
 import os
+import tempfile
+import shutil
 
 import numpy as np
 
@@ -25,7 +27,9 @@ from pymatgen.core.sites import PeriodicSite
 from pymatgen.io.vasp.inputs import Poscar
 from pymatgen.io.vasp.outputs import Vasprun
 from pymatgen.symmetry.analyzer import SpacegroupAnalyzer, \
-    PointGroupAnalyzer, cluster_sites
+    PointGroupAnalyzer, cluster_sites, SymmetryDatasetCache, \
+    get_symmetry_dataset_cache, set_symmetry_dataset_cache, \
+    get_symmetry_records
 from pymatgen.io.cif import CifParser
 from pymatgen.util.testing import PymatgenTest
 from pymatgen.core.structure import Molecule, Structure
@@ -340,6 +344,141 @@ class SpacegroupAnalyzerTest(PymatgenTest):
 
 
 
+class SymmetryDatasetCacheTest(PymatgenTest):
+
+    def setUp(self):
+        self.old_cache = get_symmetry_dataset_cache()
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        set_symmetry_dataset_cache(self.old_cache)
+        shutil.rmtree(self.cache_dir)
+
+    def test_cache(self):
+        cache = SymmetryDatasetCache(maxsize=2)
+        set_symmetry_dataset_cache(cache)
+        s = self.get_structure("LiFePO4")
+        sg1 = SpacegroupAnalyzer(s, 0.1)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        sg2 = SpacegroupAnalyzer(s.copy(), 0.1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(sg2.get_space_group_symbol(), "Pnma")
+        self.assertArrayEqual(sg1.get_symmetry_dataset()["rotations"],
+                              sg2.get_symmetry_dataset()["rotations"])
+
+        # returned datasets are copies
+        sg1.get_symmetry_dataset()["rotations"][0] = 0
+        self.assertArrayEqual(SpacegroupAnalyzer(s, 0.1)
+                              .get_symmetry_dataset()["rotations"],
+                              sg2.get_symmetry_dataset()["rotations"])
+
+        # different tolerances and structures are different entries
+        SpacegroupAnalyzer(s, 0.01)
+        self.assertEqual(cache.misses, 2)
+        s.perturb(0.1)
+        SpacegroupAnalyzer(s, 0.1)
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(len(cache), 2)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled(self):
+        cache = SymmetryDatasetCache(maxsize=0)
+        set_symmetry_dataset_cache(cache)
+        s = self.get_structure("LiFePO4")
+        SpacegroupAnalyzer(s)
+        SpacegroupAnalyzer(s)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.hits, 0)
+
+    def test_persistence(self):
+        s = self.get_structure("Li2O")
+        cache = SymmetryDatasetCache(cache_dir=self.cache_dir)
+        set_symmetry_dataset_cache(cache)
+        SpacegroupAnalyzer(s)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        fname = os.listdir(self.cache_dir)[0]
+        self.assertTrue(fname.endswith(".npz"))
+
+        cache = SymmetryDatasetCache(cache_dir=self.cache_dir)
+        set_symmetry_dataset_cache(cache)
+        sg = SpacegroupAnalyzer(s)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        self.assertEqual(sg.get_space_group_symbol(), "Fm-3m")
+        ref = SymmetryDatasetCache(maxsize=0).get_symmetry_dataset(
+            sg._cell, symprec=sg._symprec)
+        dataset = sg.get_symmetry_dataset()
+        self.assertEqual(sorted(dataset.keys()), sorted(ref.keys()))
+        for k, v in ref.items():
+            if isinstance(v, np.ndarray):
+                self.assertArrayEqual(dataset[k], v)
+                self.assertEqual(dataset[k].dtype, v.dtype)
+            else:
+                self.assertEqual(dataset[k], v)
+
+        # Unreadable files are treated as misses.
+        with open(os.path.join(self.cache_dir, fname), "wb") as f:
+            f.write(b"not an npz file")
+        cache = SymmetryDatasetCache(cache_dir=self.cache_dir)
+        set_symmetry_dataset_cache(cache)
+        sg = SpacegroupAnalyzer(s)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertEqual(sg.get_space_group_symbol(), "Fm-3m")
+
+        cache.clear(disk=True)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_default(self):
+        cache = get_symmetry_dataset_cache()
+        self.assertEqual(cache.maxsize, 64)
+        self.assertIsNone(cache.cache_dir)
+
+
+class SymmetryRecordsTest(PymatgenTest):
+
+    def test_get_symmetry_records(self):
+        structures = [self.get_structure(n)
+                      for n in ["LiFePO4", "Li2O", "Si", "Graphite"]]
+        props = ["space_group_symbol", "space_group_number", "hall",
+                 "equivalent_atoms", "refined_structure",
+                 "primitive_standard_structure"]
+        records = get_symmetry_records(structures, symprec=0.1,
+                                       properties=props)
+        self.assertEqual(len(records), 4)
+        for s, r in zip(structures, records):
+            a = SpacegroupAnalyzer(s, symprec=0.1)
+            self.assertEqual(sorted(r.keys()), sorted(props))
+            self.assertEqual(r["space_group_symbol"],
+                             a.get_space_group_symbol())
+            self.assertEqual(r["space_group_number"],
+                             a.get_space_group_number())
+            self.assertEqual(r["hall"], a.get_hall())
+            self.assertEqual(r["equivalent_atoms"],
+                             list(a.get_symmetry_dataset()["equivalent_atoms"]))
+            self.assertEqual(r["refined_structure"],
+                             a.get_refined_structure())
+            self.assertEqual(r["primitive_standard_structure"],
+                             a.get_primitive_standard_structure())
+
+        records_mp = get_symmetry_records(structures, symprec=0.1,
+                                          properties=props[:3], ncpus=2,
+                                          chunksize=1)
+        for r1, r2 in zip(records, records_mp):
+            for k in props[:3]:
+                self.assertEqual(r1[k], r2[k])
+
+        self.assertEqual(get_symmetry_records(structures[1:2])[0],
+                         {"space_group_symbol": "Fm-3m",
+                          "space_group_number": 225,
+                          "point_group": "m-3m",
+                          "crystal_system": "cubic",
+                          "wyckoffs": ["c", "c", "a"]})
+        self.assertRaises(ValueError, get_symmetry_records, structures,
+                          properties=["bad_property"])
+
+
 class SpacegroupTest(unittest.TestCase):
 
     def setUp(self):
@@ -359,6 +498,17 @@ class SpacegroupTest(unittest.TestCase):
         self.assertFalse(self.sg1.are_symmetrically_equivalent(sites1, sites2,
                                                                1e-3))
 
+        # all sites map onto themselves, but not onto sites of other species
+        sites = list(self.structure)
+        self.assertTrue(self.sg1.are_symmetrically_equivalent(
+            sites, sites[::-1], 1e-3))
+        sites1 = [site for site in self.structure
+                  if site.specie.symbol == "O"]
+        sites2 = [site for site in self.structure
+                  if site.specie.symbol == "P"]
+        self.assertFalse(self.sg1.are_symmetrically_equivalent(
+            sites1[:len(sites2)], sites2, 1e-3))
+
 
 
 H2O2 = Molecule(["O", "O", "H", "H"],
@@ -477,6 +627,33 @@ class PointGroupAnalyzerTest(PymatgenTest):
         a = PointGroupAnalyzer(m)
         self.assertEqual(a.sch_symbol, "D5d")
 
+    def test_nanoparticle(self):
+        # Rock salt cluster centered on a Na site, with the sites shuffled
+        # and with tetragonal and orthorhombic distortions.
+        s = Structure.from_spacegroup("Fm-3m", np.eye(3) * 5.6,
+                                      ["Na", "Cl"],
+                                      [[0, 0, 0], [0.5, 0.5, 0.5]])
+        s.make_supercell([6, 6, 6])
+        center = s[0].coords + 5.6 * 3
+        sites = [site for site in s
+                 if np.linalg.norm(site.coords - center) < 9]
+        species = [site.specie.symbol for site in sites]
+        coords = np.array([site.coords - center for site in sites])
+        a = PointGroupAnalyzer(Molecule(species, coords))
+        self.assertEqual(a.sch_symbol, "Oh")
+        self.assertEqual(len(a.get_pointgroup()), 48)
+
+        inds = np.random.RandomState(0).permutation(len(species))
+        species = [species[i] for i in inds]
+        coords = coords[inds]
+        a = PointGroupAnalyzer(Molecule(species, coords))
+        self.assertEqual(a.sch_symbol, "Oh")
+        a = PointGroupAnalyzer(Molecule(species, coords * [1, 1, 1.2]))
+        self.assertEqual(a.sch_symbol, "D4h")
+        self.assertEqual(len(a.get_pointgroup()), 16)
+        a = PointGroupAnalyzer(Molecule(species, coords * [1, 1.1, 1.2]))
+        self.assertEqual(a.sch_symbol, "D2h")
+
     def test_tricky_structure(self):
         # for some reason this structure kills spglib1.9
         # 1.7 can't find symmetry either, but at least doesn't kill python
@@ -519,6 +696,27 @@ class PointGroupAnalyzerTest(PymatgenTest):
         kpts = [[0, 0, 0], [0.15, 0.15, 0.15], [0.2, 0.2, 0.2]]
         self.assertRaises(ValueError, a.get_kpoint_weights, kpts)
 
+    def test_get_kpoint_weights_shifted(self):
+        for name in ["SrTiO3", "LiFePO4", "Graphite"]:
+            s = PymatgenTest.get_structure(name)
+            a = SpacegroupAnalyzer(s)
+            ir_mesh = a.get_ir_reciprocal_mesh((3, 5, 4), (1, 1, 1))
+            weights = np.array([i[1] for i in ir_mesh], dtype=float)
+            weights /= sum(weights)
+            # kpoints in a different order
+            inds = np.random.RandomState(0).permutation(len(ir_mesh))
+            kpts = [ir_mesh[i][0] for i in inds]
+            self.assertArrayAlmostEqual(weights[inds],
+                                        a.get_kpoint_weights(kpts))
+            # the irreducible mesh is reused for the same mesh and shift
+            self.assertEqual(len(a._ir_meshes), 1)
+
+            # the full mesh has several kpoints per irreducible kpoint
+            kpts = [[i / 2, j / 2, k / 2] for i in range(2)
+                    for j in range(2) for k in range(2)]
+            if len(a.get_ir_reciprocal_mesh((2, 2, 2))) < len(kpts):
+                self.assertRaises(ValueError, a.get_kpoint_weights, kpts)
+
 
 class FuncTest(unittest.TestCase):
 
@@ -30,7 +30,7 @@ with open(os.path.join(SETUP_PTH, "README.rst")) as f:
 
 setup(
     name="pymatgen",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks"]),
     version="4.3.2",
     install_requires=["numpy>=1.9", "six", "atomicfile", "requests",
                       "pybtex", "pyyaml", "monty>=0.9.5", "scipy>=0.14",